@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark Celery messaging profiles: JSON (previous) vs msgpack + threshold compression.
+
+Offline it compares encoded message sizes and serialization cost. With a
+reachable Redis it also enqueues N tasks per profile to a scratch queue that
+no worker consumes and reports enqueue throughput and broker memory growth.
+
+Usage: REDIS_URL=redis://localhost:6379/15 python bench_celery_messaging.py [N]
+"""
+import sys
+import time
+import uuid
+
+from kombu import compression, serialization
+
+from src.core.celery_app import celery_app, THRESHOLD_COMPRESSION
+from src.core.redis_client import get_redis
+from src.worker.tasks import convert_document_task
+
+BENCH_QUEUE = "bench_celery_messaging"
+
+PROFILES = [
+    # (name, serializer, compression)
+    ("json (before)", "json", None),
+    ("msgpack + zlib-threshold (after)", "msgpack", THRESHOLD_COMPRESSION),
+]
+
+SAMPLE_ARGS = {
+    "small": ["/app/uploads/3f1c2a9e-0000-4000-8000-000000000000_Ponto_Janeiro_2024.pdf"],
+    "batch": [[f"/app/uploads/{uuid.uuid4()}_Ponto_{i}.pdf" for i in range(200)]],
+}
+
+def encoded_size(args, serializer, codec) -> int:
+    _, _, body = serialization.dumps({"args": args, "kwargs": {}}, serializer=serializer)
+    if codec:
+        body, _ = compression.compress(body, codec)
+    return len(body)
+
+def bench_offline(rounds: int = 20000):
+    print("Encoded message body size / serialization cost")
+    for name, serializer, codec in PROFILES:
+        sizes = {label: encoded_size(args, serializer, codec) for label, args in SAMPLE_ARGS.items()}
+        started = time.perf_counter()
+        for _ in range(rounds):
+            encoded_size(SAMPLE_ARGS["small"], serializer, codec)
+        per_call = (time.perf_counter() - started) / rounds * 1e6
+        print(f"  {name:<34} small={sizes['small']:>5} B  batch={sizes['batch']:>6} B  {per_call:.1f} µs/msg")
+
+def bench_broker(n: int):
+    client = get_redis()
+    try:
+        client.ping()
+    except Exception as e:
+        print(f"Skipping broker benchmark, Redis not reachable: {e}")
+        return
+
+    print(f"\nEnqueue {n} tasks per profile to '{BENCH_QUEUE}'")
+    for name, serializer, codec in PROFILES:
+        client.delete(BENCH_QUEUE)
+        memory_before = client.info("memory")["used_memory"]
+        started = time.perf_counter()
+        for _ in range(n):
+            convert_document_task.apply_async(
+                args=SAMPLE_ARGS["small"], queue=BENCH_QUEUE,
+                serializer=serializer, compression=codec,
+            )
+        elapsed = time.perf_counter() - started
+        memory_after = client.info("memory")["used_memory"]
+        client.delete(BENCH_QUEUE)
+        print(
+            f"  {name:<34} {n / elapsed:>8.0f} msg/s  "
+            f"broker memory +{(memory_after - memory_before) / n:.0f} B/msg"
+        )
+
+    print(f"\nResult expiry: {celery_app.conf.result_expires}s "
+          f"(previously results never expired)")
+
+if __name__ == "__main__":
+    bench_offline()
+    bench_broker(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Per-call latency of outbound HTTP: a new httpx.AsyncClient per call (previous
+TelegramService.download_file / AmmerPayService) vs the shared keep-alive
+clients of src.core.http_clients.
+
+Runs against a local HTTPS stub (self-signed certificate generated on the
+fly), so the difference is the TCP connect + TLS handshake saved per call;
+DNS and network RTT to the real APIs come on top of that.
+
+Usage: python bench_http_clients.py [N]
+"""
+import asyncio
+import datetime
+import ipaddress
+import os
+import ssl
+import sys
+import tempfile
+import time
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from src.core.http_clients import ClientProfile, HttpClientRegistry
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 11\r\n\r\n{\"ok\":true}"
+
+
+def self_signed_cert(directory: str):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+async def stub(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # Minimal HTTP/1.1 keep-alive server: every GET gets the same small JSON
+    try:
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(name, latencies):
+    mean = sum(latencies) / len(latencies)
+    print(f"  {name:<28} mean {mean * 1000:6.2f} ms   p50 {percentile(latencies, 50) * 1000:6.2f} ms"
+          f"   p95 {percentile(latencies, 95) * 1000:6.2f} ms")
+    return mean
+
+
+async def run(n: int):
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = self_signed_cert(directory)
+        server_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_ctx.load_cert_chain(cert_path, key_path)
+        client_ctx = ssl.create_default_context(cafile=cert_path)
+
+        server = await asyncio.start_server(stub, "127.0.0.1", 0, ssl=server_ctx)
+        url = f"https://127.0.0.1:{server.sockets[0].getsockname()[1]}/ping"
+
+        per_call = []
+        for _ in range(n):
+            started = time.perf_counter()
+            async with httpx.AsyncClient(verify=client_ctx) as client:
+                (await client.get(url)).raise_for_status()
+            per_call.append(time.perf_counter() - started)
+
+        registry = HttpClientRegistry()
+        registry.register("stub", ClientProfile("bench", verify=client_ctx))
+        shared = []
+        for _ in range(n):
+            started = time.perf_counter()
+            (await registry.get("stub").get(url)).raise_for_status()
+            shared.append(time.perf_counter() - started)
+        await registry.aclose()
+
+        server.close()
+        await server.wait_closed()
+
+    print(f"{n} sequential GETs against a local HTTPS stub")
+    before = report("new client per call", per_call)
+    after = report("shared keep-alive client", shared)
+    print(f"  saved per call              {(before - after) * 1000:6.2f} ms ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Webhook load test for the database engine profiles.
+
+Drives /telegram/webhook in-process (httpx ASGI transport) with /status updates,
+the command that queries orders on every call, from C concurrent clients.
+Outgoing Telegram calls are replaced by a no-op and updates are handled inline
+(as when the update queue is unavailable), so the numbers reflect the API +
+database path only. Needs a reachable Postgres at DATABASE_URL.
+
+Run once per profile and compare:
+    DB_PROFILE=development python bench_webhook_load.py [N] [C]
+    DB_PROFILE=production  python bench_webhook_load.py [N] [C]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+from prometheus_client import REGISTRY
+
+from src.api.main import app
+from src.api import telegram as telegram_api
+from src.core.config import settings
+from src.core.database import engine
+
+
+async def _no_op(*args, **kwargs):
+    return {"ok": True}
+
+
+async def _not_queued(raw, update):
+    return False
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def status_update(i: int) -> dict:
+    return {
+        "update_id": i,
+        "message": {"message_id": i, "chat": {"id": 100000 + i % 50}, "from": {"first_name": "Bench"}, "text": "/status"},
+    }
+
+
+async def run(n: int, concurrency: int):
+    telegram_api.telegram_service.send_message = _no_op
+    telegram_api.update_queue.enqueue = _not_queued
+    headers = {}
+    if settings.TELEGRAM_WEBHOOK_SECRET:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = settings.TELEGRAM_WEBHOOK_SECRET
+
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(n):
+        queue.put_nowait(i)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Warm the pool and the statement caches before measuring
+        await client.post("/telegram/webhook", json=status_update(0), headers=headers)
+
+        async def worker():
+            while not queue.empty():
+                i = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post("/telegram/webhook", json=status_update(i), headers=headers)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    await engine.dispose()
+
+    print(f"Profile '{settings.DB_PROFILE}': {n} webhook calls, {concurrency} concurrent")
+    print(f"  throughput  {n / elapsed:8.1f} req/s")
+    for pct in (50, 95, 99):
+        print(f"  p{pct:<10} {percentile(latencies, pct) * 1000:8.1f} ms")
+    for event in ("connect", "checkout", "invalidate"):
+        value = REGISTRY.get_sample_value("saas_db_pool_events_total", {"event": event}) or 0
+        print(f"  pool {event:<7}{value:8.0f}")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(run(total, clients))
@@ -1,38 +1,37 @@
 #!/usr/bin/env python3
 """
-Simple migration script for Railway
+Database migration step, run once per deploy before the web processes start
+(Railway preDeployCommand, start.sh). The app itself no longer touches the schema.
+
+Usage: python migrate.py [--status]
 """
 import asyncio
-import os
 import sys
 sys.path.append('/app')
 
-from sqlalchemy import text
 from src.core.database import engine
+from src.core.migrations import LATEST_VERSION, current_version, run_migrations
 
-async def migrate():
-    """Add Ammer Pay fields to orders table"""
-    
-    migrations = [
-        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS ammer_payment_id TEXT;",
-        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS ammer_payment_url TEXT;", 
-        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS payment_method VARCHAR(20) DEFAULT 'ammer_pay';"
-    ]
-    
+async def migrate(status_only: bool = False):
+    """Apply pending migrations (or only report the schema version)"""
     try:
-        async with engine.begin() as conn:
-            for migration in migrations:
-                print(f"Executing: {migration}")
-                await conn.execute(text(migration))
-                print("✅ Success")
-        
-        print("🎉 Migration completed!")
+        if status_only:
+            version = await current_version(engine)
+            print(f"Schema version: {version} (latest: {LATEST_VERSION})")
+            return version == LATEST_VERSION
+
+        applied = await run_migrations(engine)
+        for migration in applied:
+            print(f"✅ {migration.version:04d}_{migration.name}")
+        print(f"🎉 Schema at version {LATEST_VERSION} ({len(applied)} migration(s) applied)")
         return True
         
     except Exception as e:
         print(f"❌ Error: {e}")
         return False
+    finally:
+        await engine.dispose()
 
 if __name__ == "__main__":
-    success = asyncio.run(migrate())
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    success = asyncio.run(migrate(status_only="--status" in sys.argv[1:]))
+    sys.exit(0 if success else 1)
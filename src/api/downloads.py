@@ -0,0 +1,84 @@
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from src.core.config import settings
+from src.services.output_storage import cached_file_sha256, gzip_path
+
+
+def _q_value(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                # Malformed q-value: don't risk sending gzip to a client that may not want it
+                return 0.0
+    return 1.0
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """True se o cliente aceita gzip; uma entrada `gzip` explícita vale mais que `*`."""
+    gzip_q = wildcard_q = None
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if coding == "gzip":
+            gzip_q = _q_value(params)
+        elif coding == "*":
+            wildcard_q = _q_value(params)
+    q = gzip_q if gzip_q is not None else wildcard_q
+    return q is not None and q > 0
+
+
+def _etag_matches(if_none_match: str, sha256: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        # Any representation of the same content is still fresh
+        if tag.strip('"').removesuffix("-gzip") == sha256:
+            return True
+    return False
+
+
+def serve_output(request: Request, path: Path, filename: str, sha256: Optional[str] = None) -> Response:
+    """Entrega um CSV com ETag forte, 304 condicional, gzip pré-comprimido e Range."""
+    if sha256 is None:
+        sha256 = cached_file_sha256(path)
+
+    headers = {
+        "Cache-Control": f"private, max-age={settings.OUTPUT_CACHE_MAX_AGE}",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, sha256):
+        return Response(status_code=304, headers={**headers, "ETag": f'"{sha256}"'})
+
+    # Byte ranges refer to the identity representation, so only whole-file
+    # downloads get the precompressed copy
+    compressed = gzip_path(path)
+    if (
+        "range" not in request.headers
+        and accepts_gzip(request.headers.get("accept-encoding", ""))
+        and compressed.exists()
+    ):
+        return FileResponse(
+            path=compressed,
+            filename=filename,
+            media_type="text/csv",
+            headers={**headers, "ETag": f'"{sha256}-gzip"', "Content-Encoding": "gzip"},
+        )
+
+    return FileResponse(
+        path=path,
+        filename=filename,
+        media_type="text/csv",
+        headers={**headers, "ETag": f'"{sha256}"'},
+    )
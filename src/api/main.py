@@ -1,23 +1,46 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, status
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 import shutil
 from pathlib import Path
 import os
-from celery.result import AsyncResult
+import hashlib
+from contextlib import aclosing
+from celery import group
+from celery.result import AsyncResult, GroupResult
+from starlette.concurrency import run_in_threadpool
+from typing import List
+import uuid
 from datetime import timedelta
+import json
+import time
 
 from src.core.celery_app import celery_app
 from src.core.config import settings
 from src.services.validator import PDFValidatorService
 from src.worker.tasks import convert_document_task
-from src.api.schemas import TaskResponse, ConversionResult, Token
-from src.core.security import create_access_token, get_current_user
+from src.api.schemas import TaskResponse, ConversionResult, Token, BatchResponse, BatchStatus
+from src.core.security import create_access_token, decode_access_token, get_current_user
 from src.core.logging_config import logger
-from src.api.telegram import router as telegram_router
-from src.core.database import engine, Base
+from src.api.telegram import router as telegram_router, process_update
+from src.api.downloads import serve_output
+from src.core.database import engine
+from src.core.migrations import LATEST_VERSION, current_version
+from src.core.http_clients import http_clients
+from src.services.admission import admission_controller
+from src.services.result_notifier import result_notifier, TERMINAL_STATES
+from src.services.inline_converter import inline_converter
+from src.services.result_index import result_index
+from src.services.readiness import readiness
+from src.services.update_queue import update_queue
+from src.core.metrics import CONTENT_TYPE_LATEST, HTTP_REQUEST_SECONDS, observe_db_pool, render_metrics
+from src.domain.entities import DocumentProcessingError
+from src.services.batch import (
+    BatchError, copy_upload, display_name, extract_zip, iter_merged_csv, iter_zip,
+    remove_batch_dir, safe_filename,
+)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -36,9 +59,31 @@ app.add_middleware(
 
 app.include_router(telegram_router)
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template (/result/{task_id}), never by the raw path
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status_code)
+        ).observe(time.perf_counter() - started)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of every API process"""
+    observe_db_pool(engine.pool)
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for load balancers"""
+    """Liveness endpoint for load balancers; dependencies come from the cached readiness snapshot"""
+    snapshot = readiness.snapshot()
     health_status = {
         "status": "healthy",
         "service": "saas-contabil-converter",
@@ -47,10 +92,18 @@ async def health_check():
             "secret_key": bool(settings.SECRET_KEY),
             "telegram_token": bool(settings.TELEGRAM_BOT_TOKEN),
             "database_url": bool(settings.DATABASE_URL)
-        }
+        },
+        "readiness": snapshot["status"],
+        "readiness_age_seconds": snapshot["age_seconds"],
     }
     return health_status
 
+@app.get("/ready")
+async def ready_check():
+    """Readiness endpoint: 503 while a required dependency is down or the snapshot is stale"""
+    snapshot = readiness.snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -66,17 +119,8 @@ async def test_system():
     """Test system components"""
     results = {}
     
-    # Test imports
-    try:
-        from pathlib import Path
-        from src.services.pdf_reader import PDFReader
-        from src.services.csv_writer import CSVWriter
-        from src.services.document_converter import DocumentConverterService
-        from src.services.telegram import TelegramService
-        from src.services.ammer_pay import AmmerPayService
-        results["imports"] = "✅ All imports successful"
-    except Exception as e:
-        results["imports"] = f"❌ Import error: {e}"
+    # Service modules are imported when the app loads, so reaching this point means they import fine
+    results["imports"] = "✅ All imports successful"
     
     # Test directories
     try:
@@ -103,14 +147,16 @@ async def test_system():
     except Exception as e:
         results["configuration"] = f"❌ Config error: {e}"
     
-    # Test database connection
-    try:
-        from sqlalchemy import text
-        async with engine.begin() as conn:
-            await conn.execute(text("SELECT 1"))
+    # Database and other dependencies, from the background readiness checks
+    snapshot = readiness.snapshot()
+    database = snapshot["checks"].get("postgres")
+    if database is None:
+        results["database"] = "⏳ Not checked yet"
+    elif database["ok"]:
         results["database"] = "✅ Connection successful"
-    except Exception as e:
-        results["database"] = f"❌ Database error: {e}"
+    else:
+        results["database"] = f"❌ Database error: {database.get('detail')}"
+    results["dependencies"] = snapshot
     
     return {
         "status": "System Test Results",
@@ -228,16 +274,31 @@ async def startup():
     print(f"📊 Environment: {os.getenv('ENVIRONMENT', 'development')}")
     print(f"🔑 SECRET_KEY configured: {'Yes' if settings.SECRET_KEY else 'No'}")
     print(f"🤖 TELEGRAM_BOT_TOKEN configured: {'Yes' if settings.TELEGRAM_BOT_TOKEN else 'No'}")
-    print(f"🗄️ DATABASE_URL: {settings.DATABASE_URL[:50]}...")
-    
+    print(f"🗄️ DATABASE_URL: {settings.DATABASE_URL[:50]}... (profile: {settings.DB_PROFILE})")
+    # Schema changes run once per deploy (migrate.py); here only a cheap version check
     try:
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        print("✅ Database tables created successfully")
+        version = await current_version(engine)
+        if version == LATEST_VERSION:
+            print(f"✅ Database schema at version {version}")
+        else:
+            print(f"⚠️ Database schema at version {version}, expected {LATEST_VERSION}. Run: python migrate.py")
     except Exception as e:
         print(f"❌ Database error: {e}")
         # Don't exit, let the app start anyway for health check
 
+    # One pub/sub subscription per process feeds every /result push waiter
+    await result_notifier.start()
+    await readiness.start()
+    await update_queue.start(process_update)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await result_notifier.stop()
+    await readiness.stop()
+    await update_queue.stop()
+    await http_clients.aclose()
+    inline_converter.shutdown()
+
 validator_service = PDFValidatorService()
 
 @app.post("/token", response_model=Token)
@@ -275,6 +336,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 @app.post("/convert", response_model=TaskResponse)
 async def convert_document(
     file: UploadFile = File(...), 
+    inline: bool = Query(True, description="Allow small files to be converted and returned immediately"),
     current_user: str = Depends(get_current_user)
 ):
     # SECURITY: Validate file
@@ -305,6 +367,8 @@ async def convert_document(
     # SECURITY: Limit file content size during write
     max_size = settings.MAX_FILE_SIZE
     total_size = 0
+    # Hashed while streaming so validation doesn't read the file a second time
+    digest = hashlib.sha256()
     
     with open(file_path, "wb") as buffer:
         while chunk := await file.read(8192):  # Read in chunks
@@ -314,13 +378,45 @@ async def convert_document(
                 os.remove(file_path)
                 raise HTTPException(status_code=400, detail="File too large")
             buffer.write(chunk)
+            digest.update(chunk)
 
     # Validar
-    if not validator_service.validate(file_path):
+    if not validator_service.validate(file_path, file_hash=digest.hexdigest()):
         logger.warning(f"Validation failed for file: {file.filename}")
         os.remove(file_path)
         raise HTTPException(status_code=404, detail="PDF não cadastrado na base.")
 
+    # Fast path: small files skip the broker round trip and get the CSV right away
+    if inline and settings.INLINE_CONVERSION_ENABLED:
+        try:
+            csv_content = await inline_converter.try_convert(file_path, total_size)
+        except DocumentProcessingError as e:
+            logger.warning(f"Inline conversion failed for file {safe_filename}: {e}")
+            os.remove(file_path)
+            raise HTTPException(status_code=422, detail=str(e))
+        if csv_content is not None:
+            logger.info(f"File {safe_filename} converted inline")
+            os.remove(file_path)
+            return Response(
+                content=csv_content,
+                media_type="text/csv",
+                headers={
+                    "Content-Disposition": f'attachment; filename="{Path(safe_filename).stem}.csv"',
+                    "X-Conversion-Mode": "inline",
+                },
+            )
+
+    # BACKPRESSURE: Only work headed for the queue is admission-controlled; the
+    # inline path above never touches it
+    admission = await admission_controller.check()
+    if not admission.admitted:
+        os.remove(file_path)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Conversion queue is full. Please retry later.",
+            headers={"Retry-After": str(admission.retry_after_seconds)},
+        )
+
     # Disparar tarefa
     task = convert_document_task.delay(str(file_path))
     logger.info(f"Task {task.id} started for file: {file.filename}")
@@ -328,26 +424,41 @@ async def convert_document(
     return TaskResponse(task_id=task.id, status="processing")
 
 
-@app.get("/result/{task_id}")
-async def get_result(
-    task_id: str,
-    current_user: str = Depends(get_current_user)
-):
-    logger.info(f"User {current_user} checked result for task: {task_id}")
+def _stored_task_state(task_id: str):
+    indexed = result_index.lookup(task_id)
+    if indexed is not None:
+        return "SUCCESS", indexed
     task_result = AsyncResult(task_id, app=celery_app)
-
-    if task_result.state == "PENDING":
+    state = task_result.state
+    return state, task_result.result if state in TERMINAL_STATES else None
+
+
+async def _task_state(task_id: str):
+    """Current (state, result) of a conversion task.
+
+    Finished tasks are served from the result index, so repeated reads skip the
+    Celery backend and still work after the backend result has expired. Only an
+    LRU hit is answered on the event loop; sqlite and the backend are read in
+    the threadpool.
+    """
+    indexed = result_index.cached(task_id)
+    if indexed is not None:
+        return "SUCCESS", indexed
+    return await run_in_threadpool(_stored_task_state, task_id)
+
+def _result_response(request: Request, task_id: str, state: str, result_data):
+    """Build the /result response for a task state and its stored result"""
+    if state == "PENDING":
         return {"task_id": task_id, "status": "processing"}
-    elif task_result.state == "FAILURE":
-        logger.error(f"Task {task_id} failed: {task_result.result}")
+    elif state == "FAILURE":
+        logger.error(f"Task {task_id} failed: {result_data}")
         # SECURITY: Don't expose internal error details
         return {
             "task_id": task_id,
             "status": "failed",
             "error": "Processing failed. Please try again or contact support.",
         }
-    elif task_result.state == "SUCCESS":
-        result_data = task_result.result
+    elif state == "SUCCESS":
         if result_data.get("status") == "error":
             logger.error(f"Task {task_id} returned error: {result_data.get('error')}")
             return {
@@ -359,10 +470,11 @@ async def get_result(
         output_path = result_data.get("output_path")
         if output_path and os.path.exists(output_path):
             logger.info(f"Task {task_id} success. Returning file.")
-            return FileResponse(
-                path=output_path,
-                filename=result_data.get("filename"),
-                media_type="text/csv",
+            return serve_output(
+                request,
+                Path(output_path),
+                result_data.get("filename"),
+                result_data.get("sha256"),
             )
         else:
             logger.error(f"Task {task_id} success but output file missing: {output_path}")
@@ -372,4 +484,258 @@ async def get_result(
                 "error": "Output file not found",
             }
 
-    return {"task_id": task_id, "status": task_result.state}
+    return {"task_id": task_id, "status": state}
+
+def _result_event(task_id: str, state: str, result_data) -> dict:
+    """JSON status pushed over SSE/WebSocket; the CSV itself is fetched from /result"""
+    if state not in TERMINAL_STATES:
+        return {"task_id": task_id, "status": "processing"}
+    if state == "SUCCESS" and result_data and result_data.get("status") == "success":
+        return {"task_id": task_id, "status": "completed", "download_url": f"/result/{task_id}"}
+    return {
+        "task_id": task_id,
+        "status": "failed",
+        "error": "Processing failed. Please try again or contact support.",
+    }
+
+async def _result_events(task_id: str):
+    """Yield the current status, then the completion status as soon as the worker
+    publishes it; None is yielded periodically so callers can send keep-alives.
+    After RESULT_PUSH_MAX_WAIT_SECONDS a final "timeout" event ends the stream."""
+    future = result_notifier.register(task_id)
+    try:
+        state, result_data = await _task_state(task_id)
+        if state in TERMINAL_STATES:
+            yield _result_event(task_id, state, result_data)
+            return
+        yield _result_event(task_id, state, None)
+
+        deadline = time.monotonic() + settings.RESULT_PUSH_MAX_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            event = await result_notifier.wait(future, settings.RESULT_PUSH_KEEPALIVE_SECONDS)
+            if event is not None:
+                yield _result_event(task_id, event["state"], event["result"])
+                return
+            yield None
+        # Still running: the client polls /result or subscribes again
+        yield {"task_id": task_id, "status": "timeout"}
+    finally:
+        result_notifier.unregister(task_id, future)
+
+@app.get("/result/{task_id}")
+async def get_result(
+    request: Request,
+    task_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    logger.info(f"User {current_user} checked result for task: {task_id}")
+    state, result_data = await _task_state(task_id)
+    return _result_response(request, task_id, state, result_data)
+
+
+@app.get("/result/{task_id}/wait")
+async def wait_for_result(
+    request: Request,
+    task_id: str,
+    timeout: float = Query(25, ge=0, le=60),
+    current_user: str = Depends(get_current_user)
+):
+    """Long-poll variant of /result: answers as soon as the task finishes or after `timeout` seconds"""
+    logger.info(f"User {current_user} waiting for result of task: {task_id}")
+    future = result_notifier.register(task_id)
+    try:
+        state, result_data = await _task_state(task_id)
+        if state in TERMINAL_STATES:
+            return _result_response(request, task_id, state, result_data)
+        event = await result_notifier.wait(future, timeout)
+    finally:
+        result_notifier.unregister(task_id, future)
+
+    if event is None:
+        return {"task_id": task_id, "status": "processing"}
+    return _result_response(request, task_id, event["state"], event["result"])
+
+
+@app.get("/result/{task_id}/events")
+async def stream_result_events(
+    task_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    """Server-Sent Events stream with the task status"""
+    logger.info(f"User {current_user} subscribed to result events for task: {task_id}")
+
+    async def event_stream():
+        async for event in _result_events(task_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/result/{task_id}/ws")
+async def result_websocket(websocket: WebSocket, task_id: str, token: str = Query(...)):
+    """WebSocket with the task status; browsers can't set headers, so the JWT comes in `token`"""
+    current_user = decode_access_token(token)
+    if current_user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    logger.info(f"User {current_user} opened result websocket for task: {task_id}")
+    try:
+        # aclosing: a disconnect must unregister the waiter now, not when the generator is collected
+        async with aclosing(_result_events(task_id)) as events:
+            async for event in events:
+                # Keep-alives repeat the status; writing to a dead socket raises,
+                # so a closed client is noticed within one keep-alive interval
+                await websocket.send_json(event if event is not None else _result_event(task_id, "PENDING", None))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+def _write_batch(files: List[UploadFile], batch_dir: Path):
+    """Write uploads (or the entries of a single ZIP) to disk"""
+    if len(files) == 1 and Path(files[0].filename or "").suffix.lower() == ".zip":
+        return extract_zip(files[0].file, batch_dir)
+
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise BatchError(f"Too many files. Maximum is {settings.BATCH_MAX_FILES} per batch")
+    staged, skipped = [], []
+    total = 0
+    for upload in files:
+        name = safe_filename(upload.filename or "")
+        if Path(name).suffix.lower() not in settings.ALLOWED_EXTENSIONS:
+            skipped.append(upload.filename or "")
+            continue
+        path = batch_dir / f"{uuid.uuid4()}_{name}"
+        total += copy_upload(upload.file, path, settings.MAX_FILE_SIZE)
+        if total > settings.BATCH_MAX_TOTAL_BYTES:
+            raise BatchError("Batch too large")
+        staged.append(path)
+    return staged, skipped
+
+
+def _stage_batch(files: List[UploadFile], batch_dir: Path):
+    """Write and validate a batch; runs in a worker thread (validation reads every PDF)"""
+    staged, rejected = _write_batch(files, batch_dir)
+    accepted = []
+    for path in staged:
+        if validator_service.validate(path):
+            accepted.append(path)
+        else:
+            rejected.append(display_name(path.name))
+            os.remove(path)
+    return accepted, rejected
+
+
+@app.post("/convert/batch", response_model=BatchResponse)
+async def convert_batch(
+    files: List[UploadFile] = File(...),
+    current_user: str = Depends(get_current_user)
+):
+    """Convert many PDFs (or one ZIP of PDFs) as a single job"""
+    batch_dir = Path(settings.UPLOAD_DIR) / f"batch_{uuid.uuid4()}"
+    batch_dir.mkdir()
+    try:
+        accepted, rejected = await run_in_threadpool(_stage_batch, files, batch_dir)
+    except BatchError as e:
+        remove_batch_dir(batch_dir)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        remove_batch_dir(batch_dir)
+        raise
+
+    if not accepted:
+        remove_batch_dir(batch_dir)
+        raise HTTPException(status_code=404, detail="Nenhum PDF cadastrado na base.")
+
+    # BACKPRESSURE: Admit the whole batch or nothing
+    admission = await admission_controller.check(extra_tasks=len(accepted))
+    if not admission.admitted:
+        remove_batch_dir(batch_dir)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Conversion queue is full. Please retry later.",
+            headers={"Retry-After": str(admission.retry_after_seconds)},
+        )
+
+    job = group(convert_document_task.s(str(path)) for path in accepted).apply_async()
+    # Persist group membership so the job can be restored by id from any process
+    job.save()
+    logger.info(f"User {current_user} started batch {job.id} with {len(accepted)} files")
+
+    return BatchResponse(job_id=job.id, status="processing", files=len(accepted), rejected=rejected)
+
+
+def _restore_batch(job_id: str) -> GroupResult:
+    job = GroupResult.restore(job_id, app=celery_app)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return job
+
+
+async def _batch_status(job: GroupResult) -> BatchStatus:
+    completed = failed = 0
+    for result in job.results:
+        state, data = await _task_state(result.id)
+        if state == "SUCCESS" and (data or {}).get("status") == "success":
+            completed += 1
+        elif state in TERMINAL_STATES:
+            failed += 1
+    total = len(job.results)
+    done = completed + failed == total
+    return BatchStatus(
+        job_id=job.id,
+        status="completed" if done else "processing",
+        total=total,
+        completed=completed,
+        failed=failed,
+    )
+
+
+@app.get("/batch/{job_id}", response_model=BatchStatus)
+async def get_batch_status(
+    job_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    logger.info(f"User {current_user} checked batch: {job_id}")
+    return await _batch_status(_restore_batch(job_id))
+
+
+@app.get("/batch/{job_id}/download")
+async def download_batch(
+    job_id: str,
+    format: str = Query("zip", pattern="^(zip|csv)$"),
+    current_user: str = Depends(get_current_user)
+):
+    """Stream every CSV of a finished batch as a ZIP, or merged into one CSV"""
+    job = _restore_batch(job_id)
+    batch_status = await _batch_status(job)
+    if batch_status.status != "completed":
+        return JSONResponse(status_code=409, content=batch_status.model_dump())
+
+    entries = []
+    for result in job.results:
+        state, data = await _task_state(result.id)
+        if state == "SUCCESS" and data and data.get("status") == "success" and os.path.exists(data["output_path"]):
+            entries.append((display_name(data["filename"]), Path(data["output_path"])))
+
+    logger.info(f"User {current_user} downloading batch {job_id} as {format}")
+    if format == "csv":
+        return StreamingResponse(
+            iter_merged_csv(entries),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="batch_{job_id}.csv"'},
+        )
+    return StreamingResponse(
+        iter_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="batch_{job_id}.zip"'},
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class TaskResponse(BaseModel):
     task_id: str
@@ -14,3 +14,17 @@ class ConversionResult(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+
+
+class BatchResponse(BaseModel):
+    job_id: str
+    status: str
+    files: int
+    rejected: List[str] = []
+
+class BatchStatus(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    completed: int
+    failed: int
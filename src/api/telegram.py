@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Request, Header, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from typing import Awaitable, Callable, Dict
 import uuid
 import os
+import json
 
 from src.core.config import settings
-from src.core.database import get_db
+from src.core.database import LazySession, get_db
 from src.core.logging_config import logger
-from src.services.telegram import TelegramService
+from src.services.outbound_limiter import Priority
+from src.services.telegram import PreparedMessage, TelegramService
 from src.services.ammer_pay import AmmerPayService
-from src.models.order import Order, Payment
+from src.services.admission import admission_controller, format_wait
+from src.services.update_dedup import update_deduplicator
+from src.services.update_queue import update_queue
+from src.models.order import Order, Payment, in_flight_exists, latest_in_flight
 # We will import the task later to avoid circular imports if any, or just import it
 # from src.worker.tasks import process_telegram_order
 
@@ -20,26 +26,56 @@ ammer_pay_service = AmmerPayService()
 @router.post("/telegram/webhook")
 async def telegram_webhook(
     request: Request,
-    x_telegram_bot_api_secret_token: str = Header(None),
-    db: AsyncSession = Depends(get_db)
+    x_telegram_bot_api_secret_token: str = Header(None)
 ):
     # Validate Secret Token
     if settings.TELEGRAM_WEBHOOK_SECRET and x_telegram_bot_api_secret_token != settings.TELEGRAM_WEBHOOK_SECRET:
         logger.warning("Invalid Telegram Secret Token")
         raise HTTPException(status_code=403, detail="Invalid Token")
 
-    update = await request.json()
-    
-    # Handle Commands and Text Messages
-    if "message" in update and "text" in update["message"]:
-        msg = update["message"]
-        chat_id = msg["chat"]["id"]
-        text = msg["text"].strip()
-        user_name = msg.get("from", {}).get("first_name", "Usuário")
-        
-        # Handle /start command
-        if text == "/start":
-            welcome_message = f"""🤖 Olá {user_name}! Bem-vindo ao **SaaS Contabil Converter**!
+    body = await request.body()
+    try:
+        update = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid update")
+
+    # Redeliveries are dropped here, before any DB or outbound work
+    update_id = update.get("update_id")
+    if update_id is not None and not await update_deduplicator.claim(update_id):
+        logger.info(f"Dropping duplicate Telegram update {update_id}")
+        return {"ok": True}
+
+    # Acknowledge right away; handlers run on the update consumers. Telegram
+    # redelivers slow webhooks, so nothing slow may happen before returning.
+    if not await update_queue.enqueue(body, update):
+        # Redis down: handle inline rather than lose the update
+        try:
+            await process_update(update)
+        except Exception:
+            # Let Telegram's redelivery through the de-duplication
+            if update_id is not None:
+                await update_deduplicator.release(update_id)
+            raise
+    return {"ok": True}
+
+
+STATUS_EMOJI = {
+    "pending_payment": "⏳",
+    "paid": "💳",
+    "processing": "⚙️",
+    "completed": "✅",
+    "failed": "❌"
+}
+STATUS_TEXT = {
+    "pending_payment": "Aguardando pagamento",
+    "paid": "Pago - Processando",
+    "processing": "Em processamento",
+    "completed": "Concluído",
+    "failed": "Falhou"
+}
+
+# Static replies are serialized once at import; /start only prepends the greeting
+START_MESSAGE = PreparedMessage("""! Bem-vindo ao **SaaS Contabil Converter**!
 
 📊 **O que eu faço:**
 Converto seus arquivos PDF contábeis para formato CSV de forma rápida, segura e automática.
@@ -61,14 +97,9 @@ Converto seus arquivos PDF contábeis para formato CSV de forma rápida, segura
 /preco - Informações sobre preços
 /status - Verificar suas conversões
 
-🚀 **Pronto para começar?** Envie seu PDF agora!"""
-            
-            await telegram_service.send_message(chat_id, welcome_message)
-            return {"ok": True}
-        
-        # Handle /help command
-        elif text == "/help":
-            help_message = """📚 **Ajuda - SaaS Contabil Converter**
+🚀 **Pronto para começar?** Envie seu PDF agora!""")
+
+HELP_MESSAGE = PreparedMessage("""📚 **Ajuda - SaaS Contabil Converter**
 
 🔍 **Arquivos aceitos:**
 • Apenas arquivos PDF
@@ -91,14 +122,9 @@ Converto seus arquivos PDF contábeis para formato CSV de forma rápida, segura
 • "Arquivo muito grande" → Reduza o tamanho para menos de 10MB
 • "Formato inválido" → Envie apenas arquivos PDF
 
-📞 **Suporte:** Entre em contato se precisar de ajuda!"""
-            
-            await telegram_service.send_message(chat_id, help_message)
-            return {"ok": True}
-        
-        # Handle /preco command
-        elif text == "/preco":
-            price_message = """💰 **Preços - SaaS Contabil Converter**
+📞 **Suporte:** Entre em contato se precisar de ajuda!""")
+
+PRICE_MESSAGE = PreparedMessage("""💰 **Preços - SaaS Contabil Converter**
 
 🏷️ **Conversão PDF → CSV**
 • **Preço:** R$ 50,00 por arquivo
@@ -122,65 +148,18 @@ Converto seus arquivos PDF contábeis para formato CSV de forma rápida, segura
 • Arquivos deletados após conversão
 • Privacidade total
 
-💡 **Dica:** Tenha seu PDF pronto antes de iniciar o pagamento!"""
-            
-            await telegram_service.send_message(chat_id, price_message)
-            return {"ok": True}
-        
-        # Handle /status command
-        elif text == "/status":
-            # Get user's recent orders
-            try:
-                result = await db.execute(
-                    select(Order).where(Order.chat_id == chat_id)
-                    .order_by(Order.created_at.desc()).limit(5)
-                )
-                orders = result.scalars().all()
-                
-                if not orders:
-                    status_message = """📊 **Status das Conversões**
+💡 **Dica:** Tenha seu PDF pronto antes de iniciar o pagamento!""")
+
+NO_ORDERS_MESSAGE = PreparedMessage("""📊 **Status das Conversões**
 
 🔍 **Nenhuma conversão encontrada**
 
 Você ainda não fez nenhuma conversão. 
-Envie um PDF para começar!"""
-                else:
-                    status_message = "📊 **Suas últimas conversões:**\n\n"
-                    for order in orders:
-                        status_emoji = {
-                            "pending_payment": "⏳",
-                            "paid": "💳",
-                            "processing": "⚙️",
-                            "completed": "✅",
-                            "failed": "❌"
-                        }.get(order.status, "❓")
-                        
-                        status_text = {
-                            "pending_payment": "Aguardando pagamento",
-                            "paid": "Pago - Processando",
-                            "processing": "Em processamento",
-                            "completed": "Concluído",
-                            "failed": "Falhou"
-                        }.get(order.status, "Status desconhecido")
-                        
-                        status_message += f"{status_emoji} **{order.file_name}**\n"
-                        status_message += f"   Status: {status_text}\n"
-                        status_message += f"   Data: {order.created_at.strftime('%d/%m/%Y %H:%M')}\n\n"
-                
-                await telegram_service.send_message(chat_id, status_message)
-                return {"ok": True}
-                
-            except Exception as e:
-                logger.error(f"Error getting status for chat {chat_id}: {e}")
-                await telegram_service.send_message(
-                    chat_id, 
-                    "❌ Erro ao buscar status. Tente novamente em alguns instantes."
-                )
-                return {"ok": True}
-        
-        # Handle other text messages
-        else:
-            other_message = """🤖 **Não entendi sua mensagem**
+Envie um PDF para começar!""")
+
+STATUS_ERROR_MESSAGE = PreparedMessage("❌ Erro ao buscar status. Tente novamente em alguns instantes.")
+
+UNKNOWN_MESSAGE = PreparedMessage("""🤖 **Não entendi sua mensagem**
 
 📋 **Comandos disponíveis:**
 /start - Informações principais
@@ -189,10 +168,85 @@ Envie um PDF para começar!"""
 /status - Suas conversões
 
 📄 **Para converter:** Envie um arquivo PDF
-💡 **Dica:** Use os comandos acima para navegar!"""
-            
-            await telegram_service.send_message(chat_id, other_message)
-            return {"ok": True}
+💡 **Dica:** Use os comandos acima para navegar!""")
+
+CommandHandler = Callable[[dict, LazySession], Awaitable[None]]
+COMMANDS: Dict[str, CommandHandler] = {}
+
+
+def command(name: str):
+    """Registra o handler de um comando de texto (ex.: `/status`)."""
+    def register(handler: CommandHandler) -> CommandHandler:
+        COMMANDS[name] = handler
+        return handler
+    return register
+
+
+def static_command(name: str, message: PreparedMessage) -> None:
+    """Comando cuja resposta é sempre a mesma: sem banco, sem serialização."""
+    async def reply(msg: dict, session: LazySession):
+        await telegram_service.send_prepared(msg["chat"]["id"], message)
+    COMMANDS[name] = reply
+
+
+@command("/start")
+async def start_command(msg: dict, session: LazySession):
+    user_name = msg.get("from", {}).get("first_name", "Usuário")
+    await telegram_service.send_prepared(msg["chat"]["id"], START_MESSAGE, prefix=f"🤖 Olá {user_name}")
+
+
+static_command("/help", HELP_MESSAGE)
+static_command("/preco", PRICE_MESSAGE)
+
+
+@command("/status")
+async def status_command(msg: dict, session: LazySession):
+    chat_id = msg["chat"]["id"]
+    # Get user's recent orders
+    try:
+        db = await session.get()
+        result = await db.execute(
+            select(Order).where(Order.chat_id == chat_id)
+            .order_by(Order.created_at.desc()).limit(5)
+        )
+        orders = result.scalars().all()
+    except Exception as e:
+        logger.error(f"Error getting status for chat {chat_id}: {e}")
+        await telegram_service.send_prepared(chat_id, STATUS_ERROR_MESSAGE)
+        return
+
+    if not orders:
+        await telegram_service.send_prepared(chat_id, NO_ORDERS_MESSAGE)
+        return
+
+    status_message = "📊 **Suas últimas conversões:**\n\n"
+    for order in orders:
+        status_emoji = STATUS_EMOJI.get(order.status, "❓")
+        status_text = STATUS_TEXT.get(order.status, "Status desconhecido")
+        status_message += f"{status_emoji} **{order.file_name}**\n"
+        status_message += f"   Status: {status_text}\n"
+        status_message += f"   Data: {order.created_at.strftime('%d/%m/%Y %H:%M')}\n\n"
+
+    await telegram_service.send_message(chat_id, status_message)
+
+
+async def unknown_command(msg: dict, session: LazySession):
+    await telegram_service.send_prepared(msg["chat"]["id"], UNKNOWN_MESSAGE)
+
+
+async def process_update(update: dict):
+    """Entry point of the update consumers; the DB session opens only if a handler needs it."""
+    async with LazySession() as session:
+        return await handle_update(update, session)
+
+
+async def handle_update(update: dict, session: LazySession):
+    # Handle Commands and Text Messages
+    if "message" in update and "text" in update["message"]:
+        msg = update["message"]
+        handler = COMMANDS.get(msg["text"].strip(), unknown_command)
+        await handler(msg, session)
+        return {"ok": True}
     
     # 1. Handle Document (Create Order)
     if "message" in update and "document" in update["message"]:
@@ -217,14 +271,12 @@ Envie um PDF para começar!"""
             await telegram_service.send_message(chat_id, error_message)
             return {"ok": True}
         
-        # Check if user has pending orders (one file at a time)
-        result = await db.execute(
-            select(Order).where(
-                Order.chat_id == chat_id,
-                Order.status.in_(["pending_payment", "paid", "processing"])
-            )
-        )
-        pending_order = result.scalars().first()
+        # Check if user has pending orders (one file at a time); the common case is
+        # a single EXISTS probe, details are only loaded when there is one
+        db = await session.get()
+        pending_order = None
+        if await db.scalar(in_flight_exists(chat_id)):
+            pending_order = (await db.execute(latest_in_flight(chat_id))).first()
         
         if pending_order:
             pending_message = f"""⏳ **Processamento em andamento**
@@ -281,6 +333,21 @@ Este PDF não está registrado em nossa base de dados para conversão.
             await telegram_service.send_message(chat_id, error_message)
             return {"ok": True}
         
+        # BACKPRESSURE: Don't take payment for work we can't finish in time
+        admission = await admission_controller.check()
+        if not admission.admitted:
+            busy_message = f"""⏳ **Estamos com alta demanda**
+
+📊 **Arquivos na fila:** {admission.queue_depth}
+⏱️ **Espera estimada:** {format_wait(admission.estimated_wait_seconds)}
+
+Para não cobrar por uma conversão que não conseguiremos entregar a tempo, seu arquivo **não foi aceito** agora.
+
+🔄 Tente novamente em {format_wait(admission.retry_after_seconds)}."""
+
+            await telegram_service.send_message(chat_id, busy_message)
+            return {"ok": True}
+
         # Create Order
         order_id = uuid.uuid4()
         payload = f"order_{order_id}"
@@ -309,6 +376,7 @@ Este PDF não está registrado em nossa base de dados para conversão.
             id=order_id,
             chat_id=chat_id,
             file_id=file_id,
+            file_unique_id=doc.get("file_unique_id"),
             file_name=file_name,
             file_size=file_size,
             payload=payload,
@@ -354,14 +422,14 @@ Este PDF não está registrado em nossa base de dados para conversão.
             ]]
         }
         
-        await telegram_service.send_message_with_keyboard(chat_id, confirmation_message, keyboard)
+        await telegram_service.send_message_with_keyboard(chat_id, confirmation_message, keyboard, priority=Priority.HIGH)
         
-        # TEST MODE: If this is the test user, simulate payment after 5 seconds
+        # TEST MODE: If this is the test user, simulate payment after a short delay
         if settings.TEST_USER_CHAT_ID and chat_id == settings.TEST_USER_CHAT_ID:
             # Send test mode notification
-            test_message = """🧪 **MODO TESTE ATIVADO**
+            test_message = f"""🧪 **MODO TESTE ATIVADO**
 
-⏰ Pagamento será simulado automaticamente em 5 segundos para testar o fluxo completo.
+⏰ Pagamento será simulado automaticamente em {settings.TEST_PAYMENT_DELAY_SECONDS} segundos para testar o fluxo completo.
 
 💡 Em produção normal, o usuário clicaria no botão de pagamento."""
             
@@ -369,11 +437,14 @@ Este PDF não está registrado em nossa base de dados para conversão.
             
             # Import background task processing
             from src.worker.tasks import simulate_test_payment_task
+            from src.worker.scheduling import schedule_in
             
-            # Schedule test payment simulation using Celery (avoids event loop issues)
-            simulate_test_payment_task.apply_async(
-                args=[str(order_id), chat_id],
-                countdown=5  # Execute after 5 seconds
+            # Schedule test payment simulation using Celery ETA (avoids event loop issues)
+            schedule_in(
+                simulate_test_payment_task,
+                settings.TEST_PAYMENT_DELAY_SECONDS,
+                str(order_id),
+                chat_id,
             )
         
         return {"ok": True}
@@ -392,6 +463,7 @@ Este PDF não está registrado em nossa base de dados para conversão.
         payload = payment_info["invoice_payload"]
         
         # Find Order
+        db = await session.get()
         result = await db.execute(select(Order).where(Order.payload == payload))
         order = result.scalars().first()
         
@@ -431,7 +503,9 @@ Este PDF não está registrado em nossa base de dados para conversão.
         from src.worker.tasks import process_telegram_order
         process_telegram_order.delay(str(order.id))
         
-        await telegram_service.send_message(order.chat_id, "Pagamento confirmado! Iniciando conversão...")
+        await telegram_service.send_message(
+            order.chat_id, "Pagamento confirmado! Iniciando conversão...", priority=Priority.HIGH
+        )
         
         return {"ok": True}
 
@@ -505,7 +579,8 @@ async def ammer_webhook(
             # Notify user
             await telegram_service.send_message(
                 order.chat_id, 
-                "✅ **Pagamento confirmado!** Iniciando conversão do seu arquivo..."
+                "✅ **Pagamento confirmado!** Iniciando conversão do seu arquivo...",
+                priority=Priority.HIGH
             )
             
             logger.info(f"Ammer Pay payment completed for order {order.id}")
@@ -524,7 +599,8 @@ async def ammer_webhook(
                     
                     await telegram_service.send_message(
                         order.chat_id,
-                        "❌ **Pagamento não foi aprovado.** Tente novamente ou entre em contato com o suporte."
+                        "❌ **Pagamento não foi aprovado.** Tente novamente ou entre em contato com o suporte.",
+                        priority=Priority.HIGH
                     )
         
         return {"ok": True}
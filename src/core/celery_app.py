@@ -1,17 +1,49 @@
+import zlib
+
 from celery import Celery
+from kombu import compression
 from src.core.config import settings
 
+# Threshold compression: small messages (most task args are a path or an id)
+# aren't worth the CPU, so only bodies above the threshold are deflated.
+# A one-byte marker tells the decoder which branch was taken.
+THRESHOLD_COMPRESSION = "zlib-threshold"
+_RAW, _DEFLATED = b"\x00", b"\x01"
+
+def compress_above_threshold(body: bytes) -> bytes:
+    if len(body) < settings.CELERY_COMPRESSION_THRESHOLD:
+        return _RAW + body
+    return _DEFLATED + zlib.compress(body)
+
+def decompress_above_threshold(body: bytes) -> bytes:
+    marker, payload = body[:1], body[1:]
+    return zlib.decompress(payload) if marker == _DEFLATED else payload
+
+compression.register(
+    compress_above_threshold,
+    decompress_above_threshold,
+    "application/x-saas-zlib-threshold",
+    aliases=[THRESHOLD_COMPRESSION],
+)
+
 celery_app = Celery(
     "worker",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=["src.worker.tasks"]
+    include=["src.worker.tasks", "src.worker.warmup", "src.worker.heartbeat"]
 )
 
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    task_serializer=settings.CELERY_SERIALIZER,
+    # Keep accepting JSON so messages enqueued before a deploy still run
+    accept_content=[settings.CELERY_SERIALIZER, "json"],
+    result_serializer=settings.CELERY_SERIALIZER,
+    result_accept_content=[settings.CELERY_SERIALIZER, "json"],
+    task_compression=THRESHOLD_COMPRESSION,
+    result_expires=settings.CELERY_RESULT_EXPIRES,
     timezone="America/Sao_Paulo",
     enable_utc=True,
+    broker_transport_options={"visibility_timeout": settings.CELERY_VISIBILITY_TIMEOUT},
+    # Only takes effect when the worker runs with --autoscale=MAX,MIN
+    worker_autoscaler="src.worker.autoscale:BacklogAutoscaler",
 )
@@ -1,8 +1,87 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import os
+from typing import Mapping, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from src.core.config import settings
+from src.core.metrics import DB_POOL_EVENTS_TOTAL
+
+# Engine profiles. Any DB_* environment variable below overrides the profile value.
+DB_PROFILES = {
+    "development": {
+        "echo": True,
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_cache_size": 100,
+    },
+    "production": {
+        "echo": False,
+        "pool_size": 10,
+        "max_overflow": 10,
+        # Fail fast instead of queueing webhook requests behind a starved pool
+        "pool_timeout": 10,
+        # Recycle before managed Postgres/proxies drop idle connections
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_cache_size": 500,
+    },
+    # Celery prefork children run one task at a time
+    "worker": {
+        "echo": False,
+        "pool_size": 1,
+        "max_overflow": 2,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "statement_cache_size": 500,
+    },
+}
+
+_OVERRIDES = {
+    "echo": ("DB_ECHO", lambda v: v.lower() == "true"),
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", float),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda v: v.lower() == "true"),
+    # Set to 0 behind PgBouncer in transaction mode
+    "statement_cache_size": ("DB_STATEMENT_CACHE_SIZE", int),
+}
+
+
+def engine_options(profile: str, url: str = settings.DATABASE_URL, env: Mapping[str, str] = os.environ) -> dict:
+    """Argumentos de `create_async_engine` para um perfil, com os overrides do ambiente."""
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}'. Use one of: {', '.join(DB_PROFILES)}")
+    options = dict(DB_PROFILES[profile])
+    for key, (var, parse) in _OVERRIDES.items():
+        if env.get(var):
+            options[key] = parse(env[var])
+
+    statement_cache_size = options.pop("statement_cache_size")
+    if "+asyncpg" in url:
+        # SQLAlchemy's prepared statement cache per connection; asyncpg's own cache follows it
+        options["connect_args"] = {
+            "prepared_statement_cache_size": statement_cache_size,
+            "statement_cache_size": statement_cache_size,
+        }
+    return options
+
+
+def instrument_pool(engine: AsyncEngine) -> None:
+    """Conta eventos do pool (conexões novas, checkouts, invalidações)."""
+    pool = engine.sync_engine.pool
+    for name in ("connect", "checkout", "checkin", "invalidate"):
+        counter = DB_POOL_EVENTS_TOTAL.labels(name)
+        event.listen(pool, name, lambda *args, _counter=counter: _counter.inc())
+
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+engine = create_async_engine(settings.DATABASE_URL, **engine_options(settings.DB_PROFILE))
+instrument_pool(engine)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
@@ -10,3 +89,31 @@ Base = declarative_base()
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+class LazySession:
+    """Sessão criada só quando algum handler pede por ela (`await lazy.get()`).
+
+    Handlers que não usam o banco não abrem sessão nem tocam no pool.
+    """
+
+    def __init__(self, factory=None):
+        self._factory = factory or AsyncSessionLocal
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    async def get(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    async def __aenter__(self) -> "LazySession":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
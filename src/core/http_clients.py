@@ -0,0 +1,87 @@
+import asyncio
+import ssl
+import weakref
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Union
+
+import httpx
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.metrics import InstrumentedTransport, default_operation
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass
+class ClientProfile:
+    service: str
+    base_url: str = ""
+    operation: Callable[[httpx.Request], str] = default_operation
+    read_timeout: float = 30.0
+    headers: Dict[str, str] = field(default_factory=dict)
+    verify: Union[bool, str, ssl.SSLContext] = True
+
+
+class HttpClientRegistry:
+    """Clientes httpx compartilhados (keep-alive) por serviço externo.
+
+    Um cliente por serviço e por event loop: conexões httpx não podem ser
+    usadas fora do loop em que foram abertas. A API fecha os clientes no
+    shutdown e os workers ao encerrar o processo.
+    """
+
+    def __init__(self):
+        self._profiles: Dict[str, ClientProfile] = {}
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def register(self, name: str, profile: ClientProfile) -> None:
+        self._profiles[name] = profile
+
+    def _build(self, profile: ClientProfile) -> httpx.AsyncClient:
+        http2 = settings.HTTP2_ENABLED and HTTP2_AVAILABLE
+        if settings.HTTP2_ENABLED and not HTTP2_AVAILABLE:
+            logger.warning("HTTP2_ENABLED set but h2 is not installed; using HTTP/1.1")
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            profile.read_timeout,
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+            pool=settings.HTTP_CONNECT_TIMEOUT,
+        )
+        # With a custom transport the client ignores limits/http2: they go to the transport
+        transport = InstrumentedTransport(
+            profile.service, profile.operation, limits=limits, http2=http2, verify=profile.verify
+        )
+        return httpx.AsyncClient(
+            base_url=profile.base_url, headers=profile.headers, timeout=timeout, transport=transport
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        clients = self._clients.setdefault(loop, {})
+        client = clients.get(name)
+        if client is None or client.is_closed:
+            client = clients[name] = self._build(self._profiles[name])
+        return client
+
+    async def aclose(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Fecha os clientes do loop atual (conexões ociosas são encerradas de forma limpa)."""
+        clients = self._clients.pop(loop or asyncio.get_running_loop(), {})
+        for name, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP client {name}: {e}")
+
+
+http_clients = HttpClientRegistry()
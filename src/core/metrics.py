@@ -0,0 +1,171 @@
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# prometheus_client picks its storage at import time: with PROMETHEUS_MULTIPROC_DIR
+# set, every process (uvicorn workers, Celery prefork children) writes its samples
+# to files in that directory and the exporter aggregates them on scrape.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+import httpx
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+from src.core.logging_config import logger
+
+# Conversions take seconds, HTTP calls milliseconds; one bucket set covers both
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "saas_http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+CONVERSION_STAGE_SECONDS = Histogram(
+    "saas_conversion_stage_duration_seconds",
+    "Time spent in each stage of a PDF -> CSV conversion",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+TASKS_TOTAL = Counter(
+    "saas_celery_tasks_total",
+    "Finished Celery tasks by task name and outcome",
+    ["task", "outcome"],
+)
+CELERY_QUEUE_DEPTH = Gauge(
+    "saas_celery_queue_depth",
+    "Messages waiting in the Celery queue, as last sampled by the API (readiness loop or admission)",
+    multiprocess_mode="mostrecent",
+)
+OUTBOUND_REQUEST_SECONDS = Histogram(
+    "saas_outbound_request_duration_seconds",
+    "Latency of calls to external services",
+    ["service", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_ERRORS_TOTAL = Counter(
+    "saas_outbound_request_errors_total",
+    "External calls that failed (transport error or HTTP status >= 400)",
+    ["service", "operation"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "saas_db_pool_connections",
+    "Database pool connections by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_EVENTS_TOTAL = Counter(
+    "saas_db_pool_events_total",
+    "Database pool events (connect, checkout, checkin, invalidate)",
+    ["event"],
+)
+CACHE_REQUESTS_TOTAL = Counter(
+    "saas_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss); hit ratio = hit / (hit + miss)",
+    ["cache", "result"],
+)
+
+
+@contextmanager
+def observe_stage(stage: str):
+    """Mede um estágio da conversão (leitura, escrita, finalização)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        CONVERSION_STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS_TOTAL.labels(cache, "hit" if hit else "miss").inc()
+
+
+def observe_db_pool(pool) -> None:
+    """Atualiza os gauges do pool do SQLAlchemy (chamado a cada scrape)."""
+    try:
+        DB_POOL_CONNECTIONS.labels("checked_out").set(pool.checkedout())
+        DB_POOL_CONNECTIONS.labels("idle").set(pool.checkedin())
+        DB_POOL_CONNECTIONS.labels("overflow").set(max(pool.overflow(), 0))
+    except AttributeError:
+        # NullPool and friends don't keep connections around
+        pass
+
+
+def default_operation(request: httpx.Request) -> str:
+    # Only the first path segment, so ids never end up in label values
+    segments = [s for s in request.url.path.split("/") if s]
+    return f"{request.method} {segments[0] if segments else '/'}"
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """Transporte httpx que registra latência e erros de cada chamada externa."""
+
+    def __init__(self, service: str, operation: Callable[[httpx.Request], str] = default_operation, **kwargs):
+        super().__init__(**kwargs)
+        self.service = service
+        self.operation = operation
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        operation = self.operation(request)
+        started = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            OUTBOUND_ERRORS_TOTAL.labels(self.service, operation).inc()
+            raise
+        finally:
+            OUTBOUND_REQUEST_SECONDS.labels(self.service, operation).observe(time.perf_counter() - started)
+        if response.status_code >= 400:
+            OUTBOUND_ERRORS_TOTAL.labels(self.service, operation).inc()
+        return response
+
+
+def _registry() -> Optional[CollectorRegistry]:
+    if not MULTIPROC_DIR:
+        return None
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> bytes:
+    """Texto no formato do Prometheus com as métricas de todos os processos."""
+    registry = _registry()
+    return generate_latest(registry) if registry else generate_latest()
+
+
+def reset_multiproc_dir() -> None:
+    """Apaga amostras de uma execução anterior; só antes de criar os processos filhos."""
+    if not MULTIPROC_DIR:
+        return
+    shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def mark_process_dead(pid: int) -> None:
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+def start_exporter(port: int) -> None:
+    """Exporta as métricas por HTTP para processos sem API (worker do Celery)."""
+    registry = _registry()
+    if registry:
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
+    logger.info(f"Metrics exporter listening on :{port}")
+
@@ -0,0 +1,191 @@
+import re
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.core.logging_config import logger
+
+SCHEMA_VERSION_TABLE = "schema_version"
+# pg_advisory_lock key shared by every deploy, so only one runner applies migrations
+MIGRATION_LOCK_KEY = 7_340_210_001
+_CONCURRENT_INDEX = re.compile(r"INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+
+
+class MigrationError(Exception):
+    """Migração que não pode ser registrada como aplicada (ex.: índice INVALID)."""
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    """Uma versão do schema: comandos SQL aplicados uma única vez, em ordem.
+
+    `transactional=False` é para comandos que o Postgres não aceita dentro de
+    uma transação (CREATE INDEX CONCURRENTLY). Eles rodam em autocommit, um a
+    um, e por isso precisam ser idempotentes (IF NOT EXISTS).
+    """
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+    transactional: bool = True
+
+
+MIGRATIONS: List[Migration] = [
+    # Baseline: what create_all produced before versioning, so existing
+    # databases adopt the runner without changes
+    Migration(1, "initial_schema", (
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id UUID PRIMARY KEY,
+            chat_id INTEGER NOT NULL,
+            file_id TEXT NOT NULL,
+            file_name TEXT,
+            file_size INTEGER,
+            file_hash TEXT,
+            price_cents INTEGER NOT NULL,
+            currency VARCHAR(3),
+            payload TEXT,
+            status VARCHAR(20),
+            provider_payment_id TEXT,
+            telegram_payment_id TEXT,
+            pdf_path TEXT,
+            csv_path TEXT,
+            error TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS payments (
+            id UUID PRIMARY KEY,
+            order_id UUID REFERENCES orders (id),
+            amount_cents INTEGER,
+            currency VARCHAR(3),
+            provider_payload JSONB,
+            status VARCHAR(20),
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+        """,
+    )),
+    # Previously migrate.py / migration_ammer_pay.py
+    Migration(2, "ammer_pay_fields", (
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS ammer_payment_id TEXT",
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS ammer_payment_url TEXT",
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS payment_method VARCHAR(20) DEFAULT 'ammer_pay'",
+    )),
+    # Hot-path indexes, built without locking writes. A failed build (e.g. a
+    # duplicate payload) leaves an INVALID index: the runner drops it and fails.
+    Migration(3, "orders_hot_path_indexes", (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_chat_id_created_at ON orders (chat_id, created_at DESC)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_orders_in_flight ON orders (chat_id) "
+        "WHERE status IN ('pending_payment', 'paid', 'processing')",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_orders_payload ON orders (payload)",
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_orders_ammer_payment_id ON orders (ammer_payment_id)",
+    ), transactional=False),
+    Migration(4, "orders_file_unique_id", (
+        "ALTER TABLE orders ADD COLUMN IF NOT EXISTS file_unique_id TEXT",
+    )),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def pending_migrations(applied: Iterable[int], migrations: List[Migration] = MIGRATIONS) -> List[Migration]:
+    applied = set(applied)
+    return [m for m in migrations if m.version not in applied]
+
+
+async def _ensure_version_table(conn) -> None:
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} ("
+        "version INTEGER PRIMARY KEY, "
+        "name TEXT NOT NULL, "
+        "applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now())"
+    ))
+
+
+async def _record(conn, migration: Migration) -> None:
+    await conn.execute(
+        text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, name) VALUES (:version, :name)"),
+        {"version": migration.version, "name": migration.name},
+    )
+
+
+async def _apply(engine: AsyncEngine, migration: Migration) -> None:
+    if migration.transactional:
+        # Statements and the version row commit together, or not at all
+        async with engine.begin() as conn:
+            for statement in migration.statements:
+                await conn.execute(text(statement))
+            await _record(conn, migration)
+        return
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for statement in migration.statements:
+            index = _CONCURRENT_INDEX.search(statement)
+            try:
+                await conn.execute(text(statement))
+            except Exception:
+                if index:
+                    await _drop_invalid_index(conn, index.group(1))
+                raise
+            if index and await _drop_invalid_index(conn, index.group(1)):
+                raise MigrationError(
+                    f"Migration {migration.version:04d}: index {index.group(1)} was left INVALID and dropped; "
+                    "fix the data and deploy again"
+                )
+        await _record(conn, migration)
+
+
+async def _drop_invalid_index(conn, name: str) -> bool:
+    """Remove o índice `name` se um CREATE INDEX CONCURRENTLY o deixou INVALID.
+
+    IF NOT EXISTS pularia o índice quebrado no próximo deploy, então ele não
+    pode sobreviver à falha.
+    """
+    valid = await conn.scalar(
+        text("SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"),
+        {"name": name},
+    )
+    if valid is None or valid:
+        return False
+    logger.error(f"Dropping INVALID index {name}")
+    await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    return True
+
+
+async def run_migrations(engine: AsyncEngine, migrations: List[Migration] = MIGRATIONS) -> List[Migration]:
+    """Aplica as migrações pendentes e devolve as que foram aplicadas.
+
+    Um advisory lock de sessão serializa execuções concorrentes (várias réplicas
+    ou deploys sobrepostos); quem chega depois só encontra tudo aplicado.
+    """
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            await _ensure_version_table(lock_conn)
+            result = await lock_conn.execute(text(f"SELECT version FROM {SCHEMA_VERSION_TABLE}"))
+            pending = pending_migrations([row[0] for row in result], migrations)
+
+            for migration in pending:
+                started = time.perf_counter()
+                logger.info(f"Applying migration {migration.version:04d}_{migration.name}")
+                await _apply(engine, migration)
+                logger.info(f"Applied migration {migration.version:04d} in {time.perf_counter() - started:.2f}s")
+            return pending
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+async def current_version(engine: AsyncEngine) -> Optional[int]:
+    """Versão aplicada do schema (uma consulta), ou None se o banco nunca foi migrado."""
+    async with engine.connect() as conn:
+        exists = await conn.scalar(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": SCHEMA_VERSION_TABLE})
+        if not exists:
+            return None
+        return await conn.scalar(text(f"SELECT max(version) FROM {SCHEMA_VERSION_TABLE}"))
@@ -0,0 +1,20 @@
+import redis
+import redis.asyncio as aioredis
+from src.core.config import settings
+
+# Shared clients, created lazily so importing this module never opens a connection.
+# The sync client is used by Celery workers, the async one by the API event loop.
+_sync_client = None
+_async_client = None
+
+def get_redis() -> redis.Redis:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+    return _sync_client
+
+def get_async_redis() -> aioredis.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+    return _async_client
@@ -1,16 +1,31 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, Index, exists, select, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
 from src.core.database import Base
 
+# Orders that still block a new upload from the same chat. Kept as literal SQL so the
+# partial index predicate and the query match even with prepared (generic) plans.
+IN_FLIGHT_STATUSES = ("pending_payment", "paid", "processing")
+IN_FLIGHT_PREDICATE = "status IN ('pending_payment', 'paid', 'processing')"
+
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # /status: latest orders of a chat
+        Index("ix_orders_chat_id_created_at", "chat_id", text("created_at DESC")),
+        # Document upload: does this chat have an order in flight?
+        Index("ix_orders_in_flight", "chat_id", postgresql_where=text(IN_FLIGHT_PREDICATE)),
+        # successful_payment / Ammer Pay lookups; NULLs don't collide
+        Index("uq_orders_payload", "payload", unique=True),
+        Index("uq_orders_ammer_payment_id", "ammer_payment_id", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     chat_id = Column(Integer, nullable=False)
     file_id = Column(Text, nullable=False)
+    file_unique_id = Column(Text)  # stable across resends, unlike file_id
     file_name = Column(Text)
     file_size = Column(Integer)
     file_hash = Column(Text)
@@ -45,3 +60,15 @@ class Payment(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     order = relationship("Order", back_populates="payments")
+
+def in_flight_exists(chat_id: int):
+    """SELECT EXISTS(...) for an in-flight order of `chat_id` (served by ix_orders_in_flight)."""
+    return select(exists().where(Order.chat_id == chat_id, text(IN_FLIGHT_PREDICATE)))
+
+def latest_in_flight(chat_id: int):
+    return (
+        select(Order.file_name, Order.status)
+        .where(Order.chat_id == chat_id, text(IN_FLIGHT_PREDICATE))
+        .order_by(Order.created_at.desc())
+        .limit(1)
+    )
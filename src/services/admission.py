@@ -0,0 +1,147 @@
+import math
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.metrics import CELERY_QUEUE_DEPTH
+from src.core.redis_client import get_redis, get_async_redis
+
+# Default Celery queue (kombu's Redis transport stores it as a plain list)
+CELERY_QUEUE_KEY = "celery"
+TASK_LATENCY_KEY = "saas_contabil:task_latency"
+# Hash of worker hostname -> "pool_size|max_pool_size|expires_at", published by the autoscaler
+WORKER_POOL_KEY = "saas_contabil:worker_pool"
+
+
+@dataclass(frozen=True)
+class AdmissionDecision:
+    """Resultado da avaliação de admissão de uma nova conversão."""
+    admitted: bool
+    queue_depth: int
+    estimated_wait_seconds: float
+    retry_after_seconds: int = 0
+
+
+def record_task_latency(seconds: float) -> None:
+    """Registra a duração de uma tarefa de conversão (chamado pelo worker)."""
+    try:
+        pipe = get_redis().pipeline()
+        pipe.lpush(TASK_LATENCY_KEY, f"{seconds:.3f}")
+        pipe.ltrim(TASK_LATENCY_KEY, 0, settings.ADMISSION_LATENCY_WINDOW - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to record task latency: {e}")
+
+
+class AdmissionControllerService:
+    """Decide se novas conversões podem ser aceitas com base na fila do Celery."""
+
+    def __init__(
+        self,
+        max_queue_depth: int = settings.ADMISSION_MAX_QUEUE_DEPTH,
+        max_wait_seconds: float = settings.ADMISSION_MAX_WAIT_SECONDS,
+        concurrency: int = settings.ADMISSION_WORKER_CONCURRENCY,
+        default_task_seconds: float = settings.ADMISSION_DEFAULT_TASK_SECONDS,
+        sample_interval: float = settings.ADMISSION_SAMPLE_INTERVAL,
+    ):
+        self.max_queue_depth = max_queue_depth
+        self.max_wait_seconds = max_wait_seconds
+        self.concurrency = max(1, concurrency)
+        self.default_task_seconds = default_task_seconds
+        self.sample_interval = sample_interval
+        self._sampled_at = 0.0
+        self._queue_depth = 0
+        self._task_seconds = default_task_seconds
+        self._pool_concurrency = None
+
+    def average_task_seconds(self, latencies: List[float]) -> float:
+        """Duração média recente das tarefas, ou o valor padrão sem amostras."""
+        if not latencies:
+            return self.default_task_seconds
+        return sum(latencies) / len(latencies)
+
+    def live_concurrency(self, pool_sizes: dict) -> Optional[int]:
+        """Soma a capacidade dos autoscalers que ainda não expiraram.
+
+        Conta o tamanho máximo de cada pool, não o atual: um pool ocioso no
+        mínimo cresce até o máximo em um intervalo de amostragem, bem antes de
+        uma rajada de pedidos esperar o tempo estimado com o pool pequeno.
+        """
+        now = time.time()
+        total = 0
+        for raw in pool_sizes.values():
+            fields = raw.decode().split("|")
+            # Older workers publish "pool_size|expires_at"
+            size, expires_at = fields[-2], fields[-1]
+            if float(expires_at or 0) > now:
+                total += int(size)
+        return total or None
+
+    def decide(self, queue_depth: int, task_seconds: float, extra_tasks: int = 1) -> AdmissionDecision:
+        """Avalia a admissão de `extra_tasks` novas tarefas dado o estado da fila."""
+        concurrency = self._pool_concurrency or self.concurrency
+        backlog = queue_depth + extra_tasks
+        estimated_wait = backlog * task_seconds / concurrency
+
+        over_depth = backlog - self.max_queue_depth
+        over_wait = estimated_wait - self.max_wait_seconds
+        if over_depth <= 0 and over_wait <= 0:
+            return AdmissionDecision(True, queue_depth, estimated_wait)
+
+        # Tempo até a fila drenar o suficiente para voltar abaixo dos limites
+        drain_seconds = max(
+            over_depth * task_seconds / concurrency,
+            over_wait,
+        )
+        retry_after = max(1, math.ceil(drain_seconds))
+        return AdmissionDecision(False, queue_depth, estimated_wait, retry_after)
+
+    async def _sample(self) -> None:
+        now = time.monotonic()
+        if now - self._sampled_at < self.sample_interval:
+            return
+        self._sampled_at = now
+        client = get_async_redis()
+        pipe = client.pipeline()
+        pipe.llen(CELERY_QUEUE_KEY)
+        pipe.lrange(TASK_LATENCY_KEY, 0, -1)
+        pipe.hgetall(WORKER_POOL_KEY)
+        queue_depth, raw_latencies, pool_sizes = await pipe.execute()
+        self._queue_depth = int(queue_depth)
+        CELERY_QUEUE_DEPTH.set(self._queue_depth)
+        self._task_seconds = self.average_task_seconds([float(v) for v in raw_latencies])
+        # Autoscaled workers report their real pool size; fall back to the static setting
+        self._pool_concurrency = self.live_concurrency(pool_sizes)
+
+    async def check(self, extra_tasks: int = 1) -> AdmissionDecision:
+        """Amostra a fila (no máximo uma vez por intervalo) e decide a admissão."""
+        try:
+            await self._sample()
+        except Exception as e:
+            # Fail open: without Redis the enqueue itself will fail loudly anyway
+            logger.warning(f"Admission sampling failed, admitting request: {e}")
+            return AdmissionDecision(True, 0, 0.0)
+
+        decision = self.decide(self._queue_depth, self._task_seconds, extra_tasks)
+        if not decision.admitted:
+            logger.warning(
+                f"Admission rejected: queue_depth={decision.queue_depth}, "
+                f"estimated_wait={decision.estimated_wait_seconds:.0f}s"
+            )
+        return decision
+
+
+def format_wait(seconds: float) -> str:
+    """Formata uma duração em texto curto para mensagens ao usuário."""
+    minutes = math.ceil(seconds / 60)
+    if minutes <= 1:
+        return "cerca de 1 minuto"
+    if minutes < 60:
+        return f"cerca de {minutes} minutos"
+    hours = minutes / 60
+    return f"cerca de {hours:.1f} horas"
+
+
+admission_controller = AdmissionControllerService()
@@ -5,6 +5,15 @@ import json
 from typing import Dict, Any, Optional
 from src.core.config import settings
 from src.core.logging_config import logger
+from src.core.http_clients import ClientProfile, http_clients
+
+
+def ammer_operation(request: httpx.Request) -> str:
+    # POST /v1/payments creates, GET /v1/payments/<id> polls; ids stay out of labels
+    return "create_payment" if request.method == "POST" else "get_payment"
+
+
+http_clients.register("ammer_pay", ClientProfile("ammer_pay", operation=ammer_operation, read_timeout=30.0))
 
 
 class AmmerPayService:
@@ -73,30 +82,29 @@ class AmmerPayService:
                 "Content-Type": "application/json"
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/payments",
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
+            client = http_clients.get("ammer_pay")
+            response = await client.post(
+                f"{self.base_url}/payments",
+                json=payload,
+                headers=headers
+            )
+            
+            if response.status_code == 201:
+                result = response.json()
+                logger.info(f"Ammer Pay link created for order {external_id}")
+                return {
+                    "success": True,
+                    "payment_url": result.get("payment_url"),
+                    "payment_id": result.get("id"),
+                    "qr_code": result.get("qr_code")
+                }
+            else:
+                logger.error(f"Ammer Pay error: {response.status_code} - {response.text}")
+                return {
+                    "success": False,
+                    "error": f"Payment service error: {response.status_code}"
+                }
                 
-                if response.status_code == 201:
-                    result = response.json()
-                    logger.info(f"Ammer Pay link created for order {external_id}")
-                    return {
-                        "success": True,
-                        "payment_url": result.get("payment_url"),
-                        "payment_id": result.get("id"),
-                        "qr_code": result.get("qr_code")
-                    }
-                else:
-                    logger.error(f"Ammer Pay error: {response.status_code} - {response.text}")
-                    return {
-                        "success": False,
-                        "error": f"Payment service error: {response.status_code}"
-                    }
-                    
         except Exception as e:
             logger.error(f"Ammer Pay integration error: {e}")
             # Fallback to test mode if there's a connection error
@@ -118,19 +126,18 @@ class AmmerPayService:
                 "Content-Type": "application/json"
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/payments/{payment_id}",
-                    headers=headers,
-                    timeout=30.0
-                )
+            client = http_clients.get("ammer_pay")
+            response = await client.get(
+                f"{self.base_url}/payments/{payment_id}",
+                headers=headers
+            )
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.error(f"Ammer Pay status error: {response.status_code}")
+                return {"status": "unknown"}
                 
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    logger.error(f"Ammer Pay status error: {response.status_code}")
-                    return {"status": "unknown"}
-                    
         except Exception as e:
             logger.error(f"Ammer Pay status check error: {e}")
             return {"status": "error"}
@@ -0,0 +1,145 @@
+import csv
+import io
+import re
+import shutil
+import uuid
+import zipfile
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+from src.core.config import settings
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BatchError(Exception):
+    """Erro de validação de um lote enviado (arquivo inválido, limites excedidos)."""
+    pass
+
+
+def safe_filename(name: str) -> str:
+    # SECURITY: Strip directories and unsafe characters (zip entries may contain "../")
+    name = Path(name.replace("\\", "/")).name
+    return re.sub(r'[^a-zA-Z0-9._-]', '_', name)[:100]
+
+
+def display_name(stored_name: str) -> str:
+    """Remove o prefixo UUID usado para tornar os nomes únicos no disco."""
+    prefix, sep, rest = stored_name.partition("_")
+    return rest if sep and len(prefix) == 36 else stored_name
+
+
+def extract_zip(archive: BinaryIO, dest_dir: Path) -> Tuple[List[Path], List[str]]:
+    """Extrai os PDFs de um ZIP para `dest_dir`, uma entrada por vez.
+
+    O arquivo é lido pelo diretório central e cada entrada é copiada em blocos,
+    então nem o ZIP nem as entradas ficam inteiros em memória. Retorna os
+    caminhos extraídos e os nomes das entradas ignoradas.
+    """
+    extracted, skipped = [], []
+    total = 0
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                name = safe_filename(info.filename)
+                if Path(name).suffix.lower() not in settings.ALLOWED_EXTENSIONS:
+                    skipped.append(info.filename)
+                    continue
+                if len(extracted) >= settings.BATCH_MAX_FILES:
+                    raise BatchError(f"Too many files. Maximum is {settings.BATCH_MAX_FILES} per batch")
+
+                path = dest_dir / f"{uuid.uuid4()}_{name}"
+                written = 0
+                with zf.open(info) as src, open(path, "wb") as dst:
+                    # SECURITY: Count real decompressed bytes, the header sizes can lie (zip bombs)
+                    while chunk := src.read(CHUNK_SIZE):
+                        written += len(chunk)
+                        total += len(chunk)
+                        if written > settings.MAX_FILE_SIZE or total > settings.BATCH_MAX_TOTAL_BYTES:
+                            raise BatchError("Archive content too large")
+                        dst.write(chunk)
+                extracted.append(path)
+    except zipfile.BadZipFile:
+        raise BatchError("Invalid ZIP archive")
+    except (RuntimeError, NotImplementedError, zlib.error, EOFError) as e:
+        # Encrypted entries, unsupported compression or a corrupt stream
+        raise BatchError(f"Unsupported ZIP archive: {type(e).__name__}")
+    return extracted, skipped
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino não-seekable para o zipfile; acumula bytes até serem drenados."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries: Iterable[Tuple[str, Path]]) -> Iterator[bytes]:
+    """Gera um ZIP em streaming a partir de pares (nome no arquivo, caminho)."""
+    sink = _ChunkSink()
+    used_names = set()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for arcname, path in entries:
+            # Keep entry names unique when two uploads had the same name
+            base, counter = arcname, 1
+            while arcname in used_names:
+                arcname = f"{Path(base).stem}_{counter}{Path(base).suffix}"
+                counter += 1
+            used_names.add(arcname)
+
+            with open(path, "rb") as src, zf.open(arcname, "w") as dst:
+                while chunk := src.read(CHUNK_SIZE):
+                    dst.write(chunk)
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_merged_csv(entries: Iterable[Tuple[str, Path]]) -> Iterator[bytes]:
+    """Gera um único CSV com o cabeçalho uma vez e a coluna "Arquivo" de origem."""
+    header_written = False
+    for name, path in entries:
+        buffer = io.StringIO(newline="")
+        writer = csv.writer(buffer, delimiter=";")
+        with open(path, newline="", encoding="utf-8") as src:
+            reader = csv.reader(src, delimiter=";")
+            header = next(reader, None)
+            if header is None:
+                continue
+            if not header_written:
+                writer.writerow(["Arquivo"] + header)
+                header_written = True
+            for row in reader:
+                writer.writerow([name] + row)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def copy_upload(src: BinaryIO, dest: Path, max_size: int) -> int:
+    """Copia um upload para o disco em blocos, respeitando `max_size`."""
+    written = 0
+    with open(dest, "wb") as dst:
+        while chunk := src.read(CHUNK_SIZE):
+            written += len(chunk)
+            if written > max_size:
+                raise BatchError("File too large")
+            dst.write(chunk)
+    return written
+
+
+def remove_batch_dir(path: Path) -> None:
+    shutil.rmtree(path, ignore_errors=True)
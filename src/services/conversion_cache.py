@@ -0,0 +1,128 @@
+import asyncio
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.metrics import record_cache
+from src.core.redis_client import get_async_redis
+from src.services.document_converter import CONVERTER_VERSION
+
+# Telegram file_unique_id -> "<CONVERTER_VERSION>:<SHA-256 of the PDF it names>"
+CONVERSION_UNIQUE_PREFIX = "saas_contabil:conversion_unique:"
+
+
+class ConversionCacheService:
+    """CSVs já gerados, endereçados pelo SHA-256 do PDF de origem.
+
+    Os arquivos ficam em CONVERSION_CACHE_DIR (compartilhado por workers e
+    API). O Redis guarda o `file_unique_id` do Telegram -> hash, então um PDF
+    reenviado é reconhecido antes de qualquer download. Entradas expiram após
+    CONVERSION_CACHE_TTL_SECONDS e valem só para o CONVERTER_VERSION que as
+    gerou.
+    """
+
+    def __init__(
+        self,
+        directory: str = settings.CONVERSION_CACHE_DIR,
+        ttl_seconds: int = settings.CONVERSION_CACHE_TTL_SECONDS,
+    ):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self._last_prune = 0.0
+
+    def _path(self, file_hash: str) -> Path:
+        return self.directory / f"{CONVERTER_VERSION}-{file_hash}.csv"
+
+    def _read(self, file_hash: str) -> Optional[bytes]:
+        path = self._path(file_hash)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_seconds:
+                return None
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def _write(self, file_hash: str, output: Union[bytes, Path]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename: readers never see a partial CSV
+        tmp = self._path(file_hash).with_suffix(f".{os.getpid()}.tmp")
+        if isinstance(output, bytes):
+            tmp.write_bytes(output)
+        else:
+            shutil.copyfile(output, tmp)
+        os.replace(tmp, self._path(file_hash))
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    async def get(self, file_hash: str) -> Optional[bytes]:
+        """CSV já convertido para o PDF com este SHA-256, se houver."""
+        output = await asyncio.to_thread(self._read, file_hash)
+        record_cache("conversion", output is not None)
+        return output
+
+    async def get_by_unique_id(self, file_unique_id: str) -> Optional[Tuple[str, bytes]]:
+        """(hash, CSV) de um arquivo do Telegram já convertido, sem baixá-lo."""
+        try:
+            value = await get_async_redis().get(f"{CONVERSION_UNIQUE_PREFIX}{file_unique_id}")
+        except Exception as e:
+            logger.warning(f"Conversion cache lookup failed: {e}")
+            return None
+        value = value.decode() if isinstance(value, bytes) else value
+        version, _, file_hash = (value or "").rpartition(":")
+        if version != CONVERTER_VERSION:
+            record_cache("conversion_unique", False)
+            if value:
+                # Written by another converter version: let link() index it again
+                await self._unlink(file_unique_id)
+            return None
+        output = await asyncio.to_thread(self._read, file_hash)
+        record_cache("conversion_unique", output is not None)
+        return (file_hash, output) if output is not None else None
+
+    async def put(self, file_hash: str, output: Union[bytes, Path], file_unique_id: Optional[str] = None) -> None:
+        """Guarda o CSV (bytes ou caminho) e associa o `file_unique_id` ao hash."""
+        try:
+            await asyncio.to_thread(self._write, file_hash, output)
+            if time.monotonic() - self._last_prune > 3600:
+                self._last_prune = time.monotonic()
+                await asyncio.to_thread(self._prune)
+        except OSError as e:
+            logger.warning(f"Failed to cache conversion {file_hash}: {e}")
+            return
+        if file_unique_id:
+            await self.link(file_unique_id, file_hash)
+
+    async def link(self, file_unique_id: str, file_hash: str) -> None:
+        """Associa um `file_unique_id` do Telegram ao hash do PDF.
+
+        Uma associação existente não é renovada: ela expira junto com o CSV que indica.
+        """
+        try:
+            await get_async_redis().set(
+                f"{CONVERSION_UNIQUE_PREFIX}{file_unique_id}",
+                f"{CONVERTER_VERSION}:{file_hash}",
+                ex=self.ttl_seconds,
+                nx=True,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to index file_unique_id {file_unique_id}: {e}")
+
+    async def _unlink(self, file_unique_id: str) -> None:
+        try:
+            await get_async_redis().delete(f"{CONVERSION_UNIQUE_PREFIX}{file_unique_id}")
+        except Exception as e:
+            logger.warning(f"Failed to drop file_unique_id {file_unique_id}: {e}")
+
+
+conversion_cache = ConversionCacheService()
@@ -1,34 +1,43 @@
 import csv
+import io
 from datetime import datetime
 from pathlib import Path
 import re
 
 from src.domain.entities import Document, DocumentWriteError
 
+# Tabelas e regexes compiladas uma única vez por processo (não a cada documento)
+MONTH_MAP = {
+    "JANEIRO": "01",
+    "FEVEREIRO": "02",
+    "MARÇO": "03",
+    "ABRIL": "04",
+    "MAIO": "05",
+    "JUNHO": "06",
+    "JULHO": "07",
+    "AGOSTO": "08",
+    "SETEMBRO": "09",
+    "OUTUBRO": "10",
+    "NOVEMBRO": "11",
+    "DEZEMBRO": "12",
+}
+
+MONTH_YEAR_RE = re.compile(r"([A-Z][A-Za-zÇç]+)\s*/\s*(\d{4})")
+LINE_RE = re.compile(r"(\d{2})\s+((?:\d{2}:\d{2}/\d{2}:\d{2}\s*){1,4})\s+(\d{2}:\d{2})(?:\s+(.+?))?$")
+TIME_PAIR_RE = re.compile(r"(\d{2}:\d{2}/\d{2}:\d{2})")
+DATE_RE = re.compile(r"(\d{2}/\d{2}/\d{4})")
+TIME_RE = re.compile(r"(\d{2}:\d{2})")
+
 
 class CSVWriter:
     """Implementação de escritor de documentos em formato CSV para dados de ponto."""
 
     def __init__(self):
-        self.month_map = {
-            "JANEIRO": "01",
-            "FEVEREIRO": "02",
-            "MARÇO": "03",
-            "ABRIL": "04",
-            "MAIO": "05",
-            "JUNHO": "06",
-            "JULHO": "07",
-            "AGOSTO": "08",
-            "SETEMBRO": "09",
-            "OUTUBRO": "10",
-            "NOVEMBRO": "11",
-            "DEZEMBRO": "12",
-        }
+        self.month_map = MONTH_MAP
 
     def extract_month_year(self, text: str) -> tuple[str, str]:
         """Extrai mês e ano do texto usando regex."""
-        pattern = r"([A-Z][A-Za-zÇç]+)\s*/\s*(\d{4})"
-        match = re.search(pattern, text)
+        match = MONTH_YEAR_RE.search(text)
         if match:
             month_name, year = match.groups()
             month_number = self.month_map.get(month_name.upper())
@@ -48,18 +57,15 @@ class CSVWriter:
         self, text: str, month: str, year: str
     ) -> list[list[str]]:
         """Extrai registros de ponto do texto com mês e ano conhecidos."""
-        line_pattern = r"(\d{2})\s+((?:\d{2}:\d{2}/\d{2}:\d{2}\s*){1,4})\s+(\d{2}:\d{2})(?:\s+(.+?))?$"
-        time_pattern = r"(\d{2}:\d{2}/\d{2}:\d{2})"
-
         records = []
 
         for line in text.split("\n"):
-            match = re.search(line_pattern, line.strip())
+            match = LINE_RE.search(line.strip())
             if match:
                 day = match.group(1)
                 time_pairs = match.group(2).strip()
 
-                times = re.findall(time_pattern, time_pairs)
+                times = TIME_PAIR_RE.findall(time_pairs)
                 entries_exits = []
                 for pair in times:
                     entry, exit = pair.split("/")
@@ -82,21 +88,18 @@ class CSVWriter:
         records = []
 
         # Captura qualquer linha com data no formato DD/MM/AAAA seguida de 4 horários no formato HH:MM
-        date_pattern = r"(\d{2}/\d{2}/\d{4})"
-        time_pattern = r"(\d{2}:\d{2})"
-
         for line in text.split("\n"):
             # Pula linhas com FOLGA
             if "FOLGA" in line:
                 continue
 
             # Procura por uma data no formato DD/MM/AAAA na linha
-            date_match = re.search(date_pattern, line)
+            date_match = DATE_RE.search(line)
             if date_match:
                 date = date_match.group(1)
 
                 # Procura por todos os horários no formato HH:MM na linha
-                times = re.findall(time_pattern, line)
+                times = TIME_RE.findall(line)
 
                 # Se encontrou pelo menos 4 horários, usa-os como entrada1, saída1, entrada2, saída2
                 if len(times) >= 4:
@@ -125,6 +128,15 @@ class CSVWriter:
 
     def write(self, document: Document, output_path: Path) -> None:
         """Escreve os dados de ponto em formato CSV."""
+        content = self.render(document)
+        try:
+            with open(output_path, "w", newline="", encoding="utf-8") as file:
+                file.write(content)
+        except Exception as e:
+            raise DocumentWriteError(f"Erro ao escrever arquivo CSV: {str(e)}")
+
+    def render(self, document: Document) -> str:
+        """Gera o conteúdo CSV dos dados de ponto em memória."""
         try:
             headers = [
                 "Data",
@@ -168,10 +180,11 @@ class CSVWriter:
             # Ordena os registros por data
             all_records.sort(key=lambda x: datetime.strptime(x[0], "%d/%m/%Y"))
 
-            with open(output_path, "w", newline="", encoding="utf-8") as file:
-                writer = csv.writer(file, delimiter=";")
-                writer.writerow(headers)
-                writer.writerows(all_records)
+            buffer = io.StringIO(newline="")
+            writer = csv.writer(buffer, delimiter=";")
+            writer.writerow(headers)
+            writer.writerows(all_records)
+            return buffer.getvalue()
 
         except Exception as e:
             raise DocumentWriteError(f"Erro ao escrever arquivo CSV: {str(e)}")
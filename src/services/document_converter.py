@@ -1,20 +1,28 @@
 from pathlib import Path
-from typing import Protocol
+from typing import BinaryIO, Optional, Protocol, Union
 
+from src.core.metrics import observe_stage
 from src.domain.entities import Document
 
+# Bump whenever the reader or writer changes the CSV produced for the same PDF:
+# cached conversions are keyed by it, so outputs of older versions stop being served
+CONVERTER_VERSION = "1"
+
 
 # Definindo protocolos implícitos para tipagem, se desejado, ou apenas usando duck typing.
 # Para manter simples e parecido com o original, mas sem ports explícitos em arquivos separados.
 
 class DocumentReader(Protocol):
-    def read(self, file_path: Path) -> Document:
+    def read(self, file_path: Union[Path, BinaryIO], name: Optional[str] = None) -> Document:
         ...
 
 class DocumentWriter(Protocol):
     def write(self, document: Document, output_path: Path) -> None:
         ...
 
+    def render(self, document: Document) -> str:
+        ...
+
 
 class DocumentConverterService:
     """Serviço de conversão de documentos."""
@@ -25,5 +33,14 @@ class DocumentConverterService:
 
     def convert(self, input_path: Path, output_path: Path) -> None:
         """Converte um documento do formato de entrada para o formato de saída."""
-        document = self.reader.read(input_path)
-        self.writer.write(document, output_path)
+        with observe_stage("read"):
+            document = self.reader.read(input_path)
+        with observe_stage("write"):
+            self.writer.write(document, output_path)
+
+    def render(self, input_path: Union[Path, BinaryIO], name: Optional[str] = None) -> str:
+        """Converte um documento (arquivo ou stream) e devolve o resultado em memória, sem gravar arquivo."""
+        with observe_stage("read"):
+            document = self.reader.read(input_path, name)
+        with observe_stage("render"):
+            return self.writer.render(document)
@@ -0,0 +1,69 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.domain.entities import DocumentReadError
+from src.services.csv_writer import CSVWriter
+from src.services.document_converter import DocumentConverterService
+from src.services.pdf_reader import PDFReader
+
+
+class InlineConversionService:
+    """Converte PDFs pequenos dentro do processo da API, sem passar pelo Celery.
+
+    O pool é limitado; quando está cheio, ou o arquivo é grande demais,
+    `try_convert` devolve None e o chamador segue pelo caminho assíncrono.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = settings.INLINE_CONVERSION_WORKERS,
+        max_bytes: int = settings.INLINE_CONVERSION_MAX_BYTES,
+        max_pages: int = settings.INLINE_CONVERSION_MAX_PAGES,
+    ):
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.pdf_reader = PDFReader()
+        self.converter = DocumentConverterService(self.pdf_reader, CSVWriter())
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inline-convert")
+        self._in_flight = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self._in_flight >= self.max_workers
+
+    def _convert(self, input_path: Path) -> Optional[str]:
+        try:
+            if self.pdf_reader.count_pages(input_path) > self.max_pages:
+                return None
+        except DocumentReadError:
+            # Let the worker path produce the usual error result
+            return None
+        return self.converter.render(input_path)
+
+    async def try_convert(self, input_path: Path, size: int) -> Optional[str]:
+        """Converte e devolve o CSV, ou None se o arquivo não se qualifica ou o pool está cheio.
+
+        Erros de conversão (DocumentProcessingError) são propagados.
+        """
+        if size > self.max_bytes or self.saturated:
+            return None
+
+        # Counter is only touched from the event loop, so no lock is needed
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._convert, input_path)
+        finally:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        logger.info("Shutting down inline conversion pool")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+inline_converter = InlineConversionService()
@@ -0,0 +1,194 @@
+import asyncio
+import time
+from collections import OrderedDict
+from enum import IntEnum
+from typing import Dict, Optional
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.redis_client import get_async_redis
+
+TELEGRAM_RATE_PREFIX = "saas_contabil:telegram_rate:"
+
+
+class Priority(IntEnum):
+    # HIGH may spend the whole global bucket; the others leave the reserve untouched
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+# Takes one token from the global and the chat bucket, or none and returns the wait in ms
+# (negative while the chat is paused by a 429). Uses the server clock so every process
+# refills the buckets the same way.
+_ACQUIRE = """
+local pause = redis.call('pttl', KEYS[3])
+if pause > 0 then return -pause end
+local clock = redis.call('time')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local function level(key, rate, burst)
+    local state = redis.call('hmget', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    return math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+end
+
+local g_rate, g_burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local c_rate, c_burst = tonumber(ARGV[3]), tonumber(ARGV[4])
+local floor = 1 + tonumber(ARGV[5])
+local g, c = level(KEYS[1], g_rate, g_burst), level(KEYS[2], c_rate, c_burst)
+
+local wait = 0
+if g < floor then wait = math.ceil((floor - g) * 1000 / g_rate) end
+if c < 1 then wait = math.max(wait, math.ceil((1 - c) * 1000 / c_rate)) end
+if wait > 0 then return wait end
+
+redis.call('hset', KEYS[1], 'tokens', g - 1, 'ts', now)
+redis.call('pexpire', KEYS[1], 60000)
+redis.call('hset', KEYS[2], 'tokens', c - 1, 'ts', now)
+redis.call('pexpire', KEYS[2], math.ceil(c_burst * 1000 / c_rate) + 1000)
+return 0
+"""
+
+
+class TokenBucket:
+    """Balde de tokens em memória (usado quando o Redis não responde)."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def level(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def wait_for(self, floor: float = 1) -> float:
+        """Segundos até haver `floor` tokens (0 se já há)."""
+        missing = floor - self.level()
+        return max(0.0, missing / self.rate)
+
+
+class OutboundRateLimiter:
+    """Limita os envios ao Telegram: balde global (~30 msg/s) e um balde por chat.
+
+    Os baldes vivem no Redis e valem para todos os processos (API e workers).
+    Mensagens de prioridade menor deixam uma reserva no balde global para as
+    urgentes (confirmações de pagamento, entregas). Um 429 pausa o chat pelo
+    `retry_after` indicado pelo Telegram. Sem Redis, cada processo segue com
+    baldes locais.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = settings.TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = settings.TELEGRAM_CHAT_RATE,
+        chat_burst: float = settings.TELEGRAM_CHAT_BURST,
+        reserve: float = settings.TELEGRAM_PRIORITY_RESERVE,
+        max_wait: float = settings.TELEGRAM_SEND_MAX_WAIT,
+        local_chats: int = 10000,
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.local_chats = local_chats
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._paused: Dict[int, float] = {}
+
+    def _floor(self, priority: Priority) -> float:
+        return 0 if priority == Priority.HIGH else self.reserve * priority
+
+    def _keys(self, chat_id: int):
+        return (
+            f"{TELEGRAM_RATE_PREFIX}global",
+            f"{TELEGRAM_RATE_PREFIX}chat:{chat_id}",
+            f"{TELEGRAM_RATE_PREFIX}pause:{chat_id}",
+        )
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            if len(self._chats) > self.local_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    def _try_local(self, chat_id: int, priority: Priority) -> float:
+        paused = self._paused.get(chat_id, 0) - time.monotonic()
+        if paused > 0:
+            return -paused
+        self._paused.pop(chat_id, None)
+        chat = self._chat_bucket(chat_id)
+        wait = max(self._global.wait_for(1 + self._floor(priority)), chat.wait_for())
+        if wait == 0:
+            self._global.tokens -= 1
+            chat.tokens -= 1
+        return wait
+
+    async def try_acquire(self, chat_id: int, priority: Priority = Priority.NORMAL) -> float:
+        """Pega um token para `chat_id`; devolve 0 ou quantos segundos esperar.
+
+        Um valor negativo indica que o chat está pausado por um 429 (espera = -valor).
+        """
+        try:
+            wait_ms = await get_async_redis().eval(
+                _ACQUIRE, 3, *self._keys(chat_id),
+                self.global_rate, self.global_rate, self.chat_rate, self.chat_burst, self._floor(priority),
+            )
+            return int(wait_ms) / 1000
+        except Exception as e:
+            logger.warning(f"Telegram rate limit degraded to local buckets: {e}")
+            return self._try_local(chat_id, priority)
+
+    async def acquire(self, chat_id: int, priority: Priority = Priority.NORMAL) -> None:
+        """Espera a vez de enviar.
+
+        Passado `max_wait` esperando pelos baldes, envia assim mesmo (melhor que
+        perder a mensagem). Uma pausa de 429 é sempre respeitada: o Telegram
+        recusaria o envio de qualquer forma.
+        """
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            wait = await self.try_acquire(chat_id, priority)
+            if wait == 0:
+                return
+            if wait < 0:
+                # The pause doesn't eat into the bucket wait budget
+                deadline += -wait
+                await asyncio.sleep(-wait)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Sending to {chat_id} without a rate limit token after {self.max_wait}s")
+                return
+            await asyncio.sleep(min(wait, remaining))
+
+    async def pause(self, chat_id: int, retry_after: float) -> None:
+        """Respeita o `retry_after` de um 429: nenhum processo envia para o chat até lá."""
+        self._paused[chat_id] = time.monotonic() + retry_after
+        try:
+            await get_async_redis().set(self._keys(chat_id)[2], "1", px=int(retry_after * 1000))
+        except Exception as e:
+            logger.warning(f"Failed to share Telegram pause for {chat_id}: {e}")
+
+
+def retry_after(response) -> Optional[float]:
+    """`parameters.retry_after` de uma resposta 429 do Telegram."""
+    if response.status_code != 429:
+        return None
+    try:
+        return float(response.json().get("parameters", {}).get("retry_after", 1))
+    except Exception:
+        return 1.0
+
+
+outbound_limiter = OutboundRateLimiter()
@@ -0,0 +1,43 @@
+import gzip
+import hashlib
+import shutil
+from functools import lru_cache
+from pathlib import Path
+
+CHUNK_SIZE = 64 * 1024
+GZIP_SUFFIX = ".gz"
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1024)
+def _cached_sha256(path: str, mtime_ns: int, size: int) -> str:
+    # mtime/size are part of the key so a rewritten file is hashed again
+    return file_sha256(Path(path))
+
+
+def cached_file_sha256(path: Path) -> str:
+    """Hash de um arquivo, memorizado enquanto ele não mudar no disco."""
+    stat = path.stat()
+    return _cached_sha256(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def gzip_path(csv_path: Path) -> Path:
+    return csv_path.with_name(csv_path.name + GZIP_SUFFIX)
+
+
+def finalize_output(csv_path: Path) -> dict:
+    """Calcula hash e tamanho do CSV e grava a versão gzip ao lado dele.
+
+    Feito uma única vez, na escrita; cada download depois só escolhe o arquivo.
+    """
+    sha256 = file_sha256(csv_path)
+    with open(csv_path, "rb") as src, gzip.GzipFile(gzip_path(csv_path), "wb", mtime=0) as dst:
+        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return {"sha256": sha256, "size": csv_path.stat().st_size}
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import BinaryIO, Optional, Union
 import PyPDF2
 
 from src.domain.entities import Document, Page, DocumentReadError
@@ -10,28 +11,40 @@ class PDFReader:
     def __init__(self):
         pass
 
-    def read(self, file_path: Path) -> Document:
-        """Lê um documento PDF e extrai seu conteúdo."""
+    def read(self, file_path: Union[str, Path, BinaryIO], name: Optional[str] = None) -> Document:
+        """Lê um documento PDF (caminho ou stream binário, ex.: BytesIO) e extrai seu conteúdo."""
         try:
-            pages = []
+            if isinstance(file_path, (str, Path)):
+                with open(file_path, "rb") as file:
+                    pages = self._extract_pages(file)
+                return Document(pages=pages, name=name or Path(file_path).stem)
+            return Document(pages=self._extract_pages(file_path), name=name or "document")
 
-            # Abrir PDF para leitura normal de texto
-            with open(file_path, "rb") as file:
-                pdf_reader = PyPDF2.PdfReader(file)
+        except Exception as e:
+            raise DocumentReadError(f"Erro ao ler arquivo PDF: {str(e)}")
 
-                for page_num in range(len(pdf_reader.pages)):
-                    # Extrair texto normalmente
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text().strip()
+    def _extract_pages(self, file: BinaryIO) -> list[Page]:
+        pages = []
+        pdf_reader = PyPDF2.PdfReader(file)
 
-                    pages.append(
-                        Page(
-                            content=text,
-                            page_number=page_num + 1,
-                        )
-                    )
+        for page_num in range(len(pdf_reader.pages)):
+            # Extrair texto normalmente
+            page = pdf_reader.pages[page_num]
+            text = page.extract_text().strip()
 
-            return Document(pages=pages, name=file_path.stem)
+            pages.append(
+                Page(
+                    content=text,
+                    page_number=page_num + 1,
+                )
+            )
 
+        return pages
+
+    def count_pages(self, file_path: Path) -> int:
+        """Conta as páginas sem extrair texto."""
+        try:
+            with open(file_path, "rb") as file:
+                return len(PyPDF2.PdfReader(file).pages)
         except Exception as e:
             raise DocumentReadError(f"Erro ao ler arquivo PDF: {str(e)}")
@@ -0,0 +1,163 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from src.core.config import settings
+from src.core.database import engine
+from src.core.logging_config import logger
+from src.core.metrics import CELERY_QUEUE_DEPTH
+from src.core.redis_client import get_async_redis, get_redis
+from src.services.admission import CELERY_QUEUE_KEY
+
+# Hash of worker hostname -> unix time of its last heartbeat
+WORKER_HEARTBEAT_KEY = "saas_contabil:worker_heartbeat"
+
+Check = Callable[[], Awaitable[Optional[str]]]
+
+
+class CheckFailed(Exception):
+    """Falha de uma verificação cuja mensagem pode aparecer no snapshot público."""
+    pass
+
+
+def publish_worker_heartbeat(hostname: str) -> None:
+    """Registra que o worker `hostname` está vivo (chamado pelo worker)."""
+    try:
+        get_redis().hset(WORKER_HEARTBEAT_KEY, hostname, f"{time.time():.0f}")
+    except Exception as e:
+        logger.warning(f"Failed to publish worker heartbeat: {e}")
+
+
+def clear_worker_heartbeat(hostname: str) -> None:
+    try:
+        get_redis().hdel(WORKER_HEARTBEAT_KEY, hostname)
+    except Exception as e:
+        logger.warning(f"Failed to clear worker heartbeat: {e}")
+
+
+async def check_postgres() -> Optional[str]:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return None
+
+
+async def check_redis() -> Optional[str]:
+    await get_async_redis().ping()
+    return None
+
+
+async def check_workers() -> Optional[str]:
+    heartbeats = await get_async_redis().hgetall(WORKER_HEARTBEAT_KEY)
+    cutoff = time.time() - settings.WORKER_HEARTBEAT_TTL
+    alive = sum(1 for value in heartbeats.values() if float(value) > cutoff)
+    if not alive:
+        raise CheckFailed("no worker heartbeat")
+    return f"{alive} alive"
+
+
+async def check_queue() -> Optional[str]:
+    # Keeps the queue depth gauge fresh even when no conversion asks for admission
+    depth = await get_async_redis().llen(CELERY_QUEUE_KEY)
+    CELERY_QUEUE_DEPTH.set(depth)
+    return f"{depth} queued"
+
+
+class ReadinessService:
+    """Verifica as dependências em segundo plano e guarda o último resultado.
+
+    As rotas de health/readiness só leem o snapshot, então respondem em tempo
+    constante e não abrem conexões a cada sonda do load balancer.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.READINESS_CHECK_INTERVAL,
+        timeout: float = settings.READINESS_CHECK_TIMEOUT,
+        stale_after: float = settings.READINESS_STALE_AFTER,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self._checks: Dict[str, Tuple[Check, bool]] = {}
+        self._results: Dict[str, dict] = {}
+        self._checked_at: Optional[float] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def add_check(self, name: str, check: Check, required: bool = True) -> None:
+        """Registra uma verificação; as opcionais aparecem no snapshot mas não afetam o status."""
+        self._checks[name] = (check, required)
+
+    async def _run(self, name: str, check: Check, required: bool) -> dict:
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(check(), self.timeout)
+            ok = True
+        except asyncio.TimeoutError:
+            ok, detail = False, f"timed out after {self.timeout:g}s"
+        except CheckFailed as e:
+            ok, detail = False, str(e)
+        except Exception as e:
+            # SECURITY: Driver messages carry hosts, ports and database names; the
+            # snapshot is served unauthenticated, so it only gets the error type
+            logger.warning(f"Readiness check {name} failed: {e}")
+            ok, detail = False, type(e).__name__
+        result = {"ok": ok, "required": required, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+        if detail:
+            result["detail"] = detail
+        return result
+
+    async def refresh(self) -> None:
+        names = list(self._checks)
+        results = await asyncio.gather(*(self._run(name, *self._checks[name]) for name in names))
+        self._results = dict(zip(names, results))
+        self._checked_at = time.time()
+
+    def snapshot(self) -> dict:
+        """Último resultado das verificações, com a idade do snapshot."""
+        if self._checked_at is None:
+            return {"status": "starting", "ready": False, "stale": True, "age_seconds": None, "checks": {}}
+
+        age = time.time() - self._checked_at
+        stale = age > self.stale_after
+        ready = not stale and all(r["ok"] for r in self._results.values() if r["required"])
+        return {
+            "status": "ready" if ready else "not_ready",
+            "ready": ready,
+            "stale": stale,
+            "age_seconds": round(age, 1),
+            "checks": self._results,
+        }
+
+    async def start(self) -> None:
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The snapshot just goes stale; the next round tries again
+                logger.warning(f"Readiness checks failed to run: {e}")
+            await asyncio.sleep(self.interval)
+
+
+readiness = ReadinessService()
+readiness.add_check("postgres", check_postgres)
+readiness.add_check("redis", check_redis)
+# Conversions queue up while workers are down, so they don't take the API out of rotation
+readiness.add_check("workers", check_workers, required=False)
+readiness.add_check("queue", check_queue, required=False)
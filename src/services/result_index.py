@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.metrics import record_cache
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_results (
+    task_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    output_path TEXT,
+    filename TEXT,
+    sha256 TEXT,
+    size INTEGER,
+    error TEXT,
+    created_at REAL NOT NULL
+)
+"""
+
+_COLUMNS = ("status", "output_path", "filename", "sha256", "size", "error")
+
+
+class ResultIndexService:
+    """Índice durável task_id -> resultado da conversão, guardado ao lado dos CSVs.
+
+    É gravado pelo worker e lido pela API através de um LRU em memória, de modo
+    que consultas repetidas não tocam no backend do Celery e continuam
+    funcionando depois que o resultado expira lá.
+    """
+
+    def __init__(self, db_path: str = settings.RESULT_INDEX_PATH, cache_size: int = settings.RESULT_INDEX_CACHE_SIZE):
+        self.db_path = Path(db_path)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            # WAL lets the API read while a worker is writing
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, task_id: str, result: dict) -> None:
+        with self._lock:
+            self._cache[task_id] = result
+            self._cache.move_to_end(task_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def record(self, task_id: str, result: dict) -> None:
+        """Grava o resultado final de uma tarefa (chamado pelo worker)."""
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO task_results "
+                "(task_id, status, output_path, filename, sha256, size, error, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (task_id, *(result.get(column) for column in _COLUMNS), time.time()),
+            )
+        except sqlite3.Error as e:
+            # The Celery backend still has the result, so this is not fatal
+            logger.warning(f"Failed to index result of task {task_id}: {e}")
+            return
+        self._remember(task_id, result)
+
+    def cached(self, task_id: str) -> Optional[dict]:
+        """Resultado no LRU em memória; não faz I/O, pode ser chamado no event loop."""
+        with self._lock:
+            cached = self._cache.get(task_id)
+            if cached is not None:
+                self._cache.move_to_end(task_id)
+        record_cache("result_index", cached is not None)
+        return cached
+
+    def lookup(self, task_id: str) -> Optional[dict]:
+        """Resultado gravado no sqlite (bloqueante: rodar fora do event loop)."""
+        # Don't create the database from the read side
+        if not self.db_path.exists():
+            return None
+        try:
+            row = self._connection().execute(
+                "SELECT status, output_path, filename, sha256, size, error FROM task_results WHERE task_id = ?",
+                (task_id,),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Result index lookup failed for task {task_id}: {e}")
+            return None
+        if row is None:
+            # Misses are not cached: the task may still finish
+            return None
+
+        result = {column: value for column, value in zip(_COLUMNS, row) if value is not None}
+        self._remember(task_id, result)
+        return result
+
+    def get(self, task_id: str) -> Optional[dict]:
+        """Resultado no mesmo formato retornado pela tarefa, ou None se ainda não indexado."""
+        cached = self.cached(task_id)
+        return cached if cached is not None else self.lookup(task_id)
+
+
+result_index = ResultIndexService()
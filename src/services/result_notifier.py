@@ -0,0 +1,113 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.redis_client import get_redis
+
+TASK_EVENTS_CHANNEL = "saas_contabil:task_events"
+
+# Celery states after which a task will not change again
+TERMINAL_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+
+
+def publish_task_event(task_id: str, state: str, result=None) -> None:
+    """Publica a conclusão de uma tarefa (chamado pelo worker).
+
+    O resultado vai junto no evento para que a API não precise consultar o
+    result backend ao entregar a notificação.
+    """
+    event = {"task_id": task_id, "state": state, "result": result}
+    try:
+        get_redis().publish(TASK_EVENTS_CHANNEL, json.dumps(event, default=str))
+    except Exception as e:
+        logger.warning(f"Failed to publish completion event for task {task_id}: {e}")
+
+
+class ResultNotifierService:
+    """Uma assinatura pub/sub por processo da API, distribuída para os clientes em espera."""
+
+    def __init__(self, channel: str = TASK_EVENTS_CHANNEL):
+        self.channel = channel
+        self._waiters = defaultdict(set)
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(futures) for futures in self._waiters.values())
+
+    def register(self, task_id: str) -> asyncio.Future:
+        """Registra interesse em `task_id`. Registre antes de checar o estado atual,
+        senão um evento publicado entre a checagem e o registro se perde."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[task_id].add(future)
+        return future
+
+    def unregister(self, task_id: str, future: asyncio.Future) -> None:
+        futures = self._waiters.get(task_id)
+        if futures is None:
+            return
+        futures.discard(future)
+        if not futures:
+            del self._waiters[task_id]
+
+    async def wait(self, future: asyncio.Future, timeout: float) -> Optional[dict]:
+        """Aguarda o evento de um `future` registrado; None se o tempo esgotar."""
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def dispatch(self, event: dict) -> None:
+        for future in self._waiters.pop(event.get("task_id"), ()):
+            if not future.done():
+                future.set_result(event)
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        backoff = 1.0
+        while True:
+            # Dedicated connection without socket_timeout: the subscription is idle
+            # most of the time and must not be torn down by read timeouts
+            client = aioredis.Redis.from_url(settings.REDIS_URL, health_check_interval=30)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Subscribed to {self.channel}")
+                backoff = 1.0
+                async for message in pubsub.listen():
+                    try:
+                        self.dispatch(json.loads(message["data"]))
+                    except (ValueError, TypeError) as e:
+                        logger.warning(f"Ignoring malformed task event: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Task event subscription lost, retrying in {backoff:.0f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                    await client.aclose()
+                except Exception:
+                    pass
+
+
+result_notifier = ResultNotifierService()
@@ -1,11 +1,87 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
 import httpx
 from src.core.config import settings
 from src.core.logging_config import logger
+from src.core.http_clients import ClientProfile, http_clients
+from src.core.redis_client import get_async_redis
+from src.services.outbound_limiter import Priority, outbound_limiter, retry_after
+from src.services.output_storage import cached_file_sha256
+
+# Attempts per message when Telegram answers 429 (each waits its retry_after)
+SEND_ATTEMPTS = 3
+TELEGRAM_FILE_PATH_PREFIX = "saas_contabil:telegram_file_path:"
+# "<SHA-256>:<filename>" of a document we sent -> the file_id Telegram assigned to it
+# (the file_id carries the name it was uploaded with)
+TELEGRAM_DOCUMENT_PREFIX = "saas_contabil:telegram_document:"
+# getFile only serves files up to 20 MB
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+def telegram_operation(request: httpx.Request) -> str:
+    # /bot<token>/sendMessage -> sendMessage; file downloads carry the file path
+    path = request.url.path
+    if path.startswith("/file/"):
+        return "downloadFile"
+    return path.rsplit("/", 1)[-1]
+
+
+def _write_chunk(f, digest, chunk: bytes) -> None:
+    f.write(chunk)
+    digest.update(chunk)
+
+
+class PreparedMessage:
+    """Corpo de sendMessage serializado uma vez; por envio só o `chat_id` (e um prefixo opcional) muda."""
+
+    def __init__(self, text: str, parse_mode: str = "Markdown"):
+        self.text = text
+        # JSON escapes per character, so encoded strings can be spliced: the text
+        # stays open at the front for an optional per-call prefix
+        self._tail = json.dumps(text)[1:].encode()
+        self._rest = b"," + json.dumps({"parse_mode": parse_mode, "disable_web_page_preview": True})[1:].encode()
+
+    def body(self, chat_id: int, prefix: str = "") -> bytes:
+        head = json.dumps(prefix)[:-1].encode()
+        return b'{"chat_id":%d,"text":%s%s%s' % (chat_id, head, self._tail, self._rest)
+
+
+http_clients.register("telegram", ClientProfile(
+    "telegram", f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}", telegram_operation, read_timeout=30.0
+))
+# File transfers (download_file, large uploads) get a longer read timeout
+http_clients.register("telegram_files", ClientProfile(
+    "telegram", f"https://api.telegram.org/file/bot{settings.TELEGRAM_BOT_TOKEN}", telegram_operation, read_timeout=120.0
+))
+
 
 class TelegramService:
-    def __init__(self):
-        self.base_url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}"
-        self.client = httpx.AsyncClient(base_url=self.base_url)
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return http_clients.get("telegram")
+
+    async def _send(self, method: str, chat_id: int, priority: Priority, **request) -> httpx.Response:
+        """POST rate-limited per chat/global bucket, honouring Telegram's retry_after."""
+        for attempt in range(SEND_ATTEMPTS):
+            await outbound_limiter.acquire(chat_id, priority)
+            for upload in request.get("files", {}).values():
+                # (filename, stream, content_type) tuples or bare file objects
+                (upload[1] if isinstance(upload, tuple) else upload).seek(0)
+            response = await self.client.post(method, **request)
+            wait = retry_after(response)
+            if wait is None:
+                break
+            logger.warning(f"Telegram flood control on {chat_id}: retry after {wait}s")
+            await outbound_limiter.pause(chat_id, wait)
+        response.raise_for_status()
+        return response
 
     async def send_invoice(self, chat_id: int, title: str, description: str, payload: str, price_cents: int):
         data = {
@@ -38,7 +114,7 @@ class TelegramService:
         except Exception as e:
             logger.error(f"Failed to answer pre_checkout_query: {e}")
 
-    async def send_message(self, chat_id: int, text: str, parse_mode: str = "Markdown"):
+    async def send_message(self, chat_id: int, text: str, parse_mode: str = "Markdown", priority: Priority = Priority.NORMAL):
         data = {
             "chat_id": chat_id, 
             "text": text,
@@ -46,15 +122,27 @@ class TelegramService:
             "disable_web_page_preview": True
         }
         try:
-            response = await self.client.post("/sendMessage", json=data)
-            response.raise_for_status()
+            response = await self._send("/sendMessage", chat_id, priority, json=data)
+            logger.info(f"Message sent to {chat_id}")
+            return response.json()
+        except Exception as e:
+            logger.error(f"Failed to send message: {e}")
+            return None
+
+    async def send_prepared(self, chat_id: int, message: PreparedMessage, prefix: str = "", priority: Priority = Priority.NORMAL):
+        try:
+            response = await self._send(
+                "/sendMessage", chat_id, priority,
+                content=message.body(chat_id, prefix),
+                headers={"Content-Type": "application/json"},
+            )
             logger.info(f"Message sent to {chat_id}")
             return response.json()
         except Exception as e:
             logger.error(f"Failed to send message: {e}")
             return None
 
-    async def send_message_with_keyboard(self, chat_id: int, text: str, keyboard: dict, parse_mode: str = "Markdown"):
+    async def send_message_with_keyboard(self, chat_id: int, text: str, keyboard: dict, parse_mode: str = "Markdown", priority: Priority = Priority.NORMAL):
         data = {
             "chat_id": chat_id,
             "text": text,
@@ -63,8 +151,7 @@ class TelegramService:
             "reply_markup": keyboard
         }
         try:
-            response = await self.client.post("/sendMessage", json=data)
-            response.raise_for_status()
+            response = await self._send("/sendMessage", chat_id, priority, json=data)
             logger.info(f"Message with keyboard sent to {chat_id}")
             return response.json()
         except Exception as e:
@@ -72,6 +159,24 @@ class TelegramService:
             return None
 
     async def get_file_path(self, file_id: str):
+        """Caminho de download do arquivo (getFile), reaproveitado enquanto o link é válido."""
+        cache_key = f"{TELEGRAM_FILE_PATH_PREFIX}{file_id}"
+        try:
+            cached = await get_async_redis().get(cache_key)
+            if cached is not None:
+                return cached.decode() if isinstance(cached, bytes) else cached
+        except Exception as e:
+            logger.warning(f"getFile cache unavailable: {e}")
+
+        file_path = await self._request_file_path(file_id)
+        if file_path:
+            try:
+                await get_async_redis().set(cache_key, file_path, ex=settings.TELEGRAM_FILE_PATH_TTL)
+            except Exception:
+                pass
+        return file_path
+
+    async def _request_file_path(self, file_id: str):
         try:
             logger.info(f"Requesting file path for file_id: {file_id}")
             response = await self.client.post("/getFile", json={"file_id": file_id})
@@ -87,7 +192,7 @@ class TelegramService:
             logger.info(f"File info - Path: {file_path}, Size: {file_size} bytes")
             
             # Check Telegram file size limit (20MB for getFile API)
-            if file_size > 20 * 1024 * 1024:
+            if file_size > MAX_DOWNLOAD_BYTES:
                 logger.error(f"File too large for Telegram API: {file_size} bytes (limit: 20MB)")
                 return None
                 
@@ -96,28 +201,123 @@ class TelegramService:
             logger.error(f"Failed to get file path: {e}")
             return None
     
-    async def download_file(self, file_path: str, destination: str):
-        url = f"https://api.telegram.org/file/bot{settings.TELEGRAM_BOT_TOKEN}/{file_path}"
+    async def download_file(self, file_path: str, destination: str, max_bytes: int = MAX_DOWNLOAD_BYTES) -> Optional[str]:
+        """Baixa o arquivo em blocos direto para o disco; devolve o SHA-256 (None em falha).
+
+        Escrita e hash rodam fora do event loop e o limite de tamanho vale durante
+        o download, então nunca há o arquivo inteiro em memória.
+        """
+        digest = hashlib.sha256()
+        received = 0
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url)
+            async with http_clients.get("telegram_files").stream("GET", f"/{file_path}") as response:
                 response.raise_for_status()
-                with open(destination, "wb") as f:
-                    f.write(response.content)
-            return True
+                if int(response.headers.get("Content-Length") or 0) > max_bytes:
+                    raise ValueError(f"File larger than {max_bytes} bytes")
+                f = await asyncio.to_thread(open, destination, "wb")
+                try:
+                    async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        received += len(chunk)
+                        if received > max_bytes:
+                            raise ValueError(f"File larger than {max_bytes} bytes")
+                        await asyncio.to_thread(_write_chunk, f, digest, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+            return digest.hexdigest()
         except Exception as e:
             logger.error(f"Failed to download file: {e}")
-            return False
+            try:
+                await asyncio.to_thread(os.remove, destination)
+            except OSError:
+                pass
+            return None
 
-    async def send_document(self, chat_id: int, document_path: str, caption: str = ""):
+    async def download_bytes(self, file_path: str, max_bytes: int = MAX_DOWNLOAD_BYTES) -> Optional[Tuple[bytes, str]]:
+        """Baixa um arquivo pequeno para a memória; devolve (conteúdo, SHA-256) ou None em falha."""
+        digest = hashlib.sha256()
+        buffer = bytearray()
         try:
-            with open(document_path, "rb") as f:
-                files = {"document": f}
-                data = {"chat_id": chat_id, "caption": caption}
-                response = await self.client.post("/sendDocument", data=data, files=files)
+            async with http_clients.get("telegram_files").stream("GET", f"/{file_path}") as response:
                 response.raise_for_status()
-                logger.info(f"Document sent to {chat_id}")
-                return True
+                if int(response.headers.get("Content-Length") or 0) > max_bytes:
+                    raise ValueError(f"File larger than {max_bytes} bytes")
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    if len(buffer) + len(chunk) > max_bytes:
+                        raise ValueError(f"File larger than {max_bytes} bytes")
+                    buffer += chunk
+                    digest.update(chunk)
+            return bytes(buffer), digest.hexdigest()
+        except Exception as e:
+            logger.error(f"Failed to download file: {e}")
+            return None
+
+    async def _known_file_id(self, document_key: str) -> Optional[str]:
+        try:
+            file_id = await get_async_redis().get(f"{TELEGRAM_DOCUMENT_PREFIX}{document_key}")
+        except Exception as e:
+            logger.warning(f"Document file_id lookup failed: {e}")
+            return None
+        return file_id.decode() if isinstance(file_id, bytes) else file_id
+
+    async def _remember_file_id(self, document_key: str, file_id: Optional[str]) -> None:
+        try:
+            if file_id:
+                await get_async_redis().set(f"{TELEGRAM_DOCUMENT_PREFIX}{document_key}", file_id, ex=settings.TELEGRAM_FILE_ID_TTL)
+            else:
+                await get_async_redis().delete(f"{TELEGRAM_DOCUMENT_PREFIX}{document_key}")
+        except Exception as e:
+            logger.warning(f"Failed to store document file_id: {e}")
+
+    async def send_document(
+        self,
+        chat_id: int,
+        document: Union[str, bytes],
+        caption: str = "",
+        filename: Optional[str] = None,
+        priority: Priority = Priority.HIGH,
+    ):
+        """Envia um arquivo do disco (caminho) ou direto da memória (bytes).
+
+        `filename` é o nome mostrado no chat (padrão: o nome do arquivo, ou
+        "document.csv" para bytes). Só a primeira entrega de um conteúdo com um
+        dado nome sobe o arquivo; as seguintes reenviam pelo `file_id` que o
+        Telegram devolveu, então um nome estável (não o id do pedido) permite o
+        reuso entre pedidos repetidos.
+        """
+        try:
+            if isinstance(document, bytes):
+                content_hash = hashlib.sha256(document).hexdigest()
+                filename = filename or "document.csv"
+            else:
+                content_hash = await asyncio.to_thread(cached_file_sha256, Path(document))
+                filename = filename or Path(document).name
+            document_key = f"{content_hash}:{filename}"
+
+            data = {"chat_id": chat_id, "caption": caption}
+            file_id = await self._known_file_id(document_key)
+            if file_id:
+                try:
+                    await self._send("/sendDocument", chat_id, priority, json={**data, "document": file_id})
+                    logger.info(f"Document sent to {chat_id} by file_id")
+                    return True
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code != 400:
+                        raise
+                    # file_id no longer accepted: forget it and upload again
+                    await self._remember_file_id(document_key, None)
+
+            # First delivery: multipart upload, streamed from the file or the buffer
+            if isinstance(document, bytes):
+                files = {"document": (filename, io.BytesIO(document), "text/csv")}
+                response = await self._send("/sendDocument", chat_id, priority, data=data, files=files)
+            else:
+                with open(document, "rb") as f:
+                    files = {"document": (filename, f, "text/csv")}
+                    response = await self._send("/sendDocument", chat_id, priority, data=data, files=files)
+            sent = response.json().get("result", {}).get("document", {})
+            await self._remember_file_id(document_key, sent.get("file_id"))
+            logger.info(f"Document sent to {chat_id}")
+            return True
         except Exception as e:
             logger.error(f"Failed to send document: {e}")
             return False
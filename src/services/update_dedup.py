@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.redis_client import get_async_redis
+
+TELEGRAM_UPDATE_SEEN_PREFIX = "saas_contabil:telegram_update_seen:"
+
+
+class UpdateDeduplicator:
+    """Descarta updates do Telegram já recebidas, pelo `update_id`.
+
+    Um LRU limitado no processo resolve as reentregas para a mesma instância sem
+    I/O; o SET NX com TTL no Redis cobre as reentregas que caem em outra.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.TELEGRAM_DEDUP_LOCAL_SIZE,
+        ttl_seconds: int = settings.TELEGRAM_DEDUP_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._seen: "OrderedDict[int, None]" = OrderedDict()
+
+    def _remember(self, update_id: int) -> bool:
+        """Marca localmente; False se já estava marcado."""
+        if update_id in self._seen:
+            self._seen.move_to_end(update_id)
+            return False
+        self._seen[update_id] = None
+        if len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return True
+
+    async def claim(self, update_id: int) -> bool:
+        """True se a update é nova e deve ser tratada; False se é repetida."""
+        if not self._remember(update_id):
+            return False
+        try:
+            claimed = await get_async_redis().set(
+                f"{TELEGRAM_UPDATE_SEEN_PREFIX}{update_id}", "1", nx=True, ex=self.ttl_seconds
+            )
+        except Exception as e:
+            # Without Redis only the local LRU protects us; better than dropping updates
+            logger.warning(f"Update de-duplication degraded to local only: {e}")
+            return True
+        return bool(claimed)
+
+    async def release(self, update_id: int) -> None:
+        """Desfaz um `claim` quando a update não pôde ser tratada, para aceitar a reentrega."""
+        self._seen.pop(update_id, None)
+        try:
+            await get_async_redis().delete(f"{TELEGRAM_UPDATE_SEEN_PREFIX}{update_id}")
+        except Exception as e:
+            logger.warning(f"Failed to release update {update_id}: {e}")
+
+
+update_deduplicator = UpdateDeduplicator()
@@ -0,0 +1,241 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import socket
+import zlib
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import redis.asyncio as aioredis
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.redis_client import get_async_redis
+
+# Raw Telegram updates, one list per shard ("<key>:<shard>"), consumed oldest first.
+# Changing TELEGRAM_UPDATE_SHARDS remaps chats: drain the queues before doing it.
+TELEGRAM_UPDATES_KEY = "saas_contabil:telegram_updates"
+
+UpdateHandler = Callable[[dict], Awaitable[object]]
+
+# Extend the lease only if we still hold it
+_RENEW_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def update_chat_id(update: dict) -> Optional[int]:
+    """Chat a que a update pertence (define a ordem de processamento)."""
+    for field in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if field in update:
+            return update[field].get("chat", {}).get("id")
+    if "callback_query" in update:
+        message = update["callback_query"].get("message") or {}
+        return message.get("chat", {}).get("id") or update["callback_query"].get("from", {}).get("id")
+    for field in ("pre_checkout_query", "shipping_query", "inline_query"):
+        if field in update:
+            return update[field].get("from", {}).get("id")
+    return None
+
+
+def shard_for(chat_id: Optional[int], shards: int, fallback: int = 0) -> int:
+    # crc32 instead of hash(): the same chat must map to the same shard in every process
+    key = chat_id if chat_id is not None else fallback
+    return zlib.crc32(str(key).encode()) % shards
+
+
+class HashRing:
+    """Hash consistente: cada shard pertence a um membro; mudar um membro move ~1/n dos shards."""
+
+    def __init__(self, members: Iterable[str], replicas: int = 64):
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        for member in members:
+            for replica in range(replicas):
+                point = self._hash(f"{member}#{replica}")
+                self._owners[point] = member
+                bisect.insort(self._points, point)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+
+class UpdateQueueService:
+    """Fila durável entre o webhook do Telegram e os consumidores, particionada por chat.
+
+    As updates de um chat caem sempre no mesmo shard e cada shard tem um único
+    consumidor por vez, então a ordem por chat é preservada enquanto chats
+    diferentes são tratados em paralelo. Os shards são distribuídos entre as
+    instâncias vivas por hash consistente; um lease no Redis por shard garante a
+    exclusividade durante as trocas de dono.
+    """
+
+    def __init__(
+        self,
+        key: str = TELEGRAM_UPDATES_KEY,
+        shards: int = settings.TELEGRAM_UPDATE_SHARDS,
+        lease_seconds: int = settings.TELEGRAM_SHARD_LEASE_SECONDS,
+    ):
+        self.key = key
+        self.shards = shards
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._handler: Optional[UpdateHandler] = None
+        self._client: Optional[aioredis.Redis] = None
+        self._coordinator: Optional[asyncio.Task] = None
+        self._consumers: Dict[int, asyncio.Task] = {}
+        self._stopping: Dict[int, asyncio.Event] = {}
+
+    def shard_key(self, shard: int) -> str:
+        return f"{self.key}:{shard}"
+
+    def _processing_key(self, shard: int) -> str:
+        return f"{self.key}:{shard}:processing"
+
+    def _lease_key(self, shard: int) -> str:
+        return f"{self.key}:{shard}:lease"
+
+    def _alive_key(self, owner: str) -> str:
+        return f"{self.key}:alive:{owner}"
+
+    @property
+    def owned_shards(self) -> List[int]:
+        return sorted(self._consumers)
+
+    async def enqueue(self, raw: bytes, update: dict) -> bool:
+        """Enfileira a update crua no shard do chat; False se o Redis não estiver disponível."""
+        shard = shard_for(update_chat_id(update), self.shards, fallback=update.get("update_id", 0))
+        try:
+            await get_async_redis().rpush(self.shard_key(shard), raw)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to enqueue Telegram update: {e}")
+            return False
+
+    async def start(self, handler: UpdateHandler) -> None:
+        if self._coordinator is not None:
+            return
+        self._handler = handler
+        # Dedicated connections without socket_timeout: BLMOVE blocks longer than it
+        self._client = aioredis.Redis.from_url(settings.REDIS_URL, health_check_interval=30)
+        self._coordinator = asyncio.create_task(self._coordinate())
+        logger.info(f"Telegram update queue started ({self.owner}, {self.shards} shards)")
+
+    async def stop(self) -> None:
+        if self._coordinator is not None:
+            self._coordinator.cancel()
+            await asyncio.gather(self._coordinator, return_exceptions=True)
+            self._coordinator = None
+        # Let consumers finish the update in hand; anything cut short stays in the
+        # shard's processing list and is replayed by the next owner
+        for event in self._stopping.values():
+            event.set()
+        consumers = list(self._consumers.values())
+        if consumers:
+            _, pending = await asyncio.wait(consumers, timeout=self.lease_seconds / 3)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+        if self._client is not None:
+            try:
+                await self._client.delete(self._alive_key(self.owner))
+            except Exception:
+                pass
+            await self._client.aclose()
+            self._client = None
+
+    async def members(self) -> List[str]:
+        """Instâncias vivas (com chave de vida não expirada)."""
+        prefix = self._alive_key("")
+        members = []
+        async for raw_key in self._client.scan_iter(match=f"{prefix}*"):
+            key = raw_key.decode() if isinstance(raw_key, bytes) else raw_key
+            members.append(key[len(prefix):])
+        return members
+
+    async def _coordinate(self) -> None:
+        while True:
+            try:
+                await self._client.set(self._alive_key(self.owner), "1", ex=self.lease_seconds)
+                await self.rebalance()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Telegram update queue rebalance failed: {e}")
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def rebalance(self) -> None:
+        """Renova os leases, larga os shards que mudaram de dono e assume os novos."""
+        ring = HashRing(set(await self.members()) | {self.owner})
+        wanted = {shard for shard in range(self.shards) if ring.owner(str(shard)) == self.owner}
+        lease_ms = int(self.lease_seconds * 1000)
+
+        for shard in list(self._consumers):
+            renewed = await self._client.eval(_RENEW_LEASE, 1, self._lease_key(shard), self.owner, lease_ms)
+            if shard not in wanted or not renewed:
+                self._stopping[shard].set()
+
+        for shard in wanted - set(self._consumers):
+            if await self._client.set(self._lease_key(shard), self.owner, nx=True, px=lease_ms):
+                self._stopping[shard] = asyncio.Event()
+                self._consumers[shard] = asyncio.create_task(self._consume(shard))
+
+    async def _consume(self, shard: int) -> None:
+        stopping = self._stopping[shard]
+        source, processing = self.shard_key(shard), self._processing_key(shard)
+        try:
+            # A previous owner died mid-update: replay it before anything newer
+            while await self._client.lmove(processing, source, "RIGHT", "LEFT") is not None:
+                logger.warning(f"Replaying unfinished Telegram update on shard {shard}")
+
+            while not stopping.is_set():
+                try:
+                    raw = await self._client.blmove(source, processing, 2, "LEFT", "RIGHT")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Telegram update consumer for shard {shard} lost Redis: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                if raw is None:
+                    continue
+
+                try:
+                    await self._handler(json.loads(raw))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Not retried: a poison update would otherwise block its chat forever
+                    logger.error(f"Failed to handle Telegram update: {e}")
+
+                try:
+                    await self._client.lrem(processing, 1, raw)
+                except Exception as e:
+                    logger.warning(f"Failed to acknowledge Telegram update: {e}")
+        finally:
+            self._consumers.pop(shard, None)
+            self._stopping.pop(shard, None)
+            try:
+                await self._client.eval(_RELEASE_LEASE, 1, self._lease_key(shard), self.owner)
+            except Exception:
+                pass
+
+
+update_queue = UpdateQueueService()
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Optional
 import hashlib
 
 class PDFValidatorService:
@@ -22,10 +23,11 @@ class PDFValidatorService:
                 sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
 
-    def validate(self, file_path: Path) -> bool:
+    def validate(self, file_path: Path, file_hash: Optional[str] = None) -> bool:
         """
         Valida se o arquivo está cadastrado e é seguro.
         Retorna True se válido, False caso contrário.
+        `file_hash` evita reler o arquivo quando o SHA-256 já foi calculado (ex.: no download).
         """
         try:
             # SECURITY: Check if file exists and is readable
@@ -43,7 +45,7 @@ class PDFValidatorService:
                     return False
             
             # SECURITY: Calculate hash for validation
-            file_hash = self.calculate_hash(file_path)
+            file_hash = file_hash or self.calculate_hash(file_path)
             
             # BUSINESS LOGIC: Check if file is registered
             # For now, allow files that start with "Ponto" or have specific hashes
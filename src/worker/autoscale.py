@@ -0,0 +1,147 @@
+import math
+import os
+import socket
+import time
+from dataclasses import dataclass
+from typing import List
+
+from celery.worker.autoscale import Autoscaler
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.redis_client import get_redis
+from src.services.admission import CELERY_QUEUE_KEY, TASK_LATENCY_KEY, WORKER_POOL_KEY
+
+
+@dataclass(frozen=True)
+class AutoscaleSample:
+    """Estado observado da fila e do host em um instante."""
+    queue_length: int
+    reserved: int
+    p50_seconds: float
+    p95_seconds: float
+    cpu_load: float  # Load average normalizado pelo número de CPUs (1.0 = host saturado)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil pelo método nearest-rank; 0.0 para lista vazia."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def host_cpu_load() -> float:
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return 0.0
+
+
+def sample_backlog(
+    client=None,
+    queue_key: str = CELERY_QUEUE_KEY,
+    latency_key: str = TASK_LATENCY_KEY,
+    reserved: int = 0,
+) -> AutoscaleSample:
+    """Lê tamanho da fila e durações recentes das tarefas no Redis."""
+    client = client or get_redis()
+    pipe = client.pipeline()
+    pipe.llen(queue_key)
+    pipe.lrange(latency_key, 0, -1)
+    queue_length, raw_latencies = pipe.execute()
+    latencies = [float(v) for v in raw_latencies]
+    return AutoscaleSample(
+        queue_length=int(queue_length),
+        reserved=reserved,
+        p50_seconds=percentile(latencies, 50) or settings.ADMISSION_DEFAULT_TASK_SECONDS,
+        p95_seconds=percentile(latencies, 95) or settings.ADMISSION_DEFAULT_TASK_SECONDS,
+        cpu_load=host_cpu_load(),
+    )
+
+
+class AutoscalePolicy:
+    """Calcula o tamanho desejado do pool de conversão a partir de uma amostra."""
+
+    def __init__(
+        self,
+        target_wait_seconds: float = settings.AUTOSCALE_TARGET_WAIT_SECONDS,
+        max_cpu_load: float = settings.AUTOSCALE_MAX_CPU_LOAD,
+        scale_down_step: int = settings.AUTOSCALE_SCALE_DOWN_STEP,
+    ):
+        self.target_wait_seconds = target_wait_seconds
+        self.max_cpu_load = max_cpu_load
+        self.scale_down_step = max(1, scale_down_step)
+
+    def desired(self, sample: AutoscaleSample, current: int, min_concurrency: int, max_concurrency: int) -> int:
+        # Processos necessários para drenar a fila dentro do tempo alvo,
+        # usando p95 para não subdimensionar quando há PDFs lentos
+        work_seconds = sample.queue_length * sample.p95_seconds
+        needed = math.ceil(work_seconds / self.target_wait_seconds) + sample.reserved
+        target = min(max(needed, min_concurrency), max_concurrency)
+
+        if target > current:
+            # Host saturated: more processes would only add context switching
+            if sample.cpu_load >= self.max_cpu_load:
+                return max(current, min_concurrency)
+            return target
+
+        if target < current:
+            # Scale down gradually so a short lull doesn't drop warm processes
+            return max(target, current - self.scale_down_step, min_concurrency)
+
+        return current
+
+
+class BacklogAutoscaler(Autoscaler):
+    """Autoscaler do Celery guiado pelo backlog global e latência das conversões.
+
+    Ativado com `celery worker --autoscale=MAX,MIN`; substitui a política padrão,
+    que só olha as mensagens já reservadas por este worker.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.policy = AutoscalePolicy()
+        self.sample_interval = settings.AUTOSCALE_SAMPLE_INTERVAL
+        self.hostname = socket.gethostname()
+        self._sampled_at = 0.0
+
+    def _maybe_scale(self, req=None):
+        now = time.monotonic()
+        if now - self._sampled_at < self.sample_interval:
+            return False
+        self._sampled_at = now
+
+        procs = self.processes
+        try:
+            sample = sample_backlog(reserved=self.qty)
+        except Exception as e:
+            logger.warning(f"Autoscaler sampling failed, using default policy: {e}")
+            return super()._maybe_scale(req)
+
+        desired = self.policy.desired(sample, procs, self.min_concurrency, self.max_concurrency)
+        scaled = False
+        if desired > procs:
+            logger.info(
+                f"Autoscaler: queue={sample.queue_length} p50={sample.p50_seconds:.1f}s "
+                f"p95={sample.p95_seconds:.1f}s "
+                f"cpu={sample.cpu_load:.2f} -> growing pool {procs} -> {desired}"
+            )
+            self.scale_up(desired - procs)
+            scaled = True
+        elif desired < procs:
+            logger.info(f"Autoscaler: queue={sample.queue_length} -> shrinking pool {procs} -> {desired}")
+            self.scale_down(procs - desired)
+            scaled = True
+
+        self._publish_pool_size(desired)
+        return scaled
+
+    def _publish_pool_size(self, size: int) -> None:
+        expires_at = time.time() + 3 * max(self.sample_interval, self.keepalive)
+        try:
+            get_redis().hset(WORKER_POOL_KEY, self.hostname, f"{size}|{self.max_concurrency}|{expires_at:.0f}")
+        except Exception as e:
+            logger.warning(f"Failed to publish worker pool size: {e}")
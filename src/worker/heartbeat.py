@@ -0,0 +1,28 @@
+import threading
+
+from celery.signals import worker_ready, worker_shutdown
+
+from src.core.config import settings
+from src.services.readiness import clear_worker_heartbeat, publish_worker_heartbeat
+
+_stop = threading.Event()
+
+
+def _beat(hostname: str) -> None:
+    while not _stop.is_set():
+        publish_worker_heartbeat(hostname)
+        _stop.wait(settings.WORKER_HEARTBEAT_INTERVAL)
+
+
+@worker_ready.connect
+def start_heartbeat(sender=None, **kwargs):
+    # Main worker process only: one heartbeat per worker, not per pool child
+    hostname = getattr(sender, "hostname", "worker")
+    _stop.clear()
+    threading.Thread(target=_beat, args=(hostname,), name="worker-heartbeat", daemon=True).start()
+
+
+@worker_shutdown.connect
+def stop_heartbeat(sender=None, **kwargs):
+    _stop.set()
+    clear_worker_heartbeat(getattr(sender, "hostname", "worker"))
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta, timezone
+
+from celery.result import AsyncResult
+
+from src.core.config import settings
+from src.core.logging_config import logger
+
+# Delayed jobs are held by the worker's timer (not a pool process) until their ETA.
+# Never sleep inside a task to wait: that blocks a worker slot doing nothing.
+
+def schedule_at(task, when: datetime, *args, **kwargs) -> AsyncResult:
+    """Enqueue `task` to run at `when` (timezone-aware)."""
+    delay = (when - datetime.now(timezone.utc)).total_seconds()
+    # Redis redelivers unacked messages after the visibility timeout, so an ETA
+    # beyond it would run twice
+    if delay > settings.CELERY_VISIBILITY_TIMEOUT:
+        logger.warning(
+            f"Task {task.name} scheduled {delay:.0f}s ahead, beyond the broker "
+            f"visibility timeout ({settings.CELERY_VISIBILITY_TIMEOUT}s); it may be redelivered"
+        )
+    return task.apply_async(args=args, kwargs=kwargs, eta=when)
+
+def schedule_in(task, delay_seconds: float, *args, **kwargs) -> AsyncResult:
+    """Enqueue `task` to run `delay_seconds` from now."""
+    when = datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+    return schedule_at(task, when, *args, **kwargs)
@@ -1,55 +1,171 @@
 from pathlib import Path
+import asyncio
+import io
 import os
+import time
+from typing import Optional, Union
+
+from celery.signals import task_postrun, worker_init, worker_process_shutdown
+from sqlalchemy.future import select
 
 from src.core.celery_app import celery_app
 from src.core.config import settings
+from src.core.database import AsyncSessionLocal
+from src.core.http_clients import http_clients
+from src.models.order import Order, Payment
 from src.services.document_converter import DocumentConverterService
 from src.services.pdf_reader import PDFReader
 from src.services.csv_writer import CSVWriter
+from src.services.telegram import TelegramService
+from src.services.outbound_limiter import Priority
 from src.core.logging_config import logger
+from src.core.metrics import TASKS_TOTAL, mark_process_dead, observe_stage, reset_multiproc_dir, start_exporter
+from src.services.admission import record_task_latency
+from src.services.result_notifier import publish_task_event
+from src.services.conversion_cache import conversion_cache
+from src.services.output_storage import finalize_output
+from src.services.result_index import result_index
+
+_converter = None
+
+def get_converter() -> DocumentConverterService:
+    """Conversor compartilhado pelo processo (os serviços não guardam estado)."""
+    global _converter
+    if _converter is None:
+        _converter = DocumentConverterService(PDFReader(), CSVWriter())
+    return _converter
+
+def run_async(coro):
+    """Helper to run async code in sync celery task"""
+    loop = asyncio.get_event_loop()
+    if loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop.run_until_complete(coro)
 
 @celery_app.task(bind=True, name="convert_document")
 def convert_document_task(self, input_path_str: str):
+    started = time.perf_counter()
     try:
         input_path = Path(input_path_str)
         output_filename = input_path.stem + ".csv"
         output_path = Path(settings.OUTPUT_DIR) / output_filename
         
-        # Instanciar serviços
-        pdf_reader = PDFReader()
-        csv_writer = CSVWriter()
-        converter = DocumentConverterService(pdf_reader, csv_writer)
-        
         # Converter
-        converter.convert(input_path, output_path)
+        get_converter().convert(input_path, output_path)
+        with observe_stage("finalize"):
+            output = finalize_output(output_path)
         
-        return {
+        result = {
             "status": "success",
             "output_path": str(output_path),
-            "filename": output_filename
+            "filename": output_filename,
+            "sha256": output["sha256"],
+            "size": output["size"],
         }
     except Exception as e:
-        return {
+        result = {
             "status": "error",
             "error": str(e)
         }
+    finally:
+        record_task_latency(time.perf_counter() - started)
 
-@celery_app.task(bind=True, name="process_telegram_order")
-def process_telegram_order(self, order_id: str):
-    import asyncio
-    from sqlalchemy.future import select
-    from src.core.database import AsyncSessionLocal
-    from src.models.order import Order
-    from src.services.telegram import TelegramService
-    
-    # Helper to run async code in sync celery task
-    def run_async(coro):
-        loop = asyncio.get_event_loop()
-        if loop.is_closed():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        return loop.run_until_complete(coro)
+    result_index.record(self.request.id, result)
+    return result
+
+@task_postrun.connect
+def notify_conversion_finished(sender=None, task_id=None, state=None, retval=None, **kwargs):
+    # Runs after the result is stored, so waiters can also read it from the backend
+    if sender is None or sender.name != convert_document_task.name:
+        return
+    result = retval if state == "SUCCESS" else None
+    publish_task_event(task_id, state, result)
+
+@task_postrun.connect
+def count_task_outcome(sender=None, state=None, retval=None, **kwargs):
+    # Conversions report their own errors in the return value
+    outcome = retval.get("status") if isinstance(retval, dict) and "status" in retval else (state or "unknown").lower()
+    TASKS_TOTAL.labels(getattr(sender, "name", "unknown"), outcome).inc()
+
+@worker_init.connect
+def start_worker_metrics(**kwargs):
+    # Main worker process, before the pool forks: drop samples of a previous run
+    # and serve the aggregated metrics of all children
+    reset_multiproc_dir()
+    if settings.WORKER_METRICS_PORT:
+        try:
+            start_exporter(settings.WORKER_METRICS_PORT)
+        except OSError as e:
+            logger.warning(f"Metrics exporter not started: {e}")
+
+@worker_process_shutdown.connect
+def release_worker_metrics(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
+
+@worker_process_shutdown.connect
+def close_http_clients(**kwargs):
+    # Keep-alive pools live on this process's event loop (see run_async)
+    loop = asyncio.get_event_loop()
+    if not loop.is_closed():
+        loop.run_until_complete(http_clients.aclose(loop))
+
+async def _cached_conversion(order: Order) -> Optional[bytes]:
+    """CSV de um PDF idêntico já convertido (pelo hash); passa a valer também pelo file_unique_id."""
+    csv = await conversion_cache.get(order.file_hash)
+    if csv is not None and order.file_unique_id:
+        await conversion_cache.link(order.file_unique_id, order.file_hash)
+    return csv
 
+def _csv_filename(order: Order) -> str:
+    # Named after the uploaded PDF, not the order: repeated orders of the same file
+    # then share the Telegram file_id of the first delivery
+    return f"{Path(order.file_name or 'document.pdf').stem}.csv"
+
+def _persist_order_files(order_id, pdf: bytes, csv: bytes) -> tuple[str, str]:
+    pdf_path = Path(settings.UPLOAD_DIR) / f"{order_id}.pdf"
+    csv_path = Path(settings.OUTPUT_DIR) / f"{order_id}.csv"
+    pdf_path.write_bytes(pdf)
+    csv_path.write_bytes(csv)
+    return str(pdf_path), str(csv_path)
+
+async def _convert_in_memory(telegram_service: TelegramService, order: Order, file_path: str) -> bytes:
+    """Converte o pedido em memória; devolve o CSV. Só grava em disco se ORDER_RETAIN_FILES."""
+    downloaded = await telegram_service.download_bytes(file_path)
+    if downloaded is None:
+        raise Exception("Failed to download file from Telegram")
+    pdf, order.file_hash = downloaded
+
+    csv = await _cached_conversion(order)
+    if csv is None:
+        csv = get_converter().render(io.BytesIO(pdf), name=str(order.id)).encode("utf-8")
+        await conversion_cache.put(order.file_hash, csv, order.file_unique_id)
+    if settings.ORDER_RETAIN_FILES:
+        order.pdf_path, order.csv_path = await asyncio.to_thread(_persist_order_files, order.id, pdf, csv)
+    return csv
+
+async def _convert_on_disk(telegram_service: TelegramService, order: Order, file_path: str) -> Union[str, bytes]:
+    """Converte o pedido via disco (arquivos grandes); devolve o caminho do CSV (ou o CSV já em cache)."""
+    local_pdf_path = Path(settings.UPLOAD_DIR) / f"{order.id}.pdf"
+    file_hash = await telegram_service.download_file(file_path, str(local_pdf_path))
+    if not file_hash:
+        raise Exception("Failed to download file from Telegram")
+    order.pdf_path = str(local_pdf_path)
+    order.file_hash = file_hash
+
+    cached = await _cached_conversion(order)
+    if cached is not None:
+        return cached
+
+    output_path = Path(settings.OUTPUT_DIR) / f"{order.id}.csv"
+    get_converter().convert(local_pdf_path, output_path)
+    order.csv_path = str(output_path)
+    await conversion_cache.put(order.file_hash, output_path, order.file_unique_id)
+    return str(output_path)
+
+# Fire-and-forget: outcome is recorded on the Order row, nobody reads the result
+@celery_app.task(bind=True, name="process_telegram_order", ignore_result=True)
+def process_telegram_order(self, order_id: str):
     async def _process():
         telegram_service = TelegramService()
         async with AsyncSessionLocal() as db:
@@ -62,33 +178,33 @@ def process_telegram_order(self, order_id: str):
                 return
             
             try:
-                # Download File
-                file_path = await telegram_service.get_file_path(order.file_id)
-                if not file_path:
-                    raise Exception("Failed to get file path from Telegram")
-                
-                local_pdf_path = Path(settings.UPLOAD_DIR) / f"{order_id}.pdf"
-                await telegram_service.download_file(file_path, str(local_pdf_path))
-                order.pdf_path = str(local_pdf_path)
-                
-                # Convert
-                output_filename = f"{order_id}.csv"
-                output_path = Path(settings.OUTPUT_DIR) / output_filename
-                
-                pdf_reader = PDFReader()
-                csv_writer = CSVWriter()
-                converter = DocumentConverterService(pdf_reader, csv_writer)
-                converter.convert(local_pdf_path, output_path)
+                # Same Telegram file converted before (resend, retry): no getFile, no download
+                cached = None
+                if order.file_unique_id:
+                    cached = await conversion_cache.get_by_unique_id(order.file_unique_id)
+                if cached:
+                    order.file_hash, document = cached
+                else:
+                    # Download File
+                    file_path = await telegram_service.get_file_path(order.file_id)
+                    if not file_path:
+                        raise Exception("Failed to get file path from Telegram")
+                    
+                    if order.file_size and order.file_size <= settings.ORDER_INMEMORY_MAX_BYTES:
+                        # Small file: download, convert and upload without touching the disk
+                        document = await _convert_in_memory(telegram_service, order, file_path)
+                    else:
+                        document = await _convert_on_disk(telegram_service, order, file_path)
                 
-                order.csv_path = str(output_path)
                 order.status = "completed"
                 await db.commit()
                 
                 # Send Document
                 await telegram_service.send_document(
                     order.chat_id, 
-                    str(output_path), 
-                    caption=f"Seu arquivo convertido (Pedido {order_id})"
+                    document, 
+                    caption=f"Seu arquivo convertido (Pedido {order_id})",
+                    filename=_csv_filename(order)
                 )
                 
             except Exception as e:
@@ -98,36 +214,26 @@ def process_telegram_order(self, order_id: str):
                 await db.commit()
                 await telegram_service.send_message(
                     order.chat_id, 
-                    f"Erro ao processar seu pedido: {e}"
+                    f"Erro ao processar seu pedido: {e}",
+                    priority=Priority.HIGH
                 )
 
+    started = time.perf_counter()
     try:
         run_async(_process())
     except Exception as e:
         logger.error(f"Fatal error in worker task: {e}")
+    finally:
+        record_task_latency(time.perf_counter() - started)
 
 
-@celery_app.task(bind=True, name="simulate_test_payment_task")
+@celery_app.task(bind=True, name="simulate_test_payment_task", ignore_result=True)
 def simulate_test_payment_task(self, order_id: str, chat_id: int):
-    """Simulate payment for test user after 5 seconds"""
-    import asyncio
-    import time
-    from sqlalchemy.future import select
-    from src.core.database import AsyncSessionLocal
-    from src.models.order import Order, Payment
-    from src.services.telegram import TelegramService
-    from src.core.logging_config import logger
-    
-    # Wait 5 seconds
-    time.sleep(5)
-    
-    def run_async(coro):
-        loop = asyncio.get_event_loop()
-        if loop.is_closed():
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        return loop.run_until_complete(coro)
+    """Simulate payment for test user.
 
+    The delay comes from scheduling (see src.worker.scheduling), never from
+    sleeping here, so no worker slot is held while waiting.
+    """
     async def _simulate_payment():
         telegram_service = TelegramService()
         async with AsyncSessionLocal() as db:
@@ -162,7 +268,8 @@ def simulate_test_payment_task(self, order_id: str, chat_id: int):
                 # Notify user
                 await telegram_service.send_message(
                     chat_id,
-                    "✅ **[MODO TESTE] Pagamento simulado!** Iniciando conversão do seu arquivo..."
+                    "✅ **[MODO TESTE] Pagamento simulado!** Iniciando conversão do seu arquivo...",
+                    priority=Priority.HIGH
                 )
                 
                 # Trigger processing
@@ -0,0 +1,83 @@
+import tempfile
+import time
+from pathlib import Path
+
+from celery.signals import worker_process_init
+
+from src.core.logging_config import logger
+
+# Tiny one-page timesheet in the default layout, used to exercise the whole
+# read -> parse -> write path before the worker accepts real work.
+SAMPLE_LINES = [
+    "JANEIRO / 2024",
+    "01 08:00/12:00 13:00/17:00 08:00",
+    "02 08:00/12:00 13:00/17:00 08:00",
+]
+
+def build_sample_pdf(lines=SAMPLE_LINES) -> bytes:
+    """Monta um PDF mínimo com uma linha de texto por item de `lines`."""
+    content = "BT /F1 10 Tf 12 TL 40 760 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        pdf += f"{offset:010d} 00000 n \n".encode()
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    return pdf
+
+def _sample_conversion(converter, workdir: Path) -> float:
+    input_path = workdir / "warmup.pdf"
+    output_path = workdir / "warmup.csv"
+    input_path.write_bytes(build_sample_pdf())
+    started = time.perf_counter()
+    converter.convert(input_path, output_path)
+    return time.perf_counter() - started
+
+def warm_up() -> dict:
+    """Importa e inicializa a pilha de conversão e roda uma conversão de amostra.
+
+    Retorna os tempos (em segundos) da importação, da primeira conversão (fria)
+    e de uma segunda conversão (quente), para comparação.
+    """
+    started = time.perf_counter()
+    # Import everything the tasks touch so the first real task pays none of it
+    import PyPDF2  # noqa: F401
+    import sqlalchemy.future  # noqa: F401
+    from src.core.database import AsyncSessionLocal  # noqa: F401
+    from src.models.order import Order, Payment  # noqa: F401
+    from src.services.telegram import TelegramService  # noqa: F401
+    from src.worker.tasks import get_converter
+    converter = get_converter()
+    timings = {"imports": time.perf_counter() - started}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        timings["cold_conversion"] = _sample_conversion(converter, workdir)
+        timings["warm_conversion"] = _sample_conversion(converter, workdir)
+    return timings
+
+@worker_process_init.connect
+def warm_up_worker_process(**kwargs):
+    try:
+        timings = warm_up()
+        logger.info(
+            "Worker warm-up finished: "
+            f"imports {timings['imports'] * 1000:.1f} ms, "
+            f"cold conversion {timings['cold_conversion'] * 1000:.1f} ms, "
+            f"warm conversion {timings['warm_conversion'] * 1000:.1f} ms"
+        )
+    except Exception as e:
+        # Never keep a worker from starting because of the warm-up
+        logger.warning(f"Worker warm-up failed: {e}")
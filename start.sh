@@ -5,5 +5,11 @@ echo "🚀 Starting SaaS Contabil Converter..."
 echo "📊 PORT: ${PORT:-8000}"
 echo "🌍 Environment: ${ENVIRONMENT:-production}"
 
+# Schema changes run once here, before uvicorn (set RUN_MIGRATIONS=false when the
+# platform runs migrate.py as a separate pre-deploy step)
+if [ "${RUN_MIGRATIONS:-true}" = "true" ]; then
+    python migrate.py
+fi
+
 # Use PORT environment variable, default to 8000
 exec uvicorn src.api.main:app --host 0.0.0.0 --port ${PORT:-8000} --log-level info
\ No newline at end of file
@@ -0,0 +1,37 @@
+class FakeRedis:
+    """Subset of redis.asyncio used by the services, kept in a dict.
+
+    `ttls` records the expiry (in seconds) given to each key so tests can check
+    which writes set or renew it.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.ttls = {}
+
+    async def set(self, key, value, nx=False, ex=None, px=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        self.ttls[key] = ex if ex is not None else (px / 1000 if px is not None else None)
+        return True
+
+    async def get(self, key):
+        return self.keys.get(key)
+
+    async def delete(self, key):
+        self.keys.pop(key, None)
+        self.ttls.pop(key, None)
+
+    async def scan_iter(self, match):
+        for key in list(self.keys):
+            if key.startswith(match.rstrip("*")):
+                yield key
+
+    async def eval(self, script, numkeys, key, owner, *args):
+        # Lease renew/release: compare-and-act on the holder
+        if self.keys.get(key) != owner:
+            return 0
+        if "del" in script:
+            del self.keys[key]
+        return 1
@@ -0,0 +1,99 @@
+import time
+import unittest
+from unittest.mock import patch, AsyncMock
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.core.security import get_current_user
+from src.services.admission import AdmissionControllerService, AdmissionDecision
+
+
+class TestAdmissionController(unittest.TestCase):
+    def setUp(self):
+        self.controller = AdmissionControllerService(
+            max_queue_depth=10, max_wait_seconds=60, concurrency=2, default_task_seconds=10
+        )
+
+    def test_admits_short_backlog(self):
+        decision = self.controller.decide(queue_depth=3, task_seconds=10)
+        self.assertTrue(decision.admitted)
+        self.assertEqual(decision.estimated_wait_seconds, 20)
+
+    def test_rejects_when_wait_exceeds_limit(self):
+        # 9 waiting + 1 new, 30s each, 2 workers -> 150s estimated wait
+        decision = self.controller.decide(queue_depth=9, task_seconds=30)
+        self.assertFalse(decision.admitted)
+        self.assertEqual(decision.estimated_wait_seconds, 150)
+        self.assertEqual(decision.retry_after_seconds, 90)
+
+    def test_rejects_when_depth_exceeds_limit(self):
+        decision = self.controller.decide(queue_depth=20, task_seconds=1)
+        self.assertFalse(decision.admitted)
+        self.assertGreaterEqual(decision.retry_after_seconds, 1)
+
+    def test_idle_autoscaled_pool_is_counted_at_its_maximum(self):
+        controller = AdmissionControllerService(
+            max_queue_depth=100, max_wait_seconds=60, concurrency=2, default_task_seconds=10
+        )
+        expires_at = time.time() + 60
+        # Idle at 1 process, may grow to 8 within one sample interval
+        controller._pool_concurrency = controller.live_concurrency({b"worker-1": f"1|8|{expires_at:.0f}".encode()})
+        self.assertEqual(controller._pool_concurrency, 8)
+
+        # Month-end burst: 40 queued at 10s each -> ~51s with 8 processes (410s with 1)
+        decision = controller.decide(queue_depth=40, task_seconds=10)
+        self.assertTrue(decision.admitted)
+
+    def test_live_concurrency_skips_expired_and_reads_old_format(self):
+        now = time.time()
+        pool_sizes = {
+            b"old": f"3|{now + 60:.0f}".encode(),
+            b"gone": f"1|8|{now - 60:.0f}".encode(),
+        }
+        self.assertEqual(self.controller.live_concurrency(pool_sizes), 3)
+
+    def test_average_uses_default_without_samples(self):
+        self.assertEqual(self.controller.average_task_seconds([]), 10)
+        self.assertEqual(self.controller.average_task_seconds([2.0, 4.0]), 3.0)
+
+
+class TestConvertBackpressure(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides[get_current_user] = lambda: "admin"
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    @patch("src.api.main.validator_service.validate", return_value=True)
+    @patch("src.api.main.convert_document_task.delay")
+    @patch("src.api.main.admission_controller.check", new_callable=AsyncMock)
+    def test_convert_returns_429_with_retry_after(self, mock_check, mock_delay, mock_validate):
+        mock_check.return_value = AdmissionDecision(False, 500, 900.0, 120)
+
+        files = {"file": ("PontoTest.pdf", b"%PDF-1.4...", "application/pdf")}
+        response = self.client.post("/convert?inline=false", files=files)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "120")
+        mock_delay.assert_not_called()
+
+    @patch("src.api.main.validator_service.validate", return_value=True)
+    @patch("src.api.main.inline_converter.try_convert", new_callable=AsyncMock)
+    @patch("src.api.main.convert_document_task.delay")
+    @patch("src.api.main.admission_controller.check", new_callable=AsyncMock)
+    def test_inline_conversion_ignores_full_queue(self, mock_check, mock_delay, mock_inline, mock_validate):
+        mock_check.return_value = AdmissionDecision(False, 500, 900.0, 120)
+        mock_inline.return_value = "Data;Entrada\n"
+
+        files = {"file": ("PontoTest.pdf", b"%PDF-1.4...", "application/pdf")}
+        response = self.client.post("/convert", files=files)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Conversion-Mode"], "inline")
+        mock_check.assert_not_called()
+        mock_delay.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
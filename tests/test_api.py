@@ -1,5 +1,8 @@
 import unittest
+import tempfile
+from pathlib import Path
 from unittest.mock import patch, MagicMock
+from fastapi.responses import FileResponse
 from fastapi.testclient import TestClient
 import sys
 import os
@@ -8,6 +11,8 @@ import os
 sys.path.append(os.path.join(os.getcwd(), "src"))
 
 from src.api.main import app
+from src.core.security import get_current_user
+from src.services.output_storage import finalize_output
 
 class TestAPI(unittest.TestCase):
     def setUp(self):
@@ -52,32 +57,37 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json(), {"task_id": "12345", "status": "processing"})
 
-    @patch("api.main.AsyncResult")
+    @patch("src.api.main.AsyncResult")
     def test_get_result_success(self, mock_async_result):
+        app.dependency_overrides[get_current_user] = lambda: "admin"
+        self.addCleanup(app.dependency_overrides.clear)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        output_path = Path(tmp.name) / "output.csv"
+        output_path.write_bytes(b"Data;Entrada 1\r\n01/01/2024;08:00\r\n")
+        sha256 = finalize_output(output_path)["sha256"]
+
         mock_result = MagicMock()
         mock_result.state = "SUCCESS"
         mock_result.result = {
             "status": "success",
-            "output_path": "/tmp/output.csv",
-            "filename": "output.csv"
+            "output_path": str(output_path),
+            "filename": "output.csv",
+            "sha256": sha256,
         }
         mock_async_result.return_value = mock_result
-        
-        # Mock os.path.exists para retornar True
-        with patch("os.path.exists", return_value=True):
-            # Mock FileResponse para não tentar abrir o arquivo real
-            with patch("src.api.main.FileResponse") as mock_file_response:
-                mock_file_response.return_value = "FileResponseObject"
-                response = self.client.get("/result/12345")
-                # TestClient não lida bem com retorno de objeto mockado que não é Response, 
-                # mas se passar pelo endpoint sem erro, é um bom sinal.
-                # No entanto, o TestClient vai tentar ler a resposta.
-                # Vamos verificar se chamou FileResponse corretamente.
-                mock_file_response.assert_called_with(
-                    path="/tmp/output.csv", 
-                    filename="output.csv", 
-                    media_type='text/csv'
-                )
+
+        # Downloads são servidos por src.api.downloads (ETag + cópia gzip)
+        with patch("src.api.downloads.FileResponse", wraps=FileResponse) as mock_file_response:
+            response = self.client.get("/result/12345", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["etag"], f'"{sha256}-gzip"')
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.content, output_path.read_bytes())
+        mock_file_response.assert_called_once()
+        self.assertEqual(mock_file_response.call_args.kwargs["path"], output_path.with_name("output.csv.gz"))
+        self.assertEqual(mock_file_response.call_args.kwargs["filename"], "output.csv")
 
 if __name__ == "__main__":
     unittest.main()
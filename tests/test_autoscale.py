@@ -0,0 +1,48 @@
+import unittest
+
+from src.worker.autoscale import AutoscalePolicy, AutoscaleSample, percentile
+
+
+def make_sample(queue_length=0, reserved=0, p95=10.0, cpu_load=0.1):
+    return AutoscaleSample(
+        queue_length=queue_length, reserved=reserved,
+        p50_seconds=p95, p95_seconds=p95, cpu_load=cpu_load,
+    )
+
+
+class TestAutoscalePolicy(unittest.TestCase):
+    def setUp(self):
+        self.policy = AutoscalePolicy(target_wait_seconds=60, max_cpu_load=0.9, scale_down_step=1)
+
+    def test_grows_to_drain_backlog_within_target(self):
+        # 30 tasks * 10s = 300s of work, 60s target -> 5 processes
+        desired = self.policy.desired(make_sample(queue_length=30), current=1, min_concurrency=1, max_concurrency=8)
+        self.assertEqual(desired, 5)
+
+    def test_respects_max_concurrency(self):
+        desired = self.policy.desired(make_sample(queue_length=1000), current=2, min_concurrency=1, max_concurrency=8)
+        self.assertEqual(desired, 8)
+
+    def test_does_not_grow_on_saturated_host(self):
+        desired = self.policy.desired(
+            make_sample(queue_length=1000, cpu_load=1.5), current=2, min_concurrency=1, max_concurrency=8
+        )
+        self.assertEqual(desired, 2)
+
+    def test_shrinks_one_step_at_a_time(self):
+        desired = self.policy.desired(make_sample(queue_length=0), current=6, min_concurrency=1, max_concurrency=8)
+        self.assertEqual(desired, 5)
+
+    def test_keeps_reserved_tasks_running(self):
+        desired = self.policy.desired(make_sample(reserved=3), current=3, min_concurrency=1, max_concurrency=8)
+        self.assertEqual(desired, 3)
+
+    def test_percentile(self):
+        values = [1.0, 2.0, 3.0, 4.0, 100.0]
+        self.assertEqual(percentile(values, 50), 3.0)
+        self.assertEqual(percentile(values, 95), 100.0)
+        self.assertEqual(percentile([], 95), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
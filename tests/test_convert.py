@@ -0,0 +1,173 @@
+import hashlib
+import io
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.core.config import settings
+from src.core.security import get_current_user
+from src.services.batch import BatchError, extract_zip, iter_merged_csv, iter_zip
+from src.worker.warmup import build_sample_pdf
+
+
+class TestInlineConversion(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides[get_current_user] = lambda: "admin"
+        self.client = TestClient(app)
+        use_temp_upload_dir(self)
+        validate = patch("src.api.main.validator_service.validate", return_value=True)
+        self.mock_validate = validate.start()
+        self.addCleanup(validate.stop)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    @patch("src.api.main.convert_document_task.delay")
+    def test_small_pdf_is_returned_inline(self, mock_delay):
+        files = {"file": ("PontoJaneiro.pdf", build_sample_pdf(), "application/pdf")}
+        response = self.client.post("/convert", files=files)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Conversion-Mode"], "inline")
+        self.assertTrue(response.headers["content-type"].startswith("text/csv"))
+        lines = response.text.splitlines()
+        self.assertTrue(lines[0].startswith("Data;Entrada 1"))
+        self.assertTrue(lines[1].startswith("01/01/2024;08:00;12:00;13:00;17:00"))
+        mock_delay.assert_not_called()
+
+    def test_upload_is_hashed_while_streaming(self):
+        pdf = build_sample_pdf()
+        files = {"file": ("PontoJaneiro.pdf", pdf, "application/pdf")}
+        self.client.post("/convert", files=files)
+
+        self.assertEqual(self.mock_validate.call_args.kwargs["file_hash"], hashlib.sha256(pdf).hexdigest())
+
+    @patch("src.api.main.convert_document_task.delay")
+    @patch("src.api.main.inline_converter.try_convert", new_callable=AsyncMock, return_value=None)
+    def test_saturated_pool_falls_back_to_celery(self, mock_try_convert, mock_delay):
+        mock_delay.return_value = MagicMock(id="12345")
+
+        files = {"file": ("PontoJaneiro.pdf", build_sample_pdf(), "application/pdf")}
+        response = self.client.post("/convert", files=files)
+
+        self.assertEqual(response.json(), {"task_id": "12345", "status": "processing"})
+        mock_delay.assert_called_once()
+
+    @patch("src.api.main.convert_document_task.delay")
+    def test_inline_can_be_disabled_per_request(self, mock_delay):
+        mock_delay.return_value = MagicMock(id="12345")
+
+        files = {"file": ("PontoJaneiro.pdf", build_sample_pdf(), "application/pdf")}
+        response = self.client.post("/convert?inline=false", files=files)
+
+        self.assertEqual(response.json()["task_id"], "12345")
+
+
+def use_temp_upload_dir(test):
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    upload_dir = patch.object(settings, "UPLOAD_DIR", tmp.name)
+    upload_dir.start()
+    test.addCleanup(upload_dir.stop)
+
+
+def make_zip(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for name, content in entries:
+            zf.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+def make_encrypted_zip():
+    data = bytearray(make_zip([("PontoA.pdf", b"%PDF-a")]).getvalue())
+    # Set the "encrypted" flag in the local and central headers: zipfile then
+    # refuses to read the entry without a password
+    for signature, offset in ((b"PK\x03\x04", 6), (b"PK\x01\x02", 8)):
+        data[data.index(signature) + offset] |= 0x1
+    return io.BytesIO(bytes(data))
+
+
+class TestBatchFiles(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def test_extract_zip_keeps_pdfs_and_strips_paths(self):
+        archive = make_zip([("../../etc/PontoA.pdf", b"%PDF-a"), ("notes.txt", b"x"), ("sub/PontoB.pdf", b"%PDF-b")])
+
+        extracted, skipped = extract_zip(archive, self.dir)
+
+        self.assertEqual(sorted(p.name.split("_", 1)[1] for p in extracted), ["PontoA.pdf", "PontoB.pdf"])
+        self.assertTrue(all(p.parent == self.dir for p in extracted))
+        self.assertEqual(skipped, ["notes.txt"])
+
+    def test_encrypted_entry_is_a_batch_error(self):
+        archive = make_encrypted_zip()
+
+        with self.assertRaises(BatchError):
+            extract_zip(archive, self.dir)
+
+    def test_streamed_zip_and_merged_csv(self):
+        first, second = self.dir / "a.csv", self.dir / "b.csv"
+        first.write_text("Data;Entrada 1\r\n01/01/2024;08:00\r\n", encoding="utf-8")
+        second.write_text("Data;Entrada 1\r\n02/01/2024;09:00\r\n", encoding="utf-8")
+        entries = [("a.csv", first), ("a.csv", second)]
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(iter_zip(entries))))
+        self.assertEqual(archive.namelist(), ["a.csv", "a_1.csv"])
+        self.assertEqual(archive.read("a_1.csv"), second.read_bytes())
+
+        merged = b"".join(iter_merged_csv(entries)).decode().splitlines()
+        self.assertEqual(merged, ["Arquivo;Data;Entrada 1", "a.csv;01/01/2024;08:00", "a.csv;02/01/2024;09:00"])
+
+
+class TestBatchEndpoint(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides[get_current_user] = lambda: "admin"
+        self.client = TestClient(app)
+        use_temp_upload_dir(self)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    @patch("src.api.main.group")
+    @patch("src.api.main.validator_service.validate", return_value=True)
+    def test_zip_upload_dispatches_one_group(self, mock_validate, mock_group):
+        job = MagicMock(id="job-1")
+        mock_group.return_value.apply_async.return_value = job
+        archive = make_zip([("PontoA.pdf", build_sample_pdf()), ("PontoB.pdf", build_sample_pdf()), ("x.doc", b"x")])
+
+        files = [("files", ("lote.zip", archive.getvalue(), "application/zip"))]
+        response = self.client.post("/convert/batch", files=files)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"job_id": "job-1", "status": "processing", "files": 2, "rejected": ["x.doc"]})
+        job.save.assert_called_once()
+
+
+    def test_unreadable_zip_is_rejected_and_cleaned_up(self):
+        files = [("files", ("lote.zip", make_encrypted_zip().getvalue(), "application/zip"))]
+        response = self.client.post("/convert/batch", files=files)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(Path(settings.UPLOAD_DIR).iterdir()), [])
+
+    @patch("src.api.main._stage_batch", side_effect=OSError("disk full"))
+    def test_unexpected_staging_error_removes_the_batch_dir(self, mock_stage):
+        client = TestClient(app, raise_server_exceptions=False)
+        files = [("files", ("PontoA.pdf", b"%PDF-a", "application/pdf"))]
+        response = client.post("/convert/batch", files=files)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(list(Path(settings.UPLOAD_DIR).iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
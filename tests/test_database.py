@@ -0,0 +1,100 @@
+import asyncio
+import os
+import unittest
+import uuid
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.core.database import engine_options
+from src.core.migrations import run_migrations
+from src.models.order import Order, in_flight_exists, latest_in_flight
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+ASYNCPG_URL = "postgresql+asyncpg://u:p@localhost/db"
+
+
+class TestEngineProfiles(unittest.TestCase):
+    def test_production_profile_is_quiet_and_pooled(self):
+        options = engine_options("production", ASYNCPG_URL, env={})
+        self.assertFalse(options["echo"])
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(options["pool_size"], 10)
+        self.assertEqual(options["connect_args"]["prepared_statement_cache_size"], 500)
+
+    def test_environment_overrides_profile(self):
+        env = {"DB_POOL_SIZE": "3", "DB_ECHO": "true", "DB_STATEMENT_CACHE_SIZE": "0"}
+        options = engine_options("production", ASYNCPG_URL, env=env)
+        self.assertEqual(options["pool_size"], 3)
+        self.assertTrue(options["echo"])
+        self.assertEqual(options["connect_args"], {"prepared_statement_cache_size": 0, "statement_cache_size": 0})
+
+    def test_statement_cache_only_for_asyncpg(self):
+        options = engine_options("worker", "sqlite+aiosqlite:///x.db", env={})
+        self.assertNotIn("connect_args", options)
+        self.assertNotIn("statement_cache_size", options)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            engine_options("staging", ASYNCPG_URL, env={})
+
+
+def compile_pg(query) -> str:
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+class TestOrderQueries(unittest.TestCase):
+    def test_in_flight_check_is_an_exists_with_the_index_predicate(self):
+        sql = compile_pg(in_flight_exists(42))
+        self.assertIn("EXISTS (SELECT", sql)
+        # Literal statuses, so the partial index matches even under generic plans
+        self.assertIn("status IN ('pending_payment', 'paid', 'processing')", sql)
+
+    def test_latest_in_flight_loads_only_what_the_message_needs(self):
+        sql = compile_pg(latest_in_flight(42))
+        self.assertTrue(sql.startswith("SELECT orders.file_name, orders.status"))
+        self.assertIn("LIMIT", sql)
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL not set")
+class TestOrderQueryPlans(unittest.TestCase):
+    """EXPLAIN the hot-path queries against a migrated database."""
+
+    def explain(self, query) -> str:
+        async def scenario():
+            engine = create_async_engine(TEST_DATABASE_URL)
+            try:
+                await run_migrations(engine)
+                async with engine.begin() as conn:
+                    await conn.execute(Order.__table__.insert(), [
+                        {"id": uuid.uuid4(), "chat_id": i % 100, "file_id": "f", "price_cents": 5000,
+                         "status": "completed" if i % 10 else "paid", "payload": str(uuid.uuid4())}
+                        for i in range(2000)
+                    ])
+                    await conn.execute(text("ANALYZE orders"))
+                    await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                    compiled = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+                    rows = await conn.execute(text(f"EXPLAIN {compiled}"))
+                    plan = "\n".join(row[0] for row in rows)
+                    await conn.rollback()
+                    return plan
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(scenario())
+
+    def test_in_flight_exists_uses_partial_index(self):
+        self.assertIn("ix_orders_in_flight", self.explain(in_flight_exists(7)))
+
+    def test_status_listing_uses_chat_created_index(self):
+        query = select(Order).where(Order.chat_id == 7).order_by(Order.created_at.desc()).limit(5)
+        self.assertIn("ix_orders_chat_id_created_at", self.explain(query))
+
+    def test_payload_lookup_uses_unique_index(self):
+        self.assertIn("uq_orders_payload", self.explain(select(Order).where(Order.payload == "x")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import asyncio
+import unittest
+
+from src.core.http_clients import ClientProfile, HttpClientRegistry
+
+
+class TestHttpClientRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = HttpClientRegistry()
+        self.registry.register("api", ClientProfile("api", "https://api.example.com", read_timeout=12.0))
+
+    def test_one_client_per_service_and_loop(self):
+        async def clients():
+            first, again = self.registry.get("api"), self.registry.get("api")
+            self.assertIs(first, again)
+            return first
+
+        first, second = asyncio.run(clients()), asyncio.run(clients())
+        # Connections belong to their loop: a new loop gets its own client
+        self.assertIsNot(first, second)
+
+    def test_profile_is_applied(self):
+        async def scenario():
+            client = self.registry.get("api")
+            self.assertEqual(str(client.base_url), "https://api.example.com")
+            self.assertEqual(client.timeout.read, 12.0)
+            self.assertEqual(client._transport.service, "api")
+            return client
+
+        self.assertEqual(asyncio.run(scenario()).timeout.connect, 5.0)
+
+    def test_aclose_closes_and_next_get_reopens(self):
+        async def scenario():
+            client = self.registry.get("api")
+            await self.registry.aclose()
+            self.assertTrue(client.is_closed)
+            self.assertIsNot(self.registry.get("api"), client)
+            await self.registry.aclose()
+
+        asyncio.run(scenario())
+
+    def test_unknown_service(self):
+        async def scenario():
+            self.registry.get("nope")
+
+        with self.assertRaises(KeyError):
+            asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
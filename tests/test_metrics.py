@@ -0,0 +1,60 @@
+import asyncio
+import unittest
+from unittest.mock import patch, AsyncMock
+
+import httpx
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from src.api.main import app
+from src.core.metrics import InstrumentedTransport
+from src.services.telegram import telegram_operation
+
+
+def sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def test_requests_are_labelled_by_route_template(self):
+        client = TestClient(app)
+        labels = {"method": "GET", "route": "/health", "status": "200"}
+        before = sample("saas_http_request_duration_seconds_count", labels)
+
+        client.get("/health")
+        response = client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn("saas_http_request_duration_seconds_bucket", response.text)
+        self.assertEqual(sample("saas_http_request_duration_seconds_count", labels), before + 1)
+
+
+class TestOutboundMetrics(unittest.TestCase):
+    def test_telegram_operations_never_include_tokens_or_paths(self):
+        send = httpx.Request("POST", "https://api.telegram.org/bot123:abc/sendMessage")
+        download = httpx.Request("GET", "https://api.telegram.org/file/bot123:abc/documents/file_1.pdf")
+        self.assertEqual(telegram_operation(send), "sendMessage")
+        self.assertEqual(telegram_operation(download), "downloadFile")
+
+    def test_transport_counts_failures(self):
+        transport = InstrumentedTransport("test_service", lambda request: "op")
+        labels = {"service": "test_service", "operation": "op"}
+        request = httpx.Request("GET", "https://example.invalid/x")
+
+        async def scenario():
+            parent = "httpx.AsyncHTTPTransport.handle_async_request"
+            with patch(parent, new_callable=AsyncMock, return_value=httpx.Response(502)):
+                await transport.handle_async_request(request)
+            with patch(parent, new_callable=AsyncMock, side_effect=httpx.ConnectError("down")):
+                with self.assertRaises(httpx.ConnectError):
+                    await transport.handle_async_request(request)
+
+        asyncio.run(scenario())
+
+        self.assertEqual(sample("saas_outbound_request_errors_total", labels), 2)
+        self.assertEqual(sample("saas_outbound_request_duration_seconds_count", labels), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
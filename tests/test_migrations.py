@@ -0,0 +1,105 @@
+import asyncio
+import os
+import re
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.core.database import Base
+from src.core.migrations import (
+    LATEST_VERSION, MIGRATIONS, Migration, MigrationError, _apply, current_version, pending_migrations, run_migrations,
+)
+import src.models.order  # noqa: F401
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+class TestMigrationDefinitions(unittest.TestCase):
+    def test_versions_are_unique_and_ordered(self):
+        versions = [m.version for m in MIGRATIONS]
+        self.assertEqual(versions, sorted(set(versions)))
+        self.assertEqual(LATEST_VERSION, versions[-1])
+
+    def test_pending_skips_applied_versions(self):
+        self.assertEqual([m.version for m in pending_migrations([1])], [m.version for m in MIGRATIONS[1:]])
+        self.assertEqual(pending_migrations([m.version for m in MIGRATIONS]), [])
+
+    def test_every_model_column_is_migrated(self):
+        sql = "\n".join(s for m in MIGRATIONS for s in m.statements)
+        for table in Base.metadata.sorted_tables:
+            self.assertIn(f"TABLE IF NOT EXISTS {table.name}", sql)
+            for column in table.columns:
+                self.assertRegex(sql, rf"\b{re.escape(column.name)}\b", f"{table.name}.{column.name} has no migration")
+
+    def test_every_model_index_is_migrated(self):
+        sql = "\n".join(s for m in MIGRATIONS for s in m.statements)
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                self.assertIn(f"IF NOT EXISTS {index.name} ON {table.name}", sql)
+
+    def test_concurrent_index_builds_run_outside_transactions(self):
+        for migration in MIGRATIONS:
+            uses_concurrently = any("CONCURRENTLY" in s.upper() for s in migration.statements)
+            if uses_concurrently:
+                self.assertFalse(migration.transactional, migration.name)
+
+
+class TestConcurrentIndexBuilds(unittest.TestCase):
+    MIGRATION = Migration(99, "unique_index", (
+        "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_orders_payload ON orders (payload)",
+    ), transactional=False)
+
+    def apply(self, index_valid, build_error=None):
+        executed = []
+
+        async def execute(statement, params=None):
+            executed.append(str(statement))
+            if build_error and str(statement).startswith("CREATE"):
+                raise build_error
+
+        conn = MagicMock(execute=AsyncMock(side_effect=execute), scalar=AsyncMock(return_value=index_valid))
+        conn.execution_options = AsyncMock(return_value=conn)
+        engine = MagicMock()
+        engine.connect.return_value.__aenter__ = AsyncMock(return_value=conn)
+        engine.connect.return_value.__aexit__ = AsyncMock(return_value=False)
+        try:
+            asyncio.run(_apply(engine, self.MIGRATION))
+        finally:
+            self.executed = executed
+
+    def test_valid_index_records_the_version(self):
+        self.apply(index_valid=True)
+        self.assertTrue(self.executed[-1].startswith("INSERT INTO schema_version"))
+
+    def test_invalid_index_is_dropped_and_version_not_recorded(self):
+        # IF NOT EXISTS skipped a broken index left by an earlier failed deploy
+        with self.assertRaises(MigrationError):
+            self.apply(index_valid=False)
+        self.assertIn("DROP INDEX CONCURRENTLY IF EXISTS uq_orders_payload", self.executed)
+        self.assertFalse(any(s.startswith("INSERT") for s in self.executed))
+
+    def test_failed_build_drops_the_index_it_left_behind(self):
+        with self.assertRaises(RuntimeError):
+            self.apply(index_valid=False, build_error=RuntimeError("could not create unique index"))
+        self.assertIn("DROP INDEX CONCURRENTLY IF EXISTS uq_orders_payload", self.executed)
+        self.assertFalse(any(s.startswith("INSERT") for s in self.executed))
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL not set")
+class TestMigrationRunner(unittest.TestCase):
+    def test_runs_once_and_reports_latest_version(self):
+        async def scenario():
+            engine = create_async_engine(TEST_DATABASE_URL)
+            try:
+                await run_migrations(engine)
+                self.assertEqual(await run_migrations(engine), [])
+                self.assertEqual(await current_version(engine), LATEST_VERSION)
+            finally:
+                await engine.dispose()
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+from unittest.mock import patch, AsyncMock
+
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.core.metrics import CELERY_QUEUE_DEPTH
+from src.services.readiness import ReadinessService, check_queue
+
+
+async def healthy():
+    return None
+
+
+async def failing():
+    raise ConnectionError("connection refused")
+
+
+async def hanging():
+    await asyncio.sleep(10)
+
+
+class TestReadinessService(unittest.TestCase):
+    def make_service(self, **checks):
+        service = ReadinessService(interval=1, timeout=0.05, stale_after=30)
+        for name, (check, required) in checks.items():
+            service.add_check(name, check, required)
+        return service
+
+    def test_starting_until_first_round(self):
+        snapshot = self.make_service(db=(healthy, True)).snapshot()
+        self.assertEqual(snapshot["status"], "starting")
+        self.assertFalse(snapshot["ready"])
+
+    def test_optional_failures_do_not_affect_readiness(self):
+        service = self.make_service(db=(healthy, True), workers=(failing, False))
+        asyncio.run(service.refresh())
+
+        snapshot = service.snapshot()
+        self.assertTrue(snapshot["ready"])
+        # The driver message stays in the logs; the public snapshot only names the error
+        self.assertEqual(snapshot["checks"]["workers"]["detail"], "ConnectionError")
+
+    def test_required_failure_and_timeout(self):
+        service = self.make_service(db=(hanging, True), redis=(healthy, True))
+        asyncio.run(service.refresh())
+
+        snapshot = service.snapshot()
+        self.assertFalse(snapshot["ready"])
+        self.assertIn("timed out", snapshot["checks"]["db"]["detail"])
+
+    def test_stale_snapshot_is_not_ready(self):
+        service = self.make_service(db=(healthy, True))
+        asyncio.run(service.refresh())
+        service._checked_at -= 60
+
+        snapshot = service.snapshot()
+        self.assertTrue(snapshot["stale"])
+        self.assertFalse(snapshot["ready"])
+
+    @patch("src.services.readiness.get_async_redis")
+    def test_queue_check_refreshes_depth_gauge(self, mock_redis):
+        mock_redis.return_value.llen = AsyncMock(return_value=7)
+
+        self.assertEqual(asyncio.run(check_queue()), "7 queued")
+        self.assertEqual(CELERY_QUEUE_DEPTH._value.get(), 7)
+
+
+class TestReadinessEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_ready_reflects_snapshot_without_touching_dependencies(self):
+        service = ReadinessService(interval=1, timeout=1, stale_after=30)
+        service.add_check("postgres", failing)
+        asyncio.run(service.refresh())
+
+        with patch("src.api.main.readiness", service):
+            ready = self.client.get("/ready")
+            health = self.client.get("/health")
+
+        self.assertEqual(ready.status_code, 503)
+        self.assertEqual(ready.json()["checks"]["postgres"]["ok"], False)
+        self.assertNotIn("connection refused", ready.text)
+        self.assertEqual(health.status_code, 200)
+        self.assertEqual(health.json()["readiness"], "not_ready")
+
+
+if __name__ == "__main__":
+    unittest.main()
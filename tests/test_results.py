@@ -0,0 +1,269 @@
+import asyncio
+import gzip
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from src.api.downloads import accepts_gzip
+from src.api.main import app
+from src.core.config import settings
+from src.core.security import get_current_user
+from src.services.output_storage import finalize_output
+from src.services.result_index import ResultIndexService
+from src.services.result_notifier import ResultNotifierService
+
+
+class TestResultNotifier(unittest.TestCase):
+    def test_dispatch_wakes_every_waiter_for_the_task(self):
+        async def scenario():
+            notifier = ResultNotifierService()
+            first = notifier.register("task-1")
+            second = notifier.register("task-1")
+            other = notifier.register("task-2")
+
+            notifier.dispatch({"task_id": "task-1", "state": "SUCCESS", "result": {"status": "success"}})
+
+            self.assertEqual((await notifier.wait(first, 1))["state"], "SUCCESS")
+            self.assertEqual((await notifier.wait(second, 1))["state"], "SUCCESS")
+            self.assertIsNone(await notifier.wait(other, 0.01))
+            notifier.unregister("task-2", other)
+            self.assertEqual(notifier.waiting, 0)
+
+        asyncio.run(scenario())
+
+
+class TestPushResultEndpoints(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides[get_current_user] = lambda: "admin"
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    @patch("src.api.main.result_notifier.wait", new_callable=AsyncMock)
+    @patch("src.api.main.AsyncResult")
+    def test_long_poll_returns_pushed_completion(self, mock_async_result, mock_wait):
+        mock_async_result.return_value = MagicMock(state="PENDING")
+        mock_wait.return_value = {
+            "task_id": "12345", "state": "SUCCESS",
+            "result": {"status": "error", "error": "Não foi possível extrair registros"},
+        }
+
+        response = self.client.get("/result/12345/wait?timeout=5")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "failed")
+        # Only the initial state check touches the result backend
+        mock_async_result.assert_called_once()
+
+    @patch("src.api.main.result_notifier.wait", new_callable=AsyncMock, return_value=None)
+    @patch("src.api.main.AsyncResult")
+    def test_long_poll_times_out_as_processing(self, mock_async_result, mock_wait):
+        mock_async_result.return_value = MagicMock(state="PENDING")
+
+        response = self.client.get("/result/12345/wait?timeout=0")
+
+        self.assertEqual(response.json(), {"task_id": "12345", "status": "processing"})
+
+    @patch("src.api.main.AsyncResult")
+    def test_sse_stream_ends_with_completion_event(self, mock_async_result):
+        mock_async_result.return_value = MagicMock(
+            state="SUCCESS", result={"status": "success", "output_path": "/tmp/x.csv"}
+        )
+
+        response = self.client.get("/result/12345/events")
+
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        data_lines = [line for line in response.text.splitlines() if line.startswith("data: ")]
+        event = json.loads(data_lines[-1][len("data: "):])
+        self.assertEqual(event["status"], "completed")
+        self.assertEqual(event["download_url"], "/result/12345")
+
+
+class TestResultWebSocket(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        for target, value in (("src.api.main.decode_access_token", lambda token: "admin"),
+                              ("src.api.main._task_state", AsyncMock(return_value=("PENDING", None)))):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    async def idle_wait(future, timeout):
+        await asyncio.sleep(0.01)
+        return None
+
+    def test_keepalives_then_timeout_event_before_close(self):
+        with patch("src.api.main.result_notifier.wait", self.idle_wait), \
+                patch.object(settings, "RESULT_PUSH_MAX_WAIT_SECONDS", 0.05):
+            with self.client.websocket_connect("/result/12345/ws?token=t") as ws:
+                events = []
+                while not events or events[-1]["status"] == "processing":
+                    events.append(ws.receive_json())
+
+        # Initial status plus at least one keep-alive, then the timeout
+        self.assertGreaterEqual(len(events), 3)
+        self.assertEqual(events[-1], {"task_id": "12345", "status": "timeout"})
+
+    def test_closed_client_unregisters_the_waiter(self):
+        from src.api.main import result_websocket
+
+        # The first write succeeds; the client is gone by the first keep-alive
+        websocket = MagicMock(accept=AsyncMock(), close=AsyncMock(),
+                              send_json=AsyncMock(side_effect=[None, WebSocketDisconnect(1006)]))
+        with patch("src.api.main.result_notifier.wait", self.idle_wait), \
+                patch("src.api.main.result_notifier.unregister") as unregister, \
+                patch.object(settings, "RESULT_PUSH_MAX_WAIT_SECONDS", 60):
+            asyncio.run(asyncio.wait_for(result_websocket(websocket, "12345", token="t"), 2))
+
+        self.assertEqual(websocket.send_json.await_count, 2)
+        unregister.assert_called_once()
+
+
+class TestResultDownload(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides[get_current_user] = lambda: "admin"
+        self.client = TestClient(app)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.csv_path = Path(tmp.name) / "PontoJaneiro.csv"
+        self.content = ("Data;Entrada 1\r\n" + "01/01/2024;08:00\r\n" * 200).encode()
+        self.csv_path.write_bytes(self.content)
+        self.sha256 = finalize_output(self.csv_path)["sha256"]
+
+        async_result = patch("src.api.main.AsyncResult")
+        mock_async_result = async_result.start()
+        self.addCleanup(async_result.stop)
+        mock_async_result.return_value.state = "SUCCESS"
+        mock_async_result.return_value.result = {
+            "status": "success",
+            "output_path": str(self.csv_path),
+            "filename": "PontoJaneiro.csv",
+            "sha256": self.sha256,
+        }
+
+    def tearDown(self):
+        app.dependency_overrides.clear()
+
+    def test_precompressed_copy_is_served_when_accepted(self):
+        response = self.client.get("/result/task-1", headers={"Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertEqual(response.headers["etag"], f'"{self.sha256}-gzip"')
+        self.assertEqual(response.content, self.content)
+
+    def test_identity_download_has_strong_etag(self):
+        response = self.client.get("/result/task-1", headers={"Accept-Encoding": "identity"})
+
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["etag"], f'"{self.sha256}"')
+        self.assertIn("max-age", response.headers["cache-control"])
+        self.assertEqual(response.content, self.content)
+
+    def test_malformed_q_value_falls_back_to_identity(self):
+        response = self.client.get("/result/task-1", headers={"Accept-Encoding": "gzip;q=abc"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.headers["etag"], f'"{self.sha256}"')
+
+    def test_explicit_gzip_entry_overrides_wildcard(self):
+        cases = {
+            "*;q=1, gzip;q=0": False,
+            "gzip;q=0, *": False,
+            "gzip;q=0.5, *;q=0": True,
+            "identity, *;q=0.1": True,
+            "br, identity": False,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertEqual(accepts_gzip(header), expected)
+
+    def test_matching_etag_returns_304(self):
+        for etag in (f'"{self.sha256}"', f'W/"{self.sha256}-gzip"'):
+            response = self.client.get("/result/task-1", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b"")
+
+    def test_range_request_returns_partial_content(self):
+        response = self.client.get("/result/task-1", headers={"Range": "bytes=0-13", "Accept-Encoding": "gzip"})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(response.content, b"Data;Entrada 1")
+
+    def test_gzip_copy_is_deterministic(self):
+        compressed = self.csv_path.with_name("PontoJaneiro.csv.gz")
+        first = compressed.read_bytes()
+        finalize_output(self.csv_path)
+        self.assertEqual(compressed.read_bytes(), first)
+        self.assertEqual(gzip.decompress(first), self.content)
+
+
+class TestResultIndex(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = Path(tmp.name) / "results.sqlite3"
+        self.index = ResultIndexService(self.db_path, cache_size=2)
+
+    def test_records_survive_a_fresh_process(self):
+        self.index.record("task-1", {"status": "success", "output_path": "/x.csv", "filename": "x.csv", "sha256": "ab", "size": 3})
+        self.index.record("task-2", {"status": "error", "error": "boom"})
+
+        reopened = ResultIndexService(self.db_path)
+        self.assertEqual(reopened.get("task-1")["sha256"], "ab")
+        self.assertEqual(reopened.get("task-2"), {"status": "error", "error": "boom"})
+        self.assertIsNone(reopened.get("task-3"))
+
+    def test_lru_is_bounded(self):
+        for i in range(3):
+            self.index.record(f"task-{i}", {"status": "success"})
+        self.assertEqual(list(self.index._cache), ["task-1", "task-2"])
+
+    def test_missing_database_is_not_created_by_reads(self):
+        self.assertIsNone(self.index.get("task-1"))
+        self.assertFalse(self.db_path.exists())
+
+    def test_cached_only_reads_memory(self):
+        self.index.record("task-1", {"status": "success"})
+        reopened = ResultIndexService(self.db_path)
+
+        self.assertIsNone(reopened.cached("task-1"))
+        self.assertEqual(reopened.lookup("task-1"), {"status": "success"})
+        self.assertEqual(reopened.cached("task-1"), {"status": "success"})
+
+    @patch("src.api.main.run_in_threadpool", new_callable=AsyncMock)
+    def test_lru_hit_skips_the_threadpool(self, mock_threadpool):
+        from src.api.main import _task_state
+
+        self.index.record("task-1", {"status": "success"})
+        with patch("src.api.main.result_index", self.index):
+            self.assertEqual(asyncio.run(_task_state("task-1")), ("SUCCESS", {"status": "success"}))
+            mock_threadpool.assert_not_called()
+
+            mock_threadpool.return_value = ("PENDING", None)
+            self.assertEqual(asyncio.run(_task_state("task-2")), ("PENDING", None))
+            mock_threadpool.assert_awaited_once()
+
+    @patch("src.api.main.AsyncResult")
+    def test_result_endpoint_prefers_the_index(self, mock_async_result):
+        self.index.record("task-1", {"status": "error", "error": "Formato inválido"})
+        app.dependency_overrides[get_current_user] = lambda: "admin"
+        self.addCleanup(app.dependency_overrides.clear)
+
+        with patch("src.api.main.result_index", self.index):
+            response = TestClient(app).get("/result/task-1")
+
+        self.assertEqual(response.json(), {"task_id": "task-1", "status": "failed", "error": "Formato inválido"})
+        mock_async_result.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
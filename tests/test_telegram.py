@@ -0,0 +1,441 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, AsyncMock, Mock
+
+import httpx
+import redis.asyncio as aioredis
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.core.config import settings
+from src.api import telegram as telegram_api
+from src.core.database import LazySession
+from src.services.outbound_limiter import TELEGRAM_RATE_PREFIX, OutboundRateLimiter, Priority
+from src.services.telegram import PreparedMessage, TelegramService
+from src.services.update_dedup import UpdateDeduplicator
+from src.services.update_queue import HashRing, UpdateQueueService, shard_for, update_chat_id
+from tests.helpers import FakeRedis
+
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+UPDATE = {"update_id": 1, "message": {"message_id": 1, "chat": {"id": 42}, "text": "/start"}}
+
+
+class TestTelegramWebhook(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+        claim = patch("src.api.telegram.update_deduplicator.claim", new_callable=AsyncMock, return_value=True)
+        self.mock_claim = claim.start()
+        self.addCleanup(claim.stop)
+        secret = patch.object(settings, "TELEGRAM_WEBHOOK_SECRET", "s3cret")
+        secret.start()
+        self.addCleanup(secret.stop)
+        self.headers = {"X-Telegram-Bot-Api-Secret-Token": "s3cret"}
+
+    @patch("src.api.telegram.process_update", new_callable=AsyncMock)
+    @patch("src.api.telegram.update_queue.enqueue", new_callable=AsyncMock, return_value=True)
+    def test_update_is_queued_and_acknowledged(self, mock_enqueue, mock_process):
+        response = self.client.post("/telegram/webhook", json=UPDATE, headers=self.headers)
+
+        self.assertEqual(response.json(), {"ok": True})
+        raw, update = mock_enqueue.call_args.args
+        self.assertEqual(json.loads(raw), UPDATE)
+        self.assertEqual(update, UPDATE)
+        mock_process.assert_not_called()
+
+    @patch("src.api.telegram.process_update", new_callable=AsyncMock)
+    @patch("src.api.telegram.update_queue.enqueue", new_callable=AsyncMock, return_value=False)
+    def test_update_is_handled_inline_without_redis(self, mock_enqueue, mock_process):
+        response = self.client.post("/telegram/webhook", json=UPDATE, headers=self.headers)
+
+        self.assertEqual(response.status_code, 200)
+        mock_process.assert_awaited_once_with(UPDATE)
+
+    @patch("src.api.telegram.update_queue.enqueue", new_callable=AsyncMock)
+    def test_rejects_bad_secret_and_malformed_body(self, mock_enqueue):
+        response = self.client.post("/telegram/webhook", json=UPDATE, headers={"X-Telegram-Bot-Api-Secret-Token": "x"})
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.post("/telegram/webhook", content=b"{not json", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        mock_enqueue.assert_not_called()
+
+    @patch("src.api.telegram.update_queue.enqueue", new_callable=AsyncMock)
+    def test_duplicate_update_is_dropped_before_queueing(self, mock_enqueue):
+        self.mock_claim.return_value = False
+
+        response = self.client.post("/telegram/webhook", json=UPDATE, headers=self.headers)
+
+        self.assertEqual(response.json(), {"ok": True})
+        self.mock_claim.assert_awaited_once_with(1)
+        mock_enqueue.assert_not_called()
+
+
+def text_update(text: str) -> dict:
+    return {"update_id": 5, "message": {"message_id": 5, "chat": {"id": 42}, "from": {"first_name": "Ana"}, "text": text}}
+
+
+class TestCommandDispatch(unittest.TestCase):
+    def setUp(self):
+        send = patch.object(telegram_api.telegram_service, "send_prepared", new_callable=AsyncMock)
+        self.mock_send = send.start()
+        self.addCleanup(send.stop)
+
+    def dispatch(self, text: str, factory=None) -> LazySession:
+        async def scenario():
+            async with LazySession(factory) as session:
+                await telegram_api.handle_update(text_update(text), session)
+                return session
+        return asyncio.run(scenario())
+
+    def test_static_commands_never_open_a_session(self):
+        factory = Mock(side_effect=AssertionError("no DB for static commands"))
+        for text in ("/help", "/preco", " /start ", "olá"):
+            self.dispatch(text, factory)
+        factory.assert_not_called()
+
+        sent = [call.args[1] for call in self.mock_send.await_args_list]
+        self.assertEqual(sent, [telegram_api.HELP_MESSAGE, telegram_api.PRICE_MESSAGE,
+                                telegram_api.START_MESSAGE, telegram_api.UNKNOWN_MESSAGE])
+        self.assertEqual(self.mock_send.await_args_list[2].kwargs["prefix"], "🤖 Olá Ana")
+
+    def test_status_opens_the_session_lazily(self):
+        result = Mock()
+        result.scalars.return_value.all.return_value = []
+        db = Mock(execute=AsyncMock(return_value=result), close=AsyncMock())
+
+        self.dispatch("/status", lambda: db)
+
+        db.execute.assert_awaited_once()
+        db.close.assert_awaited_once()
+        self.mock_send.assert_awaited_once_with(42, telegram_api.NO_ORDERS_MESSAGE)
+
+    def test_prepared_body_matches_plain_send_message(self):
+        message = PreparedMessage('Linha "1"\n*negrito* ✅')
+        body = json.loads(message.body(-100, prefix="Olá "))
+        self.assertEqual(body, {"chat_id": -100, "text": 'Olá Linha "1"\n*negrito* ✅',
+                                "parse_mode": "Markdown", "disable_web_page_preview": True})
+
+
+class TestUpdateDeduplicator(unittest.TestCase):
+    def test_local_lru_and_shared_store(self):
+        redis = FakeRedis()
+
+        async def scenario():
+            with patch("src.services.update_dedup.get_async_redis", return_value=redis):
+                first, second = UpdateDeduplicator(max_entries=2), UpdateDeduplicator(max_entries=2)
+                self.assertTrue(await first.claim(1))
+                self.assertFalse(await first.claim(1))
+                # Another process sees the Redis marker
+                self.assertFalse(await second.claim(1))
+                # Evicted locally, still known to Redis
+                await first.claim(2)
+                await first.claim(3)
+                self.assertNotIn(1, first._seen)
+                self.assertFalse(await first.claim(1))
+
+                await first.release(3)
+                self.assertTrue(await first.claim(3))
+
+        asyncio.run(scenario())
+
+    def test_falls_back_to_local_when_redis_is_down(self):
+        async def scenario():
+            with patch("src.services.update_dedup.get_async_redis", side_effect=ConnectionError("down")):
+                dedup = UpdateDeduplicator()
+                self.assertTrue(await dedup.claim(7))
+                self.assertFalse(await dedup.claim(7))
+
+        asyncio.run(scenario())
+
+
+class TestUpdateSharding(unittest.TestCase):
+    def test_chat_id_from_update_types(self):
+        self.assertEqual(update_chat_id(UPDATE), 42)
+        callback = {"update_id": 2, "callback_query": {"from": {"id": 7}, "message": {"chat": {"id": -100}}}}
+        self.assertEqual(update_chat_id(callback), -100)
+        self.assertEqual(update_chat_id({"update_id": 3, "pre_checkout_query": {"from": {"id": 9}}}), 9)
+        self.assertIsNone(update_chat_id({"update_id": 4}))
+
+    def test_same_chat_same_shard(self):
+        self.assertEqual(shard_for(42, 16), shard_for(42, 16))
+        self.assertTrue(all(0 <= shard_for(chat, 16) < 16 for chat in range(-50, 50)))
+        self.assertGreater(len({shard_for(chat, 16) for chat in range(1000)}), 12)
+
+    def test_hash_ring_moves_few_shards_when_members_change(self):
+        keys = [str(shard) for shard in range(256)]
+        before = HashRing(["a", "b", "c"])
+        after = HashRing(["a", "b", "c", "d"])
+        moved = [key for key in keys if before.owner(key) != after.owner(key)]
+        # Only shards taken over by the new member move
+        self.assertTrue(all(after.owner(key) == "d" for key in moved))
+        self.assertLess(len(moved), len(keys) / 2)
+        self.assertIsNone(HashRing([]).owner("1"))
+
+    def test_instances_split_shards_with_exclusive_leases(self):
+        redis = FakeRedis()
+
+        async def hold(queue, shard):
+            await queue._stopping[shard].wait()
+            queue._consumers.pop(shard, None)
+            await redis.eval("del", 1, queue._lease_key(shard), queue.owner)
+
+        async def scenario():
+            first, second = UpdateQueueService(shards=8), UpdateQueueService(shards=8)
+            first.owner, second.owner = "host-a:1", "host-b:1"
+            for queue in (first, second):
+                queue._client = redis
+                queue._consume = lambda shard, queue=queue: hold(queue, shard)
+
+            await redis.set(first._alive_key(first.owner), "1")
+            await first.rebalance()
+            self.assertEqual(first.owned_shards, list(range(8)))
+
+            # A second instance joins: it only gets the shards the first one lets go
+            await redis.set(second._alive_key(second.owner), "1")
+            await second.rebalance()
+            self.assertEqual(second.owned_shards, [])
+            await first.rebalance()
+            await asyncio.sleep(0)
+            await second.rebalance()
+
+            ring = HashRing([first.owner, second.owner])
+            self.assertEqual(second.owned_shards, [s for s in range(8) if ring.owner(str(s)) == second.owner])
+            self.assertEqual(sorted(first.owned_shards + second.owned_shards), list(range(8)))
+
+            for queue in (first, second):
+                for event in queue._stopping.values():
+                    event.set()
+            await asyncio.sleep(0)
+
+        asyncio.run(scenario())
+
+
+class TestOutboundRateLimit(unittest.TestCase):
+    def test_local_buckets_keep_a_reserve_for_high_priority(self):
+        limiter = OutboundRateLimiter(global_rate=10, chat_rate=100, chat_burst=100, reserve=4)
+        granted = [limiter._try_local(chat, Priority.NORMAL) == 0 for chat in range(10)]
+        # NORMAL stops with the reserve left; HIGH may still use it
+        self.assertEqual(granted.count(True), 6)
+        self.assertEqual(limiter._try_local(99, Priority.HIGH), 0)
+        self.assertGreater(limiter._try_local(99, Priority.LOW), 0)
+
+    def test_per_chat_burst(self):
+        limiter = OutboundRateLimiter(global_rate=100, chat_rate=1, chat_burst=2, reserve=0)
+        self.assertEqual(limiter._try_local(1, Priority.NORMAL), 0)
+        self.assertEqual(limiter._try_local(1, Priority.NORMAL), 0)
+        self.assertGreater(limiter._try_local(1, Priority.NORMAL), 0.5)
+        self.assertEqual(limiter._try_local(2, Priority.NORMAL), 0)
+
+    def test_local_pause_is_reported_as_negative(self):
+        limiter = OutboundRateLimiter(global_rate=100, chat_rate=100, chat_burst=100, reserve=0)
+        limiter._paused[1] = time.monotonic() + 5
+        self.assertLess(limiter._try_local(1, Priority.HIGH), -4)
+
+    def test_acquire_never_bypasses_a_pause(self):
+        limiter = OutboundRateLimiter(max_wait=0)
+        clock, sleeps = [100.0], []
+
+        async def fake_sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        async def scenario():
+            # Paused for 3s, then the buckets ask for 1s more: max_wait=0 only skips the latter
+            with patch.object(limiter, "try_acquire", AsyncMock(side_effect=[-3.0, 1.0, 0])) as try_acquire, \
+                    patch("src.services.outbound_limiter.asyncio.sleep", fake_sleep), \
+                    patch("src.services.outbound_limiter.time.monotonic", lambda: clock[0]):
+                await limiter.acquire(1)
+                return try_acquire.await_count
+
+        self.assertEqual(asyncio.run(scenario()), 2)
+        self.assertEqual(sleeps, [3.0])
+
+    def test_send_honours_retry_after(self):
+        flood = Mock(status_code=429, json=Mock(return_value={"ok": False, "parameters": {"retry_after": 3}}))
+        ok = Mock(status_code=200, json=Mock(return_value={"ok": True}))
+        service = TelegramService()
+        client = Mock(post=AsyncMock(side_effect=[flood, ok]))
+
+        async def scenario():
+            with patch("src.services.telegram.outbound_limiter") as limiter, \
+                    patch("src.services.telegram.http_clients.get", return_value=client):
+                limiter.acquire = AsyncMock()
+                limiter.pause = AsyncMock()
+                result = await service.send_message(42, "oi", priority=Priority.HIGH)
+                limiter.pause.assert_awaited_once_with(42, 3.0)
+                self.assertEqual(limiter.acquire.await_count, 2)
+                limiter.acquire.assert_awaited_with(42, Priority.HIGH)
+                return result
+
+        self.assertEqual(asyncio.run(scenario()), {"ok": True})
+
+
+@unittest.skipUnless(TEST_REDIS_URL, "TEST_REDIS_URL not set")
+class TestOutboundRateLimitScript(unittest.TestCase):
+    """Runs the _ACQUIRE script on a real Redis (the keys under TELEGRAM_RATE_PREFIX are wiped)."""
+
+    def run_with_redis(self, scenario):
+        async def wrapper():
+            client = aioredis.Redis.from_url(TEST_REDIS_URL)
+            try:
+                async for key in client.scan_iter(match=f"{TELEGRAM_RATE_PREFIX}*"):
+                    await client.delete(key)
+                with patch("src.services.outbound_limiter.get_async_redis", return_value=client):
+                    return await scenario()
+            finally:
+                await client.aclose()
+
+        return asyncio.run(wrapper())
+
+    def test_normal_priority_leaves_the_reserve(self):
+        limiter = OutboundRateLimiter(global_rate=5, chat_rate=100, chat_burst=100, reserve=2)
+
+        async def scenario():
+            granted = [await limiter.try_acquire(chat, Priority.NORMAL) == 0 for chat in range(5)]
+            return granted, await limiter.try_acquire(99, Priority.HIGH)
+
+        granted, high = self.run_with_redis(scenario)
+        self.assertEqual(granted, [True, True, True, False, False])
+        self.assertEqual(high, 0)
+
+    def test_chat_bucket_refills(self):
+        limiter = OutboundRateLimiter(global_rate=100, chat_rate=10, chat_burst=1, reserve=0)
+
+        async def scenario():
+            first = await limiter.try_acquire(1)
+            wait = await limiter.try_acquire(1)
+            other = await limiter.try_acquire(2)
+            await asyncio.sleep(wait + 0.02)
+            return first, wait, other, await limiter.try_acquire(1)
+
+        first, wait, other, refilled = self.run_with_redis(scenario)
+        self.assertEqual(first, 0)
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.1)
+        self.assertEqual(other, 0)
+        self.assertEqual(refilled, 0)
+
+    def test_pause_is_reported_as_negative(self):
+        limiter = OutboundRateLimiter()
+
+        async def scenario():
+            await limiter.pause(1, 2)
+            return await limiter.try_acquire(1, Priority.HIGH)
+
+        wait = self.run_with_redis(scenario)
+        self.assertLess(wait, -1)
+
+
+class TestDownloadFile(unittest.TestCase):
+    def download(self, content: bytes, max_bytes: int, declare_length: bool = True):
+        def handler(request):
+            headers = {} if declare_length else {"Transfer-Encoding": "chunked"}
+            stream = httpx.ByteStream(content) if declare_length else iter([content[:10], content[10:]])
+            return httpx.Response(200, headers=headers, stream=stream)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        destination = os.path.join(directory.name, "file.pdf")
+
+        async def scenario():
+            client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://files.test")
+            with patch("src.services.telegram.http_clients.get", return_value=client):
+                return await TelegramService().download_file("documents/file.pdf", destination, max_bytes=max_bytes)
+
+        return asyncio.run(scenario()), destination
+
+    def test_streams_to_disk_and_returns_sha256(self):
+        content = b"%PDF-1.4 " + b"x" * 5000
+        digest, destination = self.download(content, max_bytes=10000)
+        self.assertEqual(digest, hashlib.sha256(content).hexdigest())
+        with open(destination, "rb") as f:
+            self.assertEqual(f.read(), content)
+
+    def test_size_limit_is_enforced_in_flight(self):
+        digest, destination = self.download(b"y" * 100, max_bytes=50, declare_length=False)
+        self.assertIsNone(digest)
+        # The partial file is removed
+        self.assertFalse(os.path.exists(destination))
+
+        digest, _ = self.download(b"y" * 100, max_bytes=50)
+        self.assertIsNone(digest)
+
+
+class TestGetFileCache(unittest.TestCase):
+    def test_file_path_is_reused_within_its_validity(self):
+        redis = FakeRedis()
+        response = Mock(status_code=200, json=Mock(return_value={"result": {"file_path": "documents/f.pdf", "file_size": 10}}))
+        client = Mock(post=AsyncMock(return_value=response))
+
+        async def scenario():
+            with patch("src.services.telegram.get_async_redis", return_value=redis), \
+                    patch("src.services.telegram.http_clients.get", return_value=client):
+                service = TelegramService()
+                return [await service.get_file_path("file-1") for _ in range(3)]
+
+        self.assertEqual(asyncio.run(scenario()), ["documents/f.pdf"] * 3)
+        client.post.assert_awaited_once()
+
+
+class TestDocumentReuse(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.requests = []
+        self.responses = []
+
+        def handler(request):
+            self.requests.append(request)
+            return self.responses.pop(0)
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://api.test")
+        for target, value in (("src.services.telegram.get_async_redis", lambda: self.redis),
+                              ("src.services.telegram.http_clients.get", lambda name: self.client),
+                              ("src.services.telegram.outbound_limiter.acquire", AsyncMock())):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, content: bytes, filename: str = "pedido.csv") -> bool:
+        return asyncio.run(TelegramService().send_document(42, content, caption="CSV", filename=filename))
+
+    def sent(self):
+        return httpx.Response(200, json={"ok": True, "result": {"document": {"file_id": "FILE-1"}}})
+
+    def test_first_delivery_uploads_then_file_id_is_reused(self):
+        self.responses = [self.sent(), self.sent()]
+        self.assertTrue(self.send(b"Data;Entrada 1\r\n"))
+        self.assertTrue(self.send(b"Data;Entrada 1\r\n"))
+
+        upload, reuse = self.requests
+        self.assertTrue(upload.headers["content-type"].startswith("multipart/form-data"))
+        self.assertIn(b"pedido.csv", upload.content)
+        self.assertEqual(json.loads(reuse.content), {"chat_id": 42, "caption": "CSV", "document": "FILE-1"})
+
+    def test_rejected_file_id_falls_back_to_upload(self):
+        self.redis.keys["saas_contabil:telegram_document:" + hashlib.sha256(b"x").hexdigest() + ":pedido.csv"] = "STALE"
+        self.responses = [httpx.Response(400, json={"ok": False, "description": "wrong file identifier"}), self.sent()]
+
+        self.assertTrue(self.send(b"x"))
+
+        self.assertEqual(len(self.requests), 2)
+        self.assertIn("FILE-1", self.redis.keys.values())
+
+    def test_same_content_under_another_name_is_uploaded(self):
+        self.responses = [self.sent(), self.sent()]
+        self.assertTrue(self.send(b"Data;Entrada 1\r\n", filename="janeiro.csv"))
+        self.assertTrue(self.send(b"Data;Entrada 1\r\n", filename="fevereiro.csv"))
+
+        first, second = self.requests
+        self.assertIn(b"janeiro.csv", first.content)
+        self.assertTrue(second.headers["content-type"].startswith("multipart/form-data"))
+        self.assertIn(b"fevereiro.csv", second.content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import tempfile
+import time
+import unittest
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch, AsyncMock, MagicMock
+
+import httpx
+from kombu import compression
+
+from src.core.celery_app import celery_app, THRESHOLD_COMPRESSION
+from src.core.config import settings
+from src.worker.scheduling import schedule_in
+from src.services.conversion_cache import CONVERSION_UNIQUE_PREFIX, ConversionCacheService
+from src.services.document_converter import CONVERTER_VERSION
+from src.worker.tasks import _convert_in_memory, convert_document_task, process_telegram_order, simulate_test_payment_task
+from src.worker.warmup import build_sample_pdf, warm_up
+from tests.helpers import FakeRedis
+
+
+def discard_coroutine(coro):
+    coro.close()
+
+
+class TestDelayedScheduling(unittest.TestCase):
+    def test_schedule_in_uses_eta(self):
+        task = MagicMock()
+        task.name = "simulate_test_payment_task"
+
+        before = datetime.now(timezone.utc)
+        schedule_in(task, 5, "order-1", 42)
+
+        _, kwargs = task.apply_async.call_args
+        self.assertEqual(kwargs["args"], ("order-1", 42))
+        delay = (kwargs["eta"] - before).total_seconds()
+        self.assertAlmostEqual(delay, 5, delta=1)
+
+    @patch("src.worker.tasks.run_async", side_effect=discard_coroutine)
+    def test_test_payment_task_holds_no_worker_slot(self, mock_run_async):
+        # The delay belongs to the broker ETA; the task body must not wait
+        with patch("time.sleep", side_effect=AssertionError("task slept")):
+            started = time.perf_counter()
+            simulate_test_payment_task.run("order-1", 42)
+            elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.5)
+        mock_run_async.assert_called_once()
+
+
+class TestMessagingProfile(unittest.TestCase):
+    def test_threshold_compression_round_trip(self):
+        small = b"x" * (settings.CELERY_COMPRESSION_THRESHOLD - 1)
+        large = b"y" * (settings.CELERY_COMPRESSION_THRESHOLD * 4)
+        for body in (small, large):
+            encoded, content_type = compression.compress(body, THRESHOLD_COMPRESSION)
+            self.assertEqual(compression.decompress(encoded, content_type), body)
+
+        encoded_small, _ = compression.compress(small, THRESHOLD_COMPRESSION)
+        encoded_large, _ = compression.compress(large, THRESHOLD_COMPRESSION)
+        self.assertEqual(len(encoded_small), len(small) + 1)
+        self.assertLess(len(encoded_large), len(large))
+
+    def test_results_expire_and_fire_and_forget_tasks_store_none(self):
+        self.assertEqual(celery_app.conf.result_expires, settings.CELERY_RESULT_EXPIRES)
+        self.assertFalse(convert_document_task.ignore_result)
+        self.assertTrue(process_telegram_order.ignore_result)
+        self.assertTrue(simulate_test_payment_task.ignore_result)
+
+
+class TestWorkerWarmUp(unittest.TestCase):
+    def test_warm_up_runs_sample_conversion(self):
+        timings = warm_up()
+        self.assertEqual(set(timings), {"imports", "cold_conversion", "warm_conversion"})
+        self.assertTrue(all(value >= 0 for value in timings.values()))
+
+
+def use_temp_conversion_cache(test):
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    cache = ConversionCacheService(directory=directory.name, ttl_seconds=3600)
+    redis = test.redis = FakeRedis()
+    for target, value in (("src.worker.tasks.conversion_cache", cache),
+                          ("src.services.conversion_cache.get_async_redis", lambda: redis)):
+        patcher = patch(target, value)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return cache
+
+
+class TestInMemoryOrderConversion(unittest.TestCase):
+    def setUp(self):
+        self.cache = use_temp_conversion_cache(self)
+
+    def convert(self, retain: bool):
+        telegram_service = MagicMock(download_bytes=AsyncMock(return_value=(build_sample_pdf(), "abc123")))
+        order = MagicMock(id=uuid.uuid4(), pdf_path=None, csv_path=None, file_unique_id="uniq-1")
+        with patch.object(settings, "ORDER_RETAIN_FILES", retain):
+            csv = asyncio.run(_convert_in_memory(telegram_service, order, "documents/file.pdf"))
+        return csv, order
+
+    def test_small_orders_never_touch_the_disk(self):
+        with patch.object(Path, "write_bytes", side_effect=AssertionError("wrote to disk")), \
+                patch.object(self.cache, "put", new_callable=AsyncMock):
+            csv, order = self.convert(retain=False)
+
+        self.assertTrue(csv.decode("utf-8").startswith("Data;Entrada 1"))
+        self.assertEqual(order.file_hash, "abc123")
+        self.assertIsNone(order.csv_path)
+
+    def test_retention_persists_both_files(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                patch.object(settings, "UPLOAD_DIR", directory), patch.object(settings, "OUTPUT_DIR", directory):
+            csv, order = self.convert(retain=True)
+            self.assertEqual(Path(order.csv_path).read_bytes(), csv)
+            self.assertTrue(Path(order.pdf_path).read_bytes().startswith(b"%PDF"))
+
+
+class TestConversionCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = use_temp_conversion_cache(self)
+
+    def test_resent_file_skips_get_file_and_download(self):
+        asyncio.run(self.cache.put("abc123", b"Data;Entrada 1\r\n", "uniq-1"))
+        order = MagicMock(id=uuid.uuid4(), file_unique_id="uniq-1", file_name="PontoJaneiro.pdf", chat_id=42)
+        result = MagicMock()
+        result.scalars.return_value.first.return_value = order
+        db = MagicMock(execute=AsyncMock(return_value=result), commit=AsyncMock())
+        session = MagicMock(__aenter__=AsyncMock(return_value=db), __aexit__=AsyncMock(return_value=False))
+        telegram_service = MagicMock(get_file_path=AsyncMock(), send_document=AsyncMock())
+
+        with patch("src.worker.tasks.AsyncSessionLocal", return_value=session), \
+                patch("src.worker.tasks.TelegramService", return_value=telegram_service), \
+                patch("src.worker.tasks.run_async", side_effect=asyncio.run):
+            process_telegram_order.run(str(order.id))
+
+        telegram_service.get_file_path.assert_not_called()
+        self.assertEqual(telegram_service.send_document.await_args.args[1], b"Data;Entrada 1\r\n")
+        self.assertEqual(telegram_service.send_document.await_args.kwargs["filename"], "PontoJaneiro.csv")
+        self.assertEqual(order.status, "completed")
+        self.assertEqual(order.file_hash, "abc123")
+
+    def test_repeated_order_is_sent_by_file_id(self):
+        asyncio.run(self.cache.put("abc123", b"Data;Entrada 1\r\n", "uniq-1"))
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={"ok": True, "result": {"document": {"file_id": "FILE-1"}}})
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://api.test")
+        for target, value in (("src.services.telegram.get_async_redis", lambda: self.redis),
+                              ("src.services.telegram.http_clients.get", lambda name: client),
+                              ("src.services.telegram.outbound_limiter.acquire", AsyncMock()),
+                              ("src.worker.tasks.run_async", asyncio.run)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # Two orders (different ids) for the same PDF, both served from the conversion cache
+        for _ in range(2):
+            order = MagicMock(id=uuid.uuid4(), file_unique_id="uniq-1", file_name="PontoJaneiro.pdf", chat_id=42)
+            result = MagicMock()
+            result.scalars.return_value.first.return_value = order
+            db = MagicMock(execute=AsyncMock(return_value=result), commit=AsyncMock())
+            session = MagicMock(__aenter__=AsyncMock(return_value=db), __aexit__=AsyncMock(return_value=False))
+            with patch("src.worker.tasks.AsyncSessionLocal", return_value=session):
+                process_telegram_order.run(str(order.id))
+
+        upload, reuse = requests
+        self.assertIn(b'filename="PontoJaneiro.csv"', upload.content)
+        self.assertEqual(json.loads(reuse.content)["document"], "FILE-1")
+
+    def test_identical_pdf_is_found_by_hash(self):
+        telegram_service = MagicMock(download_bytes=AsyncMock(return_value=(build_sample_pdf(), "abc123")))
+        asyncio.run(self.cache.put("abc123", b"cached", None))
+        order = MagicMock(id=uuid.uuid4(), file_unique_id="uniq-2")
+
+        with patch("src.worker.tasks.get_converter", side_effect=AssertionError("converted again")):
+            csv = asyncio.run(_convert_in_memory(telegram_service, order, "documents/file.pdf"))
+
+        self.assertEqual(csv, b"cached")
+        # The new file_unique_id now resolves without a download
+        self.assertEqual(asyncio.run(self.cache.get_by_unique_id("uniq-2")), ("abc123", b"cached"))
+
+    def test_outputs_of_another_converter_version_are_ignored(self):
+        asyncio.run(self.cache.put("abc123", b"cached", "uniq-1"))
+        key = f"{CONVERSION_UNIQUE_PREFIX}uniq-1"
+        self.assertEqual(self.redis.keys[key], f"{CONVERTER_VERSION}:abc123")
+
+        with patch("src.services.conversion_cache.CONVERTER_VERSION", CONVERTER_VERSION + "-next"):
+            self.assertIsNone(asyncio.run(self.cache.get("abc123")))
+            self.assertIsNone(asyncio.run(self.cache.get_by_unique_id("uniq-1")))
+        # The stale mapping is dropped so the new version can link it again
+        self.assertNotIn(key, self.redis.keys)
+
+    def test_link_does_not_renew_an_existing_mapping(self):
+        asyncio.run(self.cache.link("uniq-1", "abc123"))
+        self.redis.ttls[f"{CONVERSION_UNIQUE_PREFIX}uniq-1"] = 10
+        asyncio.run(self.cache.link("uniq-1", "abc123"))
+        self.assertEqual(self.redis.ttls[f"{CONVERSION_UNIQUE_PREFIX}uniq-1"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Verify the worker autoscaling policy against a local Redis with synthetic load.
+
+Fills a scratch queue and latency list (never the real Celery keys), samples
+them the same way the worker autoscaler does and prints the pool size the
+policy would choose for each scenario.
+
+Usage: REDIS_URL=redis://localhost:6379/15 python verify_autoscale.py
+"""
+import sys
+
+from src.core.redis_client import get_redis
+from src.worker.autoscale import AutoscalePolicy, sample_backlog
+
+QUEUE_KEY = "verify_autoscale:queue"
+LATENCY_KEY = "verify_autoscale:latency"
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 8
+
+SCENARIOS = [
+    # (name, queued tasks, task durations in seconds)
+    ("idle", 0, [2.0] * 20),
+    ("normal day", 10, [3.0] * 20),
+    ("month-end spike", 300, [4.0] * 18 + [20.0, 25.0]),
+    ("slow PDFs", 40, [30.0] * 20),
+]
+
+def load_scenario(client, queued: int, latencies: list):
+    client.delete(QUEUE_KEY, LATENCY_KEY)
+    if queued:
+        client.rpush(QUEUE_KEY, *["synthetic-task"] * queued)
+    if latencies:
+        client.rpush(LATENCY_KEY, *[f"{v:.3f}" for v in latencies])
+
+def main():
+    client = get_redis()
+    try:
+        client.ping()
+    except Exception as e:
+        print(f"❌ Redis not reachable: {e}")
+        return False
+
+    policy = AutoscalePolicy()
+    current = MIN_CONCURRENCY
+    try:
+        for name, queued, latencies in SCENARIOS:
+            load_scenario(client, queued, latencies)
+            sample = sample_backlog(client, queue_key=QUEUE_KEY, latency_key=LATENCY_KEY)
+            desired = policy.desired(sample, current, MIN_CONCURRENCY, MAX_CONCURRENCY)
+            print(
+                f"{name:>16}: queue={sample.queue_length:>4} p50={sample.p50_seconds:>5.1f}s "
+                f"p95={sample.p95_seconds:>5.1f}s cpu={sample.cpu_load:.2f} "
+                f"pool {current} -> {desired}"
+            )
+            current = desired
+    finally:
+        client.delete(QUEUE_KEY, LATENCY_KEY)
+
+    print("✅ Autoscale policy verification finished")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)